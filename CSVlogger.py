@@ -1,23 +1,300 @@
 import os
 import csv
 import datetime
+import glob
+import gzip
+import io
+import queue
+import shutil
+import threading
+import time
+import atexit
+
+HEADER = ['timestamp', 'command', 'error_message']
+ARCHIVE_SUFFIX = '.gz'
+
+
+def _encode_rows(rows):
+    """Строки CSV в байтах UTF-8 (как их записал бы csv.writer в файл)."""
+    buf = io.StringIO()
+    csv.writer(buf).writerows(rows)
+    return buf.getvalue().encode('utf-8')
+
+
+_HEADER_BYTES = _encode_rows([HEADER])
+
+
+class _LogArchiver:
+    """
+    Фоновый поток сжатия ротированных логов: gzip и удаление старых архивов
+    выполняются вне потока, который пишет лог. Поток один на процесс и
+    запускается при первой ротации.
+    """
+    def __init__(self):
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def submit(self, path, logger):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="csvlogger-archive", daemon=True)
+                self._thread.start()
+                atexit.register(self.wait)
+        self._queue.put((path, logger))
+
+    def wait(self):
+        """Дожидается сжатия всего, что уже поставлено в очередь."""
+        if self._thread is not None:
+            self._queue.join()
+
+    def _run(self):
+        while True:
+            path, logger = self._queue.get()
+            try:
+                if path is not None:
+                    compress_file(path)
+                logger.prune_archives()
+            except OSError:
+                # Архив мог удалить другой процесс; несжатый файл подберёт следующий запуск
+                pass
+            finally:
+                self._queue.task_done()
+
+
+_archiver = _LogArchiver()
+
+
+def compress_file(path):
+    """Сжимает path в path.gz (через временный файл) и удаляет исходный файл."""
+    target = path + ARCHIVE_SUFFIX
+    tmp_path = target + '.tmp'
+    with open(path, 'rb') as src, gzip.open(tmp_path, 'wb') as dst:
+        shutil.copyfileobj(src, dst, 1024 * 1024)
+    os.replace(tmp_path, target)
+    os.remove(path)
+    return target
+
+
+def wait_for_archives():
+    """Дожидается фонового сжатия ротированных логов."""
+    _archiver.wait()
+
 
 class CSVLogger:
-    """Логгер в формате CSV"""
-    def __init__(self, log_file):
+    """
+    Логгер в формате CSV. Файл держится открытым, размер текущего файла
+    считается в памяти, поэтому цена записи не зависит от объёма истории.
+
+    Ротация: max_bytes — по размеру файла, rotate_interval — по возрасту
+    (секунды от начала файла); 0 — без ограничения. Текущий файл
+    переименовывается в <имя>.<время начала>.csv, сжимается gzip в фоновом
+    потоке, хранятся backup_count последних архивов (0 — все).
+    """
+    def __init__(self, log_file, max_bytes=0, rotate_interval=0, backup_count=0, compress=True):
         self.log_file = log_file
-        # Создаем файл с заголовками, если он не существует
-        if not os.path.exists(log_file):
-            with open(log_file, 'w', newline='', encoding='utf-8') as f:
-                writer = csv.writer(f)
-                writer.writerow(['timestamp', 'command', 'error_message'])
+        self.max_bytes = max_bytes
+        self.rotate_interval = rotate_interval
+        self.backup_count = backup_count
+        self.compress = compress
+        # Строки из разных потоков не должны перемежаться
+        self._lock = threading.Lock()
+        self._file = None
+        self._open()
+        if compress:
+            self._recover_archives()
+
+    def _open(self):
+        """Открывает (или создаёт с заголовком) текущий файл лога."""
+        f = open(self.log_file, 'ab')
+        if f.tell() == 0:
+            f.write(_HEADER_BYTES)
+            f.flush()
+        self._file = f
+        self._size = f.tell()
+        self._started = self._first_record_time()
+
+    def _first_record_time(self):
+        """Время первой записи файла (для ротации по времени); для пустого файла — сейчас."""
+        if self._size > len(_HEADER_BYTES):
+            try:
+                with open(self.log_file, 'rb') as f:
+                    f.readline()
+                    stamp = f.readline(64).split(b',', 1)[0].decode('ascii')
+                return datetime.datetime.fromisoformat(stamp).timestamp()
+            except (OSError, ValueError, UnicodeDecodeError):
+                pass
+        return time.time()
+
+    def _archive_pattern(self):
+        root, ext = os.path.splitext(self.log_file)
+        return glob.escape(root) + '.' + '[0-9]' * 8 + '-' + '[0-9]' * 6 + '*' + glob.escape(ext)
+
+    def _archive_name(self):
+        root, ext = os.path.splitext(self.log_file)
+        stamp = datetime.datetime.fromtimestamp(self._started).strftime('%Y%m%d-%H%M%S-%f')
+        name = f"{root}.{stamp}{ext}"
+        n = 1
+        while os.path.exists(name) or os.path.exists(name + ARCHIVE_SUFFIX):
+            n += 1
+            name = f"{root}.{stamp}-{n}{ext}"
+        return name
+
+    def _recover_archives(self):
+        """Дожимает архивы, не сжатые прошлым запуском (процесс завершился до сжатия)."""
+        for path in glob.glob(self._archive_pattern()):
+            if not path.endswith((ARCHIVE_SUFFIX, '.tmp')):
+                _archiver.submit(path, self)
+
+    def archives(self):
+        """Ротированные файлы лога, от старых к новым (сжатые и ещё не сжатые)."""
+        pattern = self._archive_pattern()
+        paths = set(glob.glob(pattern)) | set(glob.glob(pattern + ARCHIVE_SUFFIX))
+        # Имена содержат время начала файла — сортировка по имени хронологическая
+        return sorted(p for p in paths if not p.endswith('.tmp'))
+
+    def prune_archives(self):
+        """Удаляет самые старые архивы сверх backup_count."""
+        if not self.backup_count:
+            return
+        archives = self.archives()
+        for path in archives[:-self.backup_count]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def _should_rotate(self, size):
+        if self._size <= len(_HEADER_BYTES):
+            return False
+        if self.max_bytes and self._size + size > self.max_bytes:
+            return True
+        return bool(self.rotate_interval) and time.time() - self._started >= self.rotate_interval
+
+    def _rotate(self):
+        """Закрывает текущий файл, переименовывает его в архив и открывает новый. Под _lock."""
+        self._file.close()
+        archive = self._archive_name()
+        os.replace(self.log_file, archive)
+        self._open()
+        if self.compress:
+            _archiver.submit(archive, self)
+        elif self.backup_count:
+            _archiver.submit(None, self)
+
+    def _write(self, data):
+        """Дописывает готовые байты строк, при необходимости сначала ротирует файл. Под _lock."""
+        if self._file.closed:
+            # Запись после close() (например, из обработчиков atexit) открывает файл заново
+            self._open()
+        if self.max_bytes or self.rotate_interval:
+            if self._should_rotate(len(data)):
+                self._rotate()
+        self._file.write(data)
+        self._file.flush()
+        self._size += len(data)
 
     def log(self, command, error_message=""):
         """Запись события в лог"""
-        with open(self.log_file, 'a', newline='', encoding='utf-8') as f:
-            writer = csv.writer(f)
-            writer.writerow([
-                datetime.datetime.now().isoformat(),
-                command,
-                error_message
-            ])
\ No newline at end of file
+        data = _encode_rows([(datetime.datetime.now().isoformat(), command, error_message)])
+        with self._lock:
+            self._write(data)
+
+    def set_path(self, log_file):
+        """Переключает запись на другой файл; всё записанное ранее остаётся в старом."""
+        with self._lock:
+            self._flush_locked()
+            self._file.close()
+            self.log_file = log_file
+            self._open()
+
+    def rotate(self):
+        """Принудительная ротация текущего файла."""
+        with self._lock:
+            self._flush_locked()
+            if self._size > len(_HEADER_BYTES):
+                self._rotate()
+
+    def flush(self):
+        """Небуферизованный логгер пишет сразу — сбрасывать нечего."""
+        pass
+
+    def _flush_locked(self):
+        """Дописывает буфер в текущий файл. Под _lock."""
+        pass
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+class BufferedCSVLogger(CSVLogger):
+    """
+    Буферизованный CSV-логгер: копит строки в памяти и сбрасывает их пачками
+    из фонового потока (по количеству строк или по времени).
+    Формат строк и ротация те же, что у CSVLogger.
+    """
+    def __init__(self, log_file, batch_size=1000, flush_interval=1.0, **rotation):
+        super().__init__(log_file, **rotation)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._rows = []
+        self._cond = threading.Condition()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="csvlogger-flush", daemon=True)
+        self._thread.start()
+        # Гарантируем, что хвост буфера попадёт на диск при выходе из программы
+        atexit.register(self.close)
+
+    def log(self, command, error_message=""):
+        """Кладёт запись в буфер; запись на диск делает фоновый поток."""
+        row = (datetime.datetime.now().isoformat(), command, error_message)
+        with self._cond:
+            if not self._closed:
+                self._rows.append(row)
+                if len(self._rows) >= self.batch_size:
+                    self._cond.notify()
+                return
+        # После close() (например, из обработчиков atexit) строка пишется сразу,
+        # как у CSVLogger, — после ещё не сброшенного буфера
+        with self._lock:
+            self._flush_locked()
+            self._write(_encode_rows([row]))
+
+    def _flush_locked(self):
+        # Строки забираются из буфера и пишутся под одной блокировкой _lock,
+        # поэтому пачки попадают в файл в порядке записи и в тот файл, для которого взяты
+        with self._cond:
+            rows = self._rows
+            self._rows = []
+        if rows:
+            self._write(_encode_rows(rows))
+
+    def _run(self):
+        """Фоновый поток: ждёт batch_size строк или flush_interval секунд."""
+        while True:
+            with self._cond:
+                if not self._closed and len(self._rows) < self.batch_size:
+                    self._cond.wait(self.flush_interval)
+                closed = self._closed
+            with self._lock:
+                self._flush_locked()
+            if closed:
+                return
+
+    def flush(self):
+        """Синхронно сбрасывает всё накопленное на диск."""
+        with self._lock:
+            self._flush_locked()
+
+    def close(self):
+        """Останавливает фоновый поток, дописывает буфер и закрывает файл."""
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify()
+        self._thread.join()
+        self.flush()
+        super().close()
+        atexit.unregister(self.close)
@@ -0,0 +1,892 @@
+"""
+Бенчмарки эмулятора VFS.
+Запуск: python bench.py <benchmark> [опции], например: python bench.py load --sizes 10000 100000
+"""
+import argparse
+import collections
+import datetime
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import vfs as vfs_module
+import vfs_generate
+import vfs_snapshot
+
+
+def _quiet(*args, **kwargs):
+    pass
+
+
+def generate_vfs_csv(path, entries, dirs_per_dir=4, files_per_dir=8):
+    """Генерирует сбалансированный CSV-образ VFS из entries записей (обход в ширину)."""
+    vfs_generate.generate_image(path, entries, "balanced", dirs_per_dir=dirs_per_dir, files_per_dir=files_per_dir)
+    return path
+
+
+def _timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def bench_load(args):
+    """Скорость загрузки load_vfs (строк/сек) на образах разного размера."""
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in args.sizes:
+            csv_path = generate_vfs_csv(os.path.join(tmp, f"vfs_{size}.csv"), size)
+            modes = [("bulk", True)]
+            if args.compare:
+                modes.append(("add_node", False))
+            for label, bulk in modes:
+                fs, elapsed = _timed(vfs_module.load_vfs, csv_path, _quiet, bulk=bulk)
+                if fs is None:
+                    raise RuntimeError(f"load_vfs failed for {csv_path}")
+                print(f"load {label:9} {size:>9} rows: {elapsed:8.3f} s  {size / elapsed:12,.0f} rows/s")
+
+
+def bench_memory(args):
+    """Память, занимаемая загруженным деревом: VFSNode против CompactVFSNode."""
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = generate_vfs_csv(os.path.join(tmp, f"vfs_{args.size}.csv"), args.size)
+        variants = [("VFSNode", {}), ("CompactVFSNode", {"compact": True})]
+        if args.lazy:
+            variants += [(f"{label} + lazy", dict(kwargs, lazy_content=True)) for label, kwargs in variants]
+        for label, kwargs in variants:
+            tracemalloc.start()
+            fs = vfs_module.load_vfs(csv_path, _quiet, **kwargs)
+            current, _ = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            if fs is None:
+                raise RuntimeError(f"load_vfs failed for {csv_path}")
+            print(f"memory {label:24} {args.size:>9} nodes: {current / 2 ** 20:9.1f} MiB  "
+                  f"{current / args.size:7.0f} B/node")
+            vfs_module.vfs = fs = None
+
+
+def bench_startup(args):
+    """Время старта: разбор CSV-образа против загрузки бинарного снимка."""
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in args.sizes:
+            csv_path = generate_vfs_csv(os.path.join(tmp, f"vfs_{size}.csv"), size)
+            _, build_time = _timed(vfs_snapshot.build_snapshot, csv_path, None, _quiet)
+            snap_path = vfs_snapshot.snapshot_path_for(csv_path)
+            _, csv_time = _timed(vfs_module.load_vfs, csv_path, _quiet)
+            vfs_module.vfs = None
+            _, snap_time = _timed(vfs_module.load_vfs, snap_path, _quiet)
+            vfs_module.vfs = None
+            print(f"startup {size:>9} nodes: csv {csv_time:7.3f} s  snapshot {snap_time:7.3f} s  "
+                  f"(x{csv_time / snap_time:4.1f}; build {build_time:.3f} s, "
+                  f"{os.path.getsize(snap_path) / 2 ** 20:.1f} MiB)")
+
+
+class _NullLogger:
+    """Логгер-заглушка: в бенчмарках команд меряем разбор и диспетчеризацию, а не запись лога."""
+    def log(self, command, error_message=""):
+        pass
+
+
+REPLAY_COMMANDS = ["ls /", "cd /dir0", "ls", "cat /dir0/file1.txt", "cd ..", "ls dir1/dir2",
+                   "cat file0.txt", "rmdir /no_such", "unknown-cmd arg"]
+
+
+def bench_dispatch(args):
+    """Накладные расходы act() на команду при воспроизведении скрипта."""
+    import emu
+    import shlex
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = generate_vfs_csv(os.path.join(tmp, "vfs.csv"), 1000)
+        emu.vfs = vfs_module.load_vfs(csv_path, _quiet)
+    emu.logger = _NullLogger()
+    commands = [REPLAY_COMMANDS[i % len(REPLAY_COMMANDS)] for i in range(args.commands)]
+    parsed = [(command, shlex.split(command)) for command in commands]
+
+    _, act_time = _timed(lambda: [emu.act(command) for command in commands])
+    _, dispatch_time = _timed(lambda: [emu.dispatch(command, parts) for command, parts in parsed])
+    n = args.commands
+    print(f"act      {n} commands: {act_time:7.3f} s  {act_time / n * 1e6:6.2f} us/command")
+    print(f"dispatch {n} commands: {dispatch_time:7.3f} s  {dispatch_time / n * 1e6:6.2f} us/command "
+          f"(pre-parsed; parsing + env expansion = {(act_time - dispatch_time) / n * 1e6:.2f} us/command)")
+
+
+def bench_script(args):
+    """Воспроизведение стартового скрипта: построчный act() против script_engine (первый и повторный запуск)."""
+    import emu
+    import script_engine
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = generate_vfs_csv(os.path.join(tmp, "vfs.csv"), 1000)
+        emu.vfs = vfs_module.load_vfs(csv_path, _quiet)
+        emu.logger = _NullLogger()
+        commands = [c for c in REPLAY_COMMANDS if not c.startswith("unknown")]
+        script_path = os.path.join(tmp, "script.txt")
+        with open(script_path, "w", encoding="utf-8") as f:
+            for i in range(args.commands):
+                f.write(commands[i % len(commands)] + "\n")
+
+        calls = [0]
+
+        def sink(text):
+            calls[0] += 1
+
+        def line_by_line():
+            with open(script_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    command = line.strip()
+                    sink(f"{emu.vfs_name} {command}")
+                    result = emu.act(command)
+                    if result:
+                        sink(result)
+
+        def engine():
+            script = script_engine.load_script(script_path)
+            script_engine.run_script(script, emu.execute_compiled, sink, emu.vfs_name)
+
+        n = args.commands
+        for label, func in (("line-by-line act()", line_by_line), ("engine, first run", engine),
+                            ("engine, cached", engine)):
+            emu.vfs.change_dir("/")
+            calls[0] = 0
+            _, elapsed = _timed(func)
+            print(f"script {label:20} {n} commands: {elapsed:7.3f} s  {elapsed / n * 1e6:6.2f} us/command  "
+                  f"{calls[0]} output calls")
+        script_engine.clear_script_cache()
+
+
+def generate_package_graph(packages, deps_per_package=3, seed=0):
+    """Синтетический граф пакетов pkgN -> [требования]; зависимости только на пакеты с большим номером."""
+    rng = random.Random(seed)
+    graph = {}
+    for i in range(packages):
+        # Первая зависимость — следующий пакет, так что из pkg0 достижим весь граф
+        deps = {i + 1} if i + 1 < packages else set()
+        while len(deps) < min(deps_per_package, packages - i - 1):
+            deps.add(rng.randrange(i + 1, packages))
+        graph[f"pkg{i}"] = [f"pkg{d}>=1.0" for d in sorted(deps)]
+    return graph
+
+
+def bench_pypi(args):
+    """Пропускная способность транзитивного разрешения зависимостей против локальной заглушки PyPI."""
+    import practice_2
+    import pypi_stub
+
+    graph = generate_package_graph(args.packages)
+    server = pypi_stub.StubPyPIServer(graph, latency=args.latency).start()
+    try:
+        for workers in args.workers:
+            analyzer = practice_2.PackageAnalyzer()
+            # Без дискового кэша: иначе все прогоны после первого обслуживаются из него
+            analyzer.config.update(package_name="pkg0", repo_url=server.repo_url, max_depth=args.max_depth,
+                                   cache_dir="")
+            server.requests = 0
+            (resolved, _, errors), elapsed = _timed(analyzer.resolve_transitive, workers=workers)
+            analyzer.http.close()
+            print(f"pypi workers={workers:3}: {len(resolved)} packages in {elapsed:7.3f} s  "
+                  f"{len(resolved) / elapsed:9.1f} packages/s  {server.requests} requests  {len(errors)} errors")
+    finally:
+        server.stop()
+
+
+def generate_dependency_packages(packages, fanout=3, extra=1, cycle_ratio=0.001, seed=0):
+    """
+    Пакеты тестового репозитория (словарь имя -> требования): пакеты образуют
+    дерево с fanout детьми, плюс extra случайных зависимостей на пакеты с большим
+    номером (общие поддеревья) и с вероятностью cycle_ratio — обратная зависимость (цикл).
+    """
+    rng = random.Random(seed)
+    repository = {}
+    for i in range(packages):
+        deps = [d for d in range(fanout * i + 1, fanout * i + fanout + 1) if d < packages]
+        if i + 1 < packages:
+            deps += [rng.randrange(i + 1, packages) for _ in range(extra)]
+        if i and rng.random() < cycle_ratio:
+            deps.append(rng.randrange(i))
+        repository[f"pkg{i}"] = [f"pkg{d}>=1.0" for d in deps]
+    return repository
+
+
+def generate_dependency_repo(path, packages, **kwargs):
+    """Тестовый репозиторий для PackageAnalyzer: JSON-словарь или, для *.jsonl, JSONL с индексом."""
+    import package_repository
+    repository = generate_dependency_packages(packages, **kwargs)
+    if package_repository.is_repository(path):
+        package_repository.write_repository(path, repository)
+    else:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(repository, f)
+    return path
+
+
+class _CountingSink:
+    def __init__(self):
+        self.chars = 0
+
+    def write(self, text):
+        self.chars += len(text)
+
+
+def bench_graph(args):
+    """Граф зависимостей из тестового репозитория: построение, поиск циклов и вывод ASCII-дерева."""
+    import practice_2
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in args.sizes:
+            repo_path = generate_dependency_repo(os.path.join(tmp, f"repo_{size}.json"), size)
+            analyzer = practice_2.PackageAnalyzer()
+            analyzer.config.update(package_name="pkg0", repo_url=repo_path, test_mode=True,
+                                   max_depth=args.max_depth)
+            _, load_time = _timed(analyzer.load_test_repository)
+            (graph, _), build_time = _timed(analyzer.build_graph)
+            cycles, cycle_time = _timed(graph.find_cycles)
+            sink = _CountingSink()
+            lines, tree_time = _timed(graph.write_tree, sink, args.max_depth)
+            print(f"graph {size:>9} packages, {len(graph.targets)} edges: load {load_time:6.3f} s  "
+                  f"build {build_time:6.3f} s  cycles {cycle_time:6.3f} s ({len(cycles)})  "
+                  f"tree {tree_time:6.3f} s ({lines} lines, {sink.chars / 2 ** 20:.1f} MiB)")
+
+
+_MARKERS = ['extra == "{extra}"', 'python_version < "3.8"', 'python_version >= "3.8"',
+            'sys_platform == "win32"', 'platform_system != "Windows" and extra == "{extra}"']
+
+
+def generate_requires_dist(packages, requirements, distinct=20000, seed=0):
+    """
+    Списки requires_dist размером с метаданные крупных пакетов: версии, extras и маркеры.
+    Строки требований берутся из пула distinct вариантов — в реальных метаданных
+    одни и те же требования повторяются у многих пакетов.
+    """
+    rng = random.Random(seed)
+    names = [f"{rng.choice(['py', 'lib', 'django-', 'zope.', 'aws_'])}name{i}" for i in range(2000)]
+    pool = []
+    for _ in range(distinct):
+        requirement = f"{rng.choice(names)}>={rng.randrange(10)}.{rng.randrange(10)}"
+        if rng.random() < 0.6:
+            marker = rng.choice(_MARKERS).format(extra=rng.choice(["dev", "test", "docs", "aws"]))
+            requirement += f"; {marker}"
+        pool.append(requirement)
+    return [[rng.choice(pool) for _ in range(requirements)] for _ in range(packages)]
+
+
+def _legacy_requirement_names(requires_dist):
+    """Прежний разбор parse_dependencies: re.match на каждую строку и поиск повтора в списке."""
+    import re
+    dependencies = []
+    for dep in requires_dist:
+        if 'extra' in dep:
+            continue
+        match = re.match(r"^([a-zA-Z\d_-]+)\s*", dep.split(';')[0].strip())
+        if match:
+            package_name = match.group(1)
+            if package_name not in dependencies:
+                dependencies.append(package_name)
+    return dependencies
+
+
+def bench_requirements(args):
+    """Разбор requires_dist: прежний построчный re.match против pep508 (с маркерами, пакетом и поштучно)."""
+    import pep508
+
+    batch = generate_requires_dist(args.packages, args.requirements, args.distinct)
+    total = args.packages * args.requirements
+    environment = pep508.default_environment()
+    pep508.parse_requirement.cache_clear()
+    pep508.compile_marker.cache_clear()
+    cases = [
+        ("legacy re.match", lambda: [_legacy_requirement_names(r) for r in batch]),
+        ("pep508 batch, cold", lambda: pep508.batch_requirement_names(batch, environment)),
+        ("pep508 batch, warm", lambda: pep508.batch_requirement_names(batch, environment)),
+        ("pep508 per package", lambda: [pep508.requirement_names(r, environment) for r in batch]),
+    ]
+    for label, func in cases:
+        _, elapsed = _timed(func)
+        print(f"requirements {label:20} {total} entries: {elapsed:7.3f} s  {total / elapsed:12,.0f} entries/s")
+
+
+def bench_repository(args):
+    """Тестовый репозиторий: JSON-словарь целиком против JSONL с индексом (mmap, поиск O(1))."""
+    import package_repository
+    import practice_2
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in args.sizes:
+            packages = generate_dependency_packages(size)
+            json_path = os.path.join(tmp, f"repo_{size}.json")
+            with open(json_path, "w", encoding="utf-8") as f:
+                json.dump(packages, f)
+            jsonl_path = os.path.join(tmp, f"repo_{size}.jsonl")
+            package_repository.write_repository(jsonl_path, packages)
+            _, index_time = _timed(package_repository.build_index, jsonl_path)
+            names = random.Random(0).choices(list(packages), k=args.lookups)
+            del packages
+
+            for label, path in (("json", json_path), ("jsonl+index", jsonl_path)):
+                analyzer = practice_2.PackageAnalyzer()
+                analyzer.config.update(package_name="pkg0", repo_url=path, test_mode=True,
+                                       max_depth=args.max_depth)
+                repository, open_time = _timed(analyzer.load_test_repository)
+                _, lookup_time = _timed(lambda: [repository.get(name) for name in names])
+                (graph, _), graph_time = _timed(analyzer.build_graph)
+                print(f"repository {label:12} {size:>8} packages: open {open_time:7.3f} s  "
+                      f"{args.lookups / lookup_time:10,.0f} lookups/s  "
+                      f"graph of {len(graph)} in {graph_time:6.3f} s")
+            print(f"repository index build {size:>8} packages: {index_time:7.3f} s")
+
+
+def bench_journal(args):
+    """Журнал изменений VFS: fsync на каждую запись против group commit; восстановление до и после компактирования."""
+    import vfs_journal
+
+    n = args.mutations
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = generate_vfs_csv(os.path.join(tmp, "vfs.csv"), args.size)
+
+        def mutate(fs):
+            for i in range(n // 2):
+                fs.add_node(f"/bench/d{i}", True)
+            for i in range(n // 2):
+                fs.remove_dir(f"/bench/d{i}")
+            fs.journal.flush()
+
+        for label, wait in (("fsync per record", True), ("group commit", False)):
+            fs = vfs_journal.restore(csv_path, _quiet, compact_records=0)
+            fs.journal.sync = wait
+            _, elapsed = _timed(mutate, fs)
+            fs.journal.close()
+            print(f"journal {label:17} {n} mutations: {elapsed:7.3f} s  {n / elapsed:10,.0f} mutations/s")
+
+        journal_path = vfs_journal.journal_path_for(csv_path)
+        fs, restore_time = _timed(vfs_journal.restore, csv_path, _quiet, compact_records=0)
+        print(f"journal restore: image + {2 * n} records ({os.path.getsize(journal_path) / 2 ** 20:.1f} MiB) "
+              f"in {restore_time:7.3f} s")
+        _, compact_time = _timed(fs.journal.compact, fs)
+        fs.journal.close()
+        fs, restore_time = _timed(vfs_journal.restore, csv_path, _quiet, compact_records=0)
+        fs.journal.close()
+        print(f"journal restore: compacted snapshot in {restore_time:7.3f} s (compaction {compact_time:.3f} s)")
+
+
+def bench_server(args):
+    """Сервер сеансов: память на сеанс (сеансов на ГиБ) и команд в секунду через локальный сокет."""
+    import asyncio
+    import emu
+    import vfs_overlay
+    import vfs_server
+
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = generate_vfs_csv(os.path.join(tmp, "vfs.csv"), args.size)
+        tracemalloc.start()
+        base = vfs_module.load_vfs(csv_path, _quiet, compact=True)
+        base_bytes = tracemalloc.get_traced_memory()[0]
+        empty_dirs = [node.path() for node in base.iter_subtree(base.root) if node.is_dir and not node.children]
+
+        before = tracemalloc.get_traced_memory()[0]
+        sessions = [vfs_overlay.OverlayVFS(base) for _ in range(args.sessions)]
+        pristine = (tracemalloc.get_traced_memory()[0] - before) / args.sessions
+        for i, session in enumerate(sessions):
+            session.change_dir("/dir0")
+            session.remove_dir(empty_dirs[i % len(empty_dirs)])
+        modified = (tracemalloc.get_traced_memory()[0] - before) / args.sessions
+        tracemalloc.stop()
+        del sessions
+
+    gib = 2 ** 30
+    print(f"server base tree {args.size} nodes: {base_bytes / 2 ** 20:.1f} MiB "
+          f"(a full tree per session: {gib / base_bytes:,.0f} sessions/GiB)")
+    print(f"server overlay, pristine:   {pristine:8.0f} B/session  {gib / pristine:12,.0f} sessions/GiB")
+    print(f"server overlay, after rmdir: {modified:7.0f} B/session  {gib / modified:12,.0f} sessions/GiB")
+
+    emu.logger = _NullLogger()
+    commands = [c for c in REPLAY_COMMANDS if not c.startswith("rmdir")]
+
+    async def run():
+        server = await vfs_server.VFSServer(base, lambda command, fs: emu.act(command, fs)).start()
+
+        async def client(i):
+            reader, writer = await asyncio.open_connection(server.host, server.port)
+            for j in range(args.commands):
+                await vfs_server.request(reader, writer, commands[(i + j) % len(commands)])
+            writer.close()
+            await writer.wait_closed()
+
+        start = time.perf_counter()
+        await asyncio.gather(*(client(i) for i in range(args.clients)))
+        elapsed = time.perf_counter() - start
+        await server.stop()
+        return server.commands, elapsed
+
+    total, elapsed = asyncio.run(run())
+    print(f"server {args.clients} concurrent sessions: {total} commands in {elapsed:7.3f} s  "
+          f"{total / elapsed:10,.0f} commands/s")
+
+
+def _check_tree(fs):
+    """Проверка целостности дерева после нагрузки: ссылки на родителей, индекс имён и итоги поддеревьев."""
+    counts = collections.Counter()
+    for node in fs.iter_subtree(fs.root):
+        if node is fs.root:
+            continue
+        counts[node.name] += 1
+        assert node.parent.children.get(node.name) is node, f"broken parent link: {node.path()}"
+    if fs._name_index is not None:
+        indexed = collections.Counter({name: len(nodes) for name, nodes in fs._name_index.items()})
+        assert indexed == counts, "name index does not match the tree"
+    if fs._totals is not None:
+        totals = {node: [0, 0, 0] for node in fs.iter_subtree(fs.root) if node.is_dir}
+        for node in fs.iter_subtree(fs.root):
+            if node is fs.root:
+                continue
+            ancestor = node.parent
+            while ancestor is not None:
+                entry = totals[ancestor]
+                if node.is_dir:
+                    entry[1] += 1
+                else:
+                    entry[0] += 1
+                    entry[2] += fs._content_size(node)
+                ancestor = ancestor.parent
+        assert fs._totals == totals, "subtree totals do not match the tree"
+
+
+def bench_threads(args):
+    """Параллельные сеансы: читатели (ls/cat/find/cd) и писатели (add_node/rmdir) над одним деревом."""
+    import threading
+    import emu
+
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = generate_vfs_csv(os.path.join(tmp, "vfs.csv"), args.size)
+        fs = vfs_module.load_vfs(csv_path, _quiet)
+    emu.logger = _NullLogger()
+    commands = [c for c in REPLAY_COMMANDS if not c.startswith("rmdir")] + ["find /dir0/dir1 file3", "du -d 1 /"]
+
+    def reader(session, errors):
+        try:
+            for i in range(args.commands):
+                emu.output_result(emu.act(commands[i % len(commands)], session), _quiet)
+        except Exception as e:
+            errors.append(e)
+
+    def writer(w, session, errors):
+        try:
+            # Каждый каталог создаётся и сразу удаляется: дерево после прогона то же
+            for i in range(args.commands // 2):
+                session.add_node(f"/stress/w{w}/d{i}", True)
+                emu.act(f"rmdir /stress/w{w}/d{i}", session)
+        except Exception as e:
+            errors.append(e)
+
+    for threads in args.threads:
+        for writers in (0, max(1, threads // 4)):
+            errors = []
+            workers = [threading.Thread(target=reader, args=(emu.new_session(fs), errors))
+                       for _ in range(threads)]
+            workers += [threading.Thread(target=writer, args=(w, emu.new_session(fs), errors))
+                        for w in range(writers)]
+            start = time.perf_counter()
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
+            elapsed = time.perf_counter() - start
+            if errors:
+                raise errors[0]
+            _check_tree(fs)
+            ops = threads * args.commands + writers * (args.commands // 2) * 2
+            print(f"threads {threads:3} readers + {writers:2} writers: {ops} ops in {elapsed:7.3f} s  "
+                  f"{ops / elapsed:10,.0f} ops/s")
+    leftovers = [node.path() for node in fs.iter_subtree(fs.get_node("/stress") or fs.root)
+                 if node.name.startswith("d") and node.path().startswith("/stress/")]
+    assert not leftovers, f"writers left directories behind: {leftovers[:5]}"
+    print("tree integrity: ok")
+
+
+LOG_COMMANDS = [("ls /", ""), ("cd /dir0", ""), ("cat /dir0/file1.txt", ""), ("find / file3", ""),
+                ("cat /missing.txt", "No such file: /missing.txt"), ("rmdir /dir0", "Directory not empty"),
+                ("qwe", "qwe: command not found"), ("ls dir1/dir2", ""), ("cd ..", ""),
+                ("set parameter --log-path x.csv", "")]
+
+
+def generate_log_csv(path, rows, rows_per_second=50, seed=0):
+    """Генерирует журнал команд в формате CSVLogger из rows строк (rows_per_second строк в секунду)."""
+    rng = random.Random(seed)
+    pool = [f"{command},{error}\n" for command, error in LOG_COMMANDS]
+    # Ошибочные команды встречаются реже
+    weights = [1 if error else 6 for _, error in LOG_COMMANDS]
+    start = datetime.datetime(2025, 1, 1)
+    step = 1_000_000 // rows_per_second
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        f.write("timestamp,command,error_message\n")
+        for second in range(0, rows // rows_per_second + 1):
+            count = min(rows_per_second, rows - second * rows_per_second)
+            if count <= 0:
+                break
+            prefix = (start + datetime.timedelta(seconds=second)).isoformat()
+            lines = rng.choices(pool, weights, k=count)
+            f.write("".join(f"{prefix}.{i * step:06d},{line}" for i, line in enumerate(lines)))
+    return path
+
+
+def bench_logs(args):
+    """Анализ журнала команд: строк в секунду на 1 и N процессах, пиковая память однопроцессного прохода."""
+    import log_analytics
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "emu_log.csv")
+        _, gen_time = _timed(generate_log_csv, path, args.rows)
+        size_mb = os.path.getsize(path) / 2 ** 20
+        print(f"logs generated {args.rows:,} rows ({size_mb:.0f} MiB) in {gen_time:.1f} s")
+
+        reference = None
+        for workers in args.workers:
+            stats, elapsed = _timed(log_analytics.analyze, path, args.bucket, workers)
+            result = stats.to_dict()
+            if reference is None:
+                reference = result
+            assert result == reference, f"{workers} workers disagree with {args.workers[0]}"
+            assert stats.rows == args.rows, f"counted {stats.rows} rows of {args.rows}"
+            print(f"logs {workers:3} workers: {elapsed:7.2f} s  {stats.rows / elapsed:12,.0f} rows/s  "
+                  f"{size_mb / elapsed:7.1f} MiB/s  ({len(stats.commands)} commands, "
+                  f"{len(stats.bucket_starts)} {args.bucket} buckets)")
+
+        tracemalloc.start()
+        log_analytics.analyze(path, args.bucket, 1)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print(f"logs peak memory, 1 worker: {peak / 2 ** 20:.1f} MiB for a {size_mb:.0f} MiB log "
+              f"(chunk {log_analytics.CHUNK_BYTES // 2 ** 20} MiB)")
+
+
+def bench_logging(args):
+    """Запись лога команд: строк в секунду при разном объёме истории; ротация со сжатием в фоне."""
+    import CSVlogger
+
+    n = args.rows
+    for history in args.history:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "emu_log.csv")
+            generate_log_csv(path, history)
+            history_mb = os.path.getsize(path) / 2 ** 20
+            variants = (
+                ("plain", lambda: CSVlogger.CSVLogger(path)),
+                ("buffered", lambda: CSVlogger.BufferedCSVLogger(path)),
+                (f"rotating {args.max_mb} MB", lambda: CSVlogger.CSVLogger(
+                    path, max_bytes=int(args.max_mb * 2 ** 20), backup_count=args.backups)),
+            )
+            for label, make in variants:
+                logger = make()
+
+                def write():
+                    for i in range(n):
+                        logger.log(LOG_COMMANDS[i % len(LOG_COMMANDS)][0], LOG_COMMANDS[i % len(LOG_COMMANDS)][1])
+                    logger.close()
+
+                _, elapsed = _timed(write)
+                CSVlogger.wait_for_archives()
+                archives = len(logger.archives())
+                print(f"logging history {history_mb:7.1f} MiB {label:16}: {n / elapsed:10,.0f} rows/s"
+                      + (f"  ({archives} archives kept)" if archives else ""))
+
+
+def bench_stats(args):
+    """Накладные расходы замеров команд: act() с выключенными замерами, включёнными и с профилированием."""
+    import emu
+    import instrumentation
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = generate_vfs_csv(os.path.join(tmp, "vfs.csv"), 1000)
+        emu.vfs = vfs_module.load_vfs(csv_path, _quiet)
+    emu.logger = _NullLogger()
+    commands = [REPLAY_COMMANDS[i % len(REPLAY_COMMANDS)] for i in range(args.commands)]
+    n = args.commands
+
+    def run():
+        for command in commands:
+            emu.act(command)
+
+    results = {}
+    for label, profile_every in (("disabled", None), ("enabled", 0), (f"profiling 1/{args.profile_every}",
+                                                                      args.profile_every)):
+        if profile_every is None:
+            instrumentation.disable()
+        else:
+            instrumentation.enable(profile_every)
+        # Лучший из нескольких прогонов — меньше шума планировщика
+        elapsed = min(_timed(run)[1] for _ in range(args.repeat))
+        results[label] = elapsed
+        print(f"stats {label:18} {n} commands: {elapsed / n * 1e6:6.2f} us/command "
+              f"(+{(elapsed / results['disabled'] - 1) * 100:5.1f}%)")
+    stats = instrumentation.disable()
+    print(stats.report())
+
+
+# Операции набора suite: все значения — время (секунды или микросекунды на операцию), меньше — лучше
+SUITE_QUERIES = 50
+SUITE_RMDIRS = 1000
+
+
+def _git_revision():
+    """(коммит, есть ли незакоммиченные изменения) для дерева с bench.py или (None, None)."""
+    repo = os.path.dirname(os.path.abspath(__file__))
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=repo, capture_output=True,
+                                text=True, timeout=10).stdout.strip()
+        status = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=repo,
+                                capture_output=True, text=True, timeout=60).stdout
+    except (OSError, subprocess.SubprocessError):
+        return None, None
+    return commit or None, bool(status.strip()) if commit else None
+
+
+def _best(repeat, func):
+    """Лучшее время из repeat прогонов func."""
+    return min(_timed(func)[1] for _ in range(repeat))
+
+
+def _suite_image(args, tmp, shape, size):
+    """Образ формы shape из size узлов: (путь, ImageInfo, время генерации или None, если взят готовый)."""
+    directory = args.data_dir or tmp
+    path = os.path.join(directory, f"vfs_{shape}_{size}_s{args.seed}.csv")
+    if args.data_dir and os.path.exists(path):
+        return path, vfs_generate.scan_image(path, seed=args.seed, shape=shape), None
+    info, elapsed = _timed(vfs_generate.generate_image, path, size, shape, args.seed)
+    return path, info, elapsed
+
+
+def _suite_case(args, tmp, path, info):
+    """Замеры одного образа: [(метрика, значение, единица)]."""
+    import emu
+    import script_engine
+    results = []
+    fs, elapsed = _timed(vfs_module.load_vfs, path, _quiet)
+    if fs is None:
+        raise RuntimeError(f"load_vfs failed for {path}")
+    results.append(("load", elapsed, "s"))
+
+    paths = (info.dir_samples + info.file_samples) or ["/"]
+    per_op = 1e6 / len(paths)
+    results.append(("resolve_cold", _best(args.repeat, lambda: [fs._walk(p, fs.root) for p in paths]) * per_op,
+                    "us/op"))
+    for p in paths:
+        fs._resolve(p, fs.root)
+    results.append(("resolve_warm", _best(args.repeat, lambda: [fs._resolve(p, fs.root) for p in paths]) * per_op,
+                    "us/op"))
+
+    rng = random.Random(args.seed)
+    starts = [fs.get_node(p) for p in (info.dir_samples or ["/"])]
+    names = [p.rsplit("/", 1)[1] for p in (info.file_samples or ["/file0.txt"])]
+    queries = [(rng.choice(starts), rng.choice(names)) for _ in range(SUITE_QUERIES)]
+    # Первый find строит индекс имён
+    _, elapsed = _timed(lambda: list(fs.find(fs.root, names[0])))
+    results.append(("find_first", elapsed, "s"))
+    elapsed = _best(args.repeat, lambda: [list(fs.find(node, pattern)) for node, pattern in queries])
+    results.append(("find", elapsed / len(queries) * 1e6, "us/op"))
+
+    files = info.file_samples or ["/file0.txt"]
+    elapsed = _best(args.repeat, lambda: [fs.read_file(p) for p in files])
+    results.append(("cat", elapsed / len(files) * 1e6, "us/op"))
+
+    def rmdir_run():
+        fs.add_node("/bench_rmdir", True)
+        created = [f"/bench_rmdir/d{i}" for i in range(SUITE_RMDIRS)]
+        for p in created:
+            fs.add_node(p, True)
+        _, elapsed = _timed(lambda: [fs.remove_dir(p) for p in created])
+        return elapsed
+    elapsed = min(rmdir_run() for _ in range(args.repeat))
+    results.append(("rmdir", elapsed / SUITE_RMDIRS * 1e6, "us/op"))
+
+    script_path = os.path.join(tmp, "suite_script.txt")
+    vfs_generate.generate_script(script_path, info, args.commands, args.seed)
+    emu.vfs = fs
+    emu.logger = _NullLogger()
+
+    def replay():
+        # Разбор скрипта входит в замер: кэш скомпилированных скриптов сбрасывается
+        script_engine.clear_script_cache()
+        fs.change_dir("/")
+        script = script_engine.load_script(script_path)
+        script_engine.run_script(script, emu.execute_compiled, _quiet, emu.vfs_name)
+    results.append(("script", _best(args.repeat, replay) / args.commands * 1e6, "us/command"))
+
+    emu.vfs = vfs_module.vfs = None
+    return results
+
+
+def bench_suite(args):
+    """Набор замеров load_vfs, _resolve, find, cat, rmdir и скрипта на синтетических образах; итог — JSON."""
+    commit, dirty = _git_revision()
+    report = {"meta": {"commit": commit, "dirty": dirty, "python": platform.python_version(),
+                       "implementation": platform.python_implementation(), "platform": platform.platform(),
+                       "cpus": os.cpu_count(), "time": datetime.datetime.now().isoformat(timespec="seconds"),
+                       "args": {key: value for key, value in vars(args).items() if key != "benchmark"}},
+              "results": []}
+    if args.data_dir:
+        os.makedirs(args.data_dir, exist_ok=True)
+    with tempfile.TemporaryDirectory() as tmp:
+        for shape in args.shapes:
+            for size in args.sizes:
+                path, info, generated = _suite_image(args, tmp, shape, size)
+                case = [("generate", generated, "s")] if generated is not None else []
+                case += _suite_case(args, tmp, path, info)
+                if not args.data_dir:
+                    os.remove(path)
+                for metric, value, unit in case:
+                    print(f"suite {shape:10} {size:>9} {metric:13} {value:12.3f} {unit}")
+                    report["results"].append({"shape": shape, "nodes": size, "metric": metric,
+                                              "value": value, "unit": unit})
+
+    out = args.json
+    if out is None:
+        stamp = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
+        out = os.path.join("bench_results", f"suite-{stamp}-{(commit or 'unknown')[:10]}.json")
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=1)
+    print(f"results written to {out}")
+
+
+def bench_compare(args):
+    """Сравнивает два JSON-результата suite; код выхода 1, если есть замедления больше порога."""
+    with open(args.base, "r", encoding="utf-8") as f:
+        base = json.load(f)
+    with open(args.new, "r", encoding="utf-8") as f:
+        new = json.load(f)
+    baseline = {(r["shape"], r["nodes"], r["metric"]): r for r in base["results"]}
+    print(f"base: {base['meta'].get('commit')}  new: {new['meta'].get('commit')}")
+    regressions = 0
+    for result in new["results"]:
+        old = baseline.get((result["shape"], result["nodes"], result["metric"]))
+        if old is None or not old["value"]:
+            continue
+        ratio = result["value"] / old["value"]
+        flag = ""
+        if ratio > 1 + args.threshold:
+            flag = "  REGRESSION"
+            regressions += 1
+        elif ratio < 1 - args.threshold:
+            flag = "  faster"
+        print(f"{result['shape']:10} {result['nodes']:>9} {result['metric']:13} {old['value']:12.3f} -> "
+              f"{result['value']:12.3f} {result['unit']:10} x{ratio:5.2f}{flag}")
+    print(f"{regressions} regressions (threshold {args.threshold * 100:.0f}%)")
+    if regressions:
+        sys.exit(1)
+
+
+BENCHMARKS = {
+    "load": bench_load,
+    "memory": bench_memory,
+    "startup": bench_startup,
+    "dispatch": bench_dispatch,
+    "script": bench_script,
+    "pypi": bench_pypi,
+    "graph": bench_graph,
+    "requirements": bench_requirements,
+    "repository": bench_repository,
+    "journal": bench_journal,
+    "server": bench_server,
+    "threads": bench_threads,
+    "logs": bench_logs,
+    "logging": bench_logging,
+    "stats": bench_stats,
+    "suite": bench_suite,
+    "compare": bench_compare,
+}
+
+
+def main(args_list=None):
+    parser = argparse.ArgumentParser(description="VFS emulator benchmarks")
+    sub = parser.add_subparsers(dest="benchmark", required=True)
+
+    p = sub.add_parser("load", help=bench_load.__doc__)
+    p.add_argument("--sizes", type=int, nargs="+", default=[10 ** 4, 10 ** 5, 10 ** 6])
+    p.add_argument("--compare", action="store_true", help="also time the row-by-row add_node loader")
+
+    p = sub.add_parser("memory", help=bench_memory.__doc__)
+    p.add_argument("--size", type=int, default=10 ** 6)
+    p.add_argument("--lazy", action="store_true", help="also measure with lazy_content=True")
+
+    p = sub.add_parser("startup", help=bench_startup.__doc__)
+    p.add_argument("--sizes", type=int, nargs="+", default=[10 ** 4, 10 ** 5, 10 ** 6])
+
+    p = sub.add_parser("dispatch", help=bench_dispatch.__doc__)
+    p.add_argument("--commands", type=int, default=10 ** 5)
+
+    p = sub.add_parser("script", help=bench_script.__doc__)
+    p.add_argument("--commands", type=int, default=10 ** 5)
+
+    p = sub.add_parser("pypi", help=bench_pypi.__doc__)
+    p.add_argument("--packages", type=int, default=1000)
+    p.add_argument("--max-depth", type=int, default=10 ** 6)
+    p.add_argument("--latency", type=float, default=0.005, help="stub server response delay, seconds")
+    p.add_argument("--workers", type=int, nargs="+", default=[1, 4, 16, 32])
+
+    p = sub.add_parser("graph", help=bench_graph.__doc__)
+    p.add_argument("--sizes", type=int, nargs="+", default=[10 ** 4, 10 ** 5])
+    p.add_argument("--max-depth", type=int, default=10 ** 6)
+
+    p = sub.add_parser("requirements", help=bench_requirements.__doc__)
+    p.add_argument("--packages", type=int, default=2000)
+    p.add_argument("--requirements", type=int, default=150, help="requires_dist entries per package")
+    p.add_argument("--distinct", type=int, default=20000, help="distinct requirement strings in the pool")
+
+    p = sub.add_parser("repository", help=bench_repository.__doc__)
+    p.add_argument("--sizes", type=int, nargs="+", default=[10 ** 4, 10 ** 5, 10 ** 6])
+    p.add_argument("--lookups", type=int, default=10 ** 5)
+    p.add_argument("--max-depth", type=int, default=3)
+
+    p = sub.add_parser("journal", help=bench_journal.__doc__)
+    p.add_argument("--size", type=int, default=10 ** 5, help="VFS image entries")
+    p.add_argument("--mutations", type=int, default=2000)
+
+    p = sub.add_parser("server", help=bench_server.__doc__)
+    p.add_argument("--size", type=int, default=10 ** 5, help="VFS image entries")
+    p.add_argument("--sessions", type=int, default=10000, help="overlays created for the memory measurement")
+    p.add_argument("--clients", type=int, default=200, help="concurrent socket sessions")
+    p.add_argument("--commands", type=int, default=100, help="commands per socket session")
+
+    p = sub.add_parser("threads", help=bench_threads.__doc__)
+    p.add_argument("--size", type=int, default=20000, help="VFS image entries")
+    p.add_argument("--commands", type=int, default=2000, help="commands per thread")
+    p.add_argument("--threads", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+
+    p = sub.add_parser("logs", help=bench_logs.__doc__)
+    p.add_argument("--rows", type=int, default=10 ** 7)
+    p.add_argument("--bucket", default="hour", choices=["second", "minute", "hour", "day"])
+    p.add_argument("--workers", type=int, nargs="+", default=[1, os.cpu_count() or 1])
+
+    p = sub.add_parser("logging", help=bench_logging.__doc__)
+    p.add_argument("--rows", type=int, default=10 ** 5, help="rows written per variant")
+    p.add_argument("--history", type=int, nargs="+", default=[0, 10 ** 6, 10 ** 7],
+                   help="rows already in the log before the run")
+    p.add_argument("--max-mb", type=float, default=1.0, help="rotation size for the rotating variant")
+    p.add_argument("--backups", type=int, default=5)
+
+    p = sub.add_parser("stats", help=bench_stats.__doc__)
+    p.add_argument("--commands", type=int, default=10 ** 5)
+    p.add_argument("--repeat", type=int, default=3)
+    p.add_argument("--profile-every", type=int, default=100)
+
+    p = sub.add_parser("suite", help=bench_suite.__doc__)
+    p.add_argument("--shapes", nargs="+", choices=vfs_generate.SHAPES, default=list(vfs_generate.SHAPES))
+    p.add_argument("--sizes", type=int, nargs="+", default=[10 ** 4, 10 ** 5, 10 ** 6])
+    p.add_argument("--commands", type=int, default=2000, help="commands in the replayed script")
+    p.add_argument("--repeat", type=int, default=3, help="runs per measurement (best is reported)")
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--data-dir", help="keep generated images here and reuse them on later runs")
+    p.add_argument("--json", metavar="PATH", help="results file (default: bench_results/suite-<time>-<commit>.json)")
+
+    p = sub.add_parser("compare", help=bench_compare.__doc__)
+    p.add_argument("base", help="baseline suite JSON")
+    p.add_argument("new", help="suite JSON to check")
+    p.add_argument("--threshold", type=float, default=0.1, help="allowed slowdown, fraction")
+
+    args = parser.parse_args(args_list)
+    BENCHMARKS[args.benchmark](args)
+
+
+if __name__ == "__main__":
+    main()
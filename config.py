@@ -1,22 +1,57 @@
 import argparse
 import re
-from CSVlogger import CSVLogger
+from CSVlogger import CSVLogger, BufferedCSVLogger
 from vfs import VirtualFileSystem, load_vfs
+import atexit
 import os
+import threading
 
 vfs_path = None
 log_path = None
 stscript_path = None
 logger = None
+# Параметры создания логгера (буферизация, ротация) — для set parameter --log-path
+log_options = {}
+plugin_modules = []
+# set parameter может вызываться из нескольких потоков эмулятора
+_settings_lock = threading.Lock()
 
 def init_config(args_list=None, output_func=print):
     """Инициализация конфигурации из аргументов командной строки"""
-    global vfs_path, log_path, stscript_path, logger
+    global vfs_path, log_path, stscript_path, logger, log_options, plugin_modules
 
     parser = argparse.ArgumentParser(description='VFS Emulator')
-    parser.add_argument('--vfs-path', help='Path to VFS physical location')
+    parser.add_argument('--vfs-path', help='Path to VFS physical location (CSV image or binary .vfsnap snapshot)')
     parser.add_argument('--log-path', help='Path to log file')
     parser.add_argument('--stscript-path', help='Path to startup script')
+    parser.add_argument('--log-buffered', action='store_true',
+                        help='Buffer log rows and flush them in batches from a background thread')
+    parser.add_argument('--log-max-mb', type=float, default=0,
+                        help='Rotate the log when it grows beyond this size, MB (0 - never)')
+    parser.add_argument('--log-rotate-hours', type=float, default=0,
+                        help='Rotate the log when its first record is older than this, hours (0 - never)')
+    parser.add_argument('--log-backups', type=int, default=0,
+                        help='Keep only this many rotated (gzip-compressed) logs (0 - keep all)')
+    parser.add_argument('--lazy-content', action='store_true',
+                        help='Do not keep file contents in memory; read them from the VFS image on demand')
+    parser.add_argument('--content-cache-mb', type=int, default=16,
+                        help='Size of the in-memory cache for lazily loaded file contents, MB')
+    parser.add_argument('--compact-nodes', action='store_true',
+                        help='Use __slots__-based VFS nodes to reduce memory per node')
+    parser.add_argument('--plugin', action='append', default=[], metavar='MODULE',
+                        help='Import a module that registers extra commands (may be repeated)')
+    parser.add_argument('--vfs-snapshot', action='store_true',
+                        help='Load the VFS from a binary snapshot next to the CSV image, rebuilding it when the CSV changes')
+    parser.add_argument('--journal', action='store_true',
+                        help='Persist VFS changes in a journal next to the image and restore them on start')
+    parser.add_argument('--stats', action='store_true',
+                        help='Measure per-command and per-phase latency (see the stats command)')
+    parser.add_argument('--stats-dump', metavar='PATH',
+                        help='Write the latency statistics as JSON to PATH on exit (implies --stats)')
+    parser.add_argument('--profile-every', type=int, default=0, metavar='N',
+                        help='Run one in every N commands under cProfile (implies --stats)')
+    parser.add_argument('--profile-dump', metavar='PATH',
+                        help='Save the accumulated cProfile data to PATH on exit (pstats format)')
 
     # Важно: передаём args_list в parse_args — если args_list=None, argparse использует sys.argv
     args = parser.parse_args(args_list)
@@ -25,14 +60,25 @@ def init_config(args_list=None, output_func=print):
     vfs_path = args.vfs_path or os.getcwd()
     log_path = args.log_path or 'emu_log.csv'
     stscript_path = args.stscript_path or 'start_script.txt'
+    plugin_modules = args.plugin
 
     # Вывод отладочной информации через переданную функцию (print или GUI printer)
     output_func(f"Debug: VFS Path = {vfs_path}")
     output_func(f"Debug: Log Path = {log_path}")
     output_func(f"Debug: Startup Script Path = {stscript_path}")
 
+    if args.stats or args.stats_dump or args.profile_every:
+        import instrumentation
+        stats = instrumentation.enable(args.profile_every)
+        if args.stats_dump:
+            atexit.register(stats.dump, args.stats_dump)
+        if args.profile_dump:
+            atexit.register(stats.dump_profile, args.profile_dump)
+
     # Инициализация логгера
-    logger = CSVLogger(log_path)
+    log_options = dict(buffered=args.log_buffered, max_bytes=int(args.log_max_mb * 1024 * 1024),
+                       rotate_interval=args.log_rotate_hours * 3600, backup_count=args.log_backups)
+    logger = create_logger(log_path, **log_options)
 
     if os.path.isdir(vfs_path):
         vfs_csv = os.path.join(vfs_path, 'vfs.csv')
@@ -40,10 +86,24 @@ def init_config(args_list=None, output_func=print):
         vfs_csv = vfs_path
 
     if os.path.exists(vfs_csv):
-        load_vfs(vfs_csv, output_func)
+        load_options = dict(lazy_content=args.lazy_content,
+                            content_cache_bytes=args.content_cache_mb * 1024 * 1024,
+                            compact=args.compact_nodes, snapshot=args.vfs_snapshot)
+        if args.journal:
+            import vfs_journal
+            vfs_journal.restore(vfs_csv, output_func, **load_options)
+        else:
+            load_vfs(vfs_csv, output_func, **load_options)
     else:
         output_func(f"No VFS file found at {vfs_csv}")
 
+def create_logger(path, buffered=False, **rotation):
+    """Логгер команд: буферизованный или нет; rotation — параметры ротации CSVLogger."""
+    if buffered:
+        return BufferedCSVLogger(path, **rotation)
+    return CSVLogger(path, **rotation)
+
+
 def find_default_start_script():
     """Если --stscript-path не задан, ищем start_script.txt рядом с файлом emu.py"""
     global stscript_path
@@ -55,44 +115,87 @@ def find_default_start_script():
     if os.path.exists(candidate):
         stscript_path = candidate
 
-def expand_env_vars(command: str, env: dict = None) -> str:
-    if env is None:
-        env = dict(os.environ)
+# Регулярные выражения подстановки переменных, компилируются один раз
+_PERCENT_VAR_RE = re.compile(r'%([^%]+)%')
+_DOLLAR_VAR_RE = re.compile(r'\$(\w+)|\$\{(\w+)\}')
+_TILDE_RE = re.compile(r'(?<!\\)~')
+
+
+class NormalizedEnv:
+    """
+    Представление окружения с нормализованными значениями (обратные слеши -> прямые).
+    Нормализованное значение кэшируется по ключу и пересчитывается, только если
+    исходное значение в окружении изменилось; invalidate() сбрасывает кэш целиком.
+    Если HOME не задан, используется USERPROFILE.
+    """
+    def __init__(self, source):
+        self._source = source
+        self._cache = {}
+
+    def get(self, key, default=""):
+        raw = self._source.get(key)
+        if raw is None and key == 'HOME':
+            raw = self._source.get('USERPROFILE')
+        if raw is None:
+            return default
+        cached = self._cache.get(key)
+        if cached is not None and cached[0] == raw:
+            return cached[1]
+        value = raw.replace('\\', '/')
+        self._cache[key] = (raw, value)
+        return value
+
+    def invalidate(self):
+        self._cache.clear()
 
-    # Нормализуем переменные окружения: заменяем обратные слеши на прямые
-    normalized_env = {}
-    for key, value in env.items():
-        normalized_env[key] = value.replace('\\', '/')
 
-    env = normalized_env
+# Общее представление os.environ для всех вызовов expand_env_vars без явного env
+_os_env = NormalizedEnv(os.environ)
 
-    if 'HOME' not in env and 'USERPROFILE' in env:
-        env['HOME'] = env['USERPROFILE']
+
+def invalidate_env_cache():
+    """Сбрасывает кэш нормализованных переменных окружения."""
+    _os_env.invalidate()
+
+
+def expand_env_vars(command: str, env: dict = None) -> str:
+    # Быстрый выход: подставлять нечего
+    if '$' not in command and '%' not in command and '~' not in command:
+        return command
+
+    env = _os_env if env is None else NormalizedEnv(env)
 
     def replace_var(match):
         if match.group(1):
             var_name = match.group(1)
-            return env.get(var_name, "").replace('\\', '/')
+            return env.get(var_name, "")
         if match.group(2) or match.group(3):  # $VAR or ${VAR}
             var_name = match.group(2) or match.group(3)
-            return env.get(var_name, "").replace('\\', '/')
+            return env.get(var_name, "")
         return match.group(0)
 
     def replace_tilde(match):
-        value = env.get("HOME", "~")
-        return value.replace('\\', '/')
+        return env.get("HOME", "~")
 
-    command = re.sub(r'%([^%]+)%', replace_var, command)
-    command = re.sub(r'\$(\w+)|\$\{(\w+)\}', replace_var, command)
-    command = re.sub(r'(?<!\\)~', replace_tilde, command)
-    command = command.replace(r'\~', '~')
+    if '%' in command:
+        command = _PERCENT_VAR_RE.sub(replace_var, command)
+    if '$' in command:
+        command = _DOLLAR_VAR_RE.sub(replace_var, command)
+    if '~' in command:
+        command = _TILDE_RE.sub(replace_tilde, command)
+        command = command.replace(r'\~', '~')
 
     return command
 
 
 def set_parameter(args):
     """Обработка команды set parameter"""
-    global vfs_path, log_path, stscript_path
+    with _settings_lock:
+        return _set_parameter(args)
+
+
+def _set_parameter(args):
+    global vfs_path, log_path, stscript_path, logger
 
     if len(args) < 2:
         return "Usage: set parameter --<parameter-name> <value>"
@@ -105,9 +208,12 @@ def set_parameter(args):
         vfs_path = vfs_path.replace('\\', '/')
         return f"VFS path set to: {vfs_path}"
     elif param_name == "--log-path":
-        log_path = param_value
-        logger = CSVLogger(log_path)
-        log_path = log_path.replace('\\', '/')
+        log_path = param_value.replace('\\', '/')
+        # Действующий логгер переключается на новый файл сам: на него ссылаются emu и GUI
+        if logger is not None:
+            logger.set_path(log_path)
+        else:
+            logger = create_logger(log_path, **log_options)
         return f"Log path set to: {log_path}"
     elif param_name == "--stscript-path":
         stscript_path = param_value
@@ -1,8 +1,10 @@
 import shlex
-from vfs import load_vfs
+import threading
+import instrumentation
+import script_engine
+from vfs import load_vfs, VFSSession
 from config import *
 import sys
-import fnmatch
 
 # Глобальные переменные
 vfs = None
@@ -10,171 +12,394 @@ vfs_name = 'home$'
 exit_cmd = 'exit'
 
 def execute_startup_script(output_func=print):
+    """
+    Выполнение стартового скрипта. output_func — куда писать вывод (print или GUI printer).
+    Скрипт компилируется целиком заранее (script_engine), вывод отдаётся блоками.
+    """
     from config import stscript_path
-    """Выполнение стартового скрипта. output_func — куда писать вывод (print или GUI printer)."""
     if not stscript_path or not os.path.exists(stscript_path):
         return
 
     output_func(f"Executing startup script: {stscript_path}")
 
     try:
-        with open(stscript_path, 'r', encoding='utf-8') as f:
-            for line_num, line in enumerate(f, 1):
-                command = line.strip()
-                if not command or command.startswith('#'):
-                    continue
+        script = script_engine.load_script(stscript_path)
+        script_engine.run_script(script, execute_compiled, output_func, vfs_name)
+    except Exception as e:
+        output_func(f"Error executing startup script: {e}")
 
-                output_func(f"{vfs_name} {command}")
 
-                result = act(command)
+def execute_compiled(cmd, fs=None):
+    """Выполняет команду, разобранную script_engine; строки с переменными окружения идут через act()."""
+    if cmd.parts is None:
+        return act(cmd.command, fs)
+    if not cmd.parts:
+        return None
+    return dispatch(cmd.command, cmd.parts, fs)
+
+class Command:
+    """
+    Команда эмулятора в таблице диспетчеризации.
+    handler(fs, command, parts) — fs: экземпляр VFS, command: исходная строка
+    (для лога), parts: аргументы после разбора (parts[0] — имя команды).
+    Результат — строка, None или, для длинного вывода, итератор блоков текста
+    (см. output_result).
+    """
+    def __init__(self, name, handler, help_text=""):
+        self.name = name
+        self.handler = handler
+        self.help_text = help_text
+
+    def __call__(self, fs, command, parts):
+        return self.handler(fs, command, parts)
+
+
+# Таблица команд: имя -> Command. Плагины добавляют свои команды через register_command.
+COMMANDS = {}
+
+
+def register_command(name, handler=None, help_text=""):
+    """
+    Регистрирует команду в таблице диспетчеризации (заменяя одноимённую).
+    Используется как функция register_command("cmd", handler) или как декоратор @register_command("cmd").
+    """
+    def decorator(func):
+        COMMANDS[name] = Command(name, func, help_text)
+        return func
+    if handler is not None:
+        return decorator(handler)
+    return decorator
+
+
+def load_plugins(module_names, output_func=print):
+    """Импортирует модули плагинов; при импорте они регистрируют свои команды через register_command."""
+    import importlib
+    for module_name in module_names or ():
+        try:
+            importlib.import_module(module_name)
+        except Exception as e:
+            output_func(f"Failed to load plugin {module_name}: {e}")
 
-                if result:
-                    output_func(result)
 
-                if result and "command not found" in result:
-                    output_func(f"Script stopped at line {line_num} due to error")
-                    break
-    except Exception as e:
-        output_func(f"Error executing startup script: {e}")
+def output_result(result, output_func=print):
+    """Передаёт результат команды в output_func: строку целиком, итератор блоков — по мере получения."""
+    if result is None:
+        return
+    if isinstance(result, str):
+        output_func(result)
+        return
+    for block in result:
+        output_func(block)
+
 
-def _find_matches(start_node, pattern):
-    """Рекурсивно ищет узлы, соответствующие шаблону. Возвращает список полных путей."""
-    matches = []
+# Команда целиком из одной переменной окружения: $VAR, ${VAR}, %VAR%, ~
+_ENV_ONLY_RE = re.compile(r'\$[A-Za-z_]\w*|\$\{[A-Za-z_]\w*\}|%[^%]+%|~')
 
-    if start_node is None:
-        return matches
 
-    if start_node.name and (fnmatch.fnmatch(start_node.name, pattern) or pattern in start_node.name):
-        matches.append(start_node.path())
+_logger_lock = threading.Lock()
 
-    if start_node.is_dir:
-        for child_name, child in start_node.children.items():
-            matches.extend(_find_matches(child, pattern))
-    return matches
 
-def act(command):
+def _ensure_logger():
+    global logger
+    # Если логгер не инициализирован, берём логгер config или создаём дефолтный (один на все потоки).
+    if logger is None:
+        with _logger_lock:
+            if logger is None:
+                import config as config_module
+                if config_module.logger is None:
+                    config_module.logger = CSVLogger(config_module.log_path or 'emu_log.csv')
+                logger = config_module.logger
+    return logger
+
+
+def command_not_found(command):
+    error_msg = f'{command}: command not found'
+    logger.log(command, error_msg)
+    return error_msg
 
-    global logger, log_path, vfs
+
+def dispatch(command, parts, fs=None, probe=None):
+    """
+    Выполняет уже разобранную команду через таблицу COMMANDS; fs по умолчанию — глобальный vfs.
+    probe — замер, начатый в act() (см. instrumentation); для уже разобранных команд
+    скрипта замер начинается здесь, если замеры включены.
+    """
+    if probe is None and instrumentation.active is not None:
+        probe = instrumentation.begin()
+    _ensure_logger()
+    handler = COMMANDS.get(parts[0])
+    try:
+        if handler is None:
+            # неизвестная команда
+            return command_not_found(command)
+        result = handler(vfs if fs is None else fs, command, parts)
+        if probe is not None and result is not None and not isinstance(result, str):
+            # Итератор блоков выполняется по мере чтения — замер завершит он сам
+            result, probe = probe.stream(parts[0], result), None
+        return result
+    finally:
+        if probe is not None:
+            probe.finish(parts[0] if handler is not None else "<unknown>")
+
+
+def new_session(fs=None):
+    """
+    Сеанс со своим текущим каталогом над деревом fs (по умолчанию — глобальный vfs).
+    Потоки, выполняющие команды параллельно, передают каждый свой сеанс в act(command, session).
+    """
+    return VFSSession(vfs if fs is None else fs)
+
+
+def act(command, fs=None):
+    """Разбирает и выполняет строку команды; fs по умолчанию — глобальный vfs."""
 
     command_stripped = command.strip()
     if not command_stripped:  # Пустая команда
         return None
 
-    # Если логгер не инициализирован, создаём дефолтный.
-    if logger is None:
-        logger = CSVLogger(log_path or 'emu_log.csv')
+    _ensure_logger()
+    probe = instrumentation.begin() if instrumentation.active is not None else None
 
     # Поддерживается: $VAR, ${VAR}, %VAR%, ~
-    if re.fullmatch(r'\$[A-Za-z_]\w*|\$\{[A-Za-z_]\w*\}|%[^%]+%|~', command_stripped):
+    if _ENV_ONLY_RE.fullmatch(command_stripped):
         expanded = expand_env_vars(command_stripped)
+        if probe is not None:
+            probe.mark("expand")
         logger.log(command_stripped, "")
+        if probe is not None:
+            probe.finish("<env>")
         return expanded
 
     # Раскрываем переменные окружения в любой части команды
     expanded_command = expand_env_vars(command_stripped)
+    if probe is not None:
+        probe.mark("expand")
 
     try:
         parts = shlex.split(expanded_command)
     except Exception as e:
         error_msg = f'Failed to parse command: {e}'
         logger.log(command_stripped, error_msg)
+        if probe is not None:
+            probe.finish("<parse-error>")
         return error_msg
 
+    if probe is not None:
+        probe.mark("parse")
     if not parts:
+        if probe is not None:
+            probe.finish("<empty>")
         return None
 
-    if parts[0] == exit_cmd:
-        logger.log(command_stripped, "")
-        try:
-            sys.exit(0)
-        except SystemExit:
-            return None
+    return dispatch(command_stripped, parts, fs, probe)
+
+
+@register_command(exit_cmd, help_text="exit")
+def _cmd_exit(fs, command, parts):
+    logger.log(command, "")
+    try:
+        sys.exit(0)
+    except SystemExit:
+        return None
 
+
+@register_command('set', help_text="set parameter --<parameter-name> <value>")
+def _cmd_set(fs, command, parts):
     # Обработка команды set parameter
-    if parts[0] == 'set' and len(parts) > 1 and parts[1] == 'parameter':
-        result = set_parameter(parts[2:])
-        logger.log(command_stripped, "" if "Unknown parameter" not in (result or "") and "Usage:" not in (result or "") else (result or ""))
-        return result
+    if len(parts) < 2 or parts[1] != 'parameter':
+        return command_not_found(command)
+    result = set_parameter(parts[2:])
+    logger.log(command, "" if "Unknown parameter" not in (result or "") and "Usage:" not in (result or "") else (result or ""))
+    return result
 
-    if parts[0] == 'ls':
-        logger.log(command_stripped, "")
-        if vfs:
-            return vfs.list_dir(parts[1] if len(parts) > 1 else None)
+
+@register_command('ls', help_text="ls [path]")
+def _cmd_ls(fs, command, parts):
+    logger.log(command, "")
+    if fs:
+        return fs.list_dir(parts[1] if len(parts) > 1 else None)
+    return "VFS not loaded"
+
+
+@register_command('cd', help_text="cd [path]")
+def _cmd_cd(fs, command, parts):
+    logger.log(command, "")
+    if fs:
+        return fs.change_dir(parts[1] if len(parts) > 1 else "/")
+    return "VFS not loaded"
+
+
+@register_command('find', help_text="find <pattern>  or  find <start> <pattern>")
+def _cmd_find(fs, command, parts):
+    logger.log(command, "")
+    if not fs:
+        return "VFS not loaded"
+    # Usage:
+    #   find <pattern>           -> search from cwd
+    #   find <start> <pattern>   -> search from <start>
+    if len(parts) == 1:
+        return "Usage: find <pattern>  or  find <start> <pattern>"
+    if len(parts) == 2:
+        start_path = None
+        pattern = parts[1]
+    else:
+        start_path = parts[1]
+        pattern = parts[2]
+
+    start_node = fs.get_node(start_path) if start_path else fs.get_node(None)
+    if not start_node:
+        return f"No such directory: {start_path or fs.get_cwd_path()}"
+    # Пути выводятся блоками по мере нахождения (уже в порядке сортировки)
+    return _find_output(fs.iter_find(start_node, pattern))
+
+
+def _find_output(blocks):
+    found = False
+    for block in blocks:
+        found = True
+        yield "\n".join(block)
+    if not found:
+        yield "(no matches)"
+
+
+@register_command('cat', help_text="cat <file>")
+def _cmd_cat(fs, command, parts):
+    logger.log(command, "")
+    if not fs:
         return "VFS not loaded"
+    if len(parts) < 2:
+        return "Usage: cat <file>"
+    path = parts[1]
+    result = fs.read_file(path)
+    if isinstance(result, str) and (result.startswith("No such") or result.endswith("is a directory")):
+        logger.log(command, result)
+        return result
+    logger.log(command, "")
+    return result
 
-    if parts[0] == 'cd':
-        logger.log(command_stripped, "")
-        if vfs:
-            return vfs.change_dir(parts[1] if len(parts) > 1 else "/")
+
+@register_command('rmdir', help_text="rmdir <directory>")
+def _cmd_rmdir(fs, command, parts):
+    # Логирование решим делать после результата: логируем с текстом ошибки или пустым
+    if not fs:
+        logger.log(command, "VFS not loaded")
         return "VFS not loaded"
 
-    # find
-    if parts[0] == 'find':
-        logger.log(command_stripped, "")
-        if not vfs:
-            return "VFS not loaded"
-        # Usage:
-        #   find <pattern>           -> search from cwd
-        #   find <start> <pattern>   -> search from <start>
-        if len(parts) == 1:
-            return "Usage: find <pattern>  or  find <start> <pattern>"
-        if len(parts) == 2:
-            start_path = None
-            pattern = parts[1]
-        else:
-            start_path = parts[1]
-            pattern = parts[2]
-
-        start_node = vfs.get_node(start_path) if start_path else vfs.get_node(None)
-        if not start_node:
-            return f"No such directory: {start_path or vfs.get_cwd_path()}"
-        matches = []
-        matches = _find_matches(start_node, pattern)
-        if not matches:
-            return "(no matches)"
-        uniq = sorted(dict.fromkeys(matches))
-        return "\n".join(uniq)
-
-    # cat
-    if parts[0] == 'cat':
-        logger.log(command_stripped, "")
-        if not vfs:
-            return "VFS not loaded"
-        if len(parts) < 2:
-            return "Usage: cat <file>"
-        path = parts[1]
-        result = vfs.read_file(path)
-        if isinstance(result, str) and (result.startswith("No such") or result.endswith("is a directory")):
-            logger.log(command_stripped, result)
-            return result
-        logger.log(command_stripped, "")
+    if len(parts) < 2:
+        logger.log(command, "Usage: rmdir <directory>")
+        return "Usage: rmdir <directory>"
+
+    target = parts[1]
+    result = fs.remove_dir(target)
+    # Если результат начинается с "Removed" — считаем успехом
+    if isinstance(result, str) and result.startswith("Removed"):
+        logger.log(command, "")
+        return result
+    else:
+        logger.log(command, result)
         return result
 
-    # rmdir
-    if parts[0] == 'rmdir':
-        # Логирование решим делать после результата: логируем с текстом ошибки или пустым
-        if not vfs:
-            logger.log(command_stripped, "VFS not loaded")
-            return "VFS not loaded"
-
-        if len(parts) < 2:
-            logger.log(command_stripped, "Usage: rmdir <directory>")
-            return "Usage: rmdir <directory>"
-
-        target = parts[1]
-        result = vfs.remove_dir(target)
-        # Если результат начинается с "Removed" — считаем успехом
-        if isinstance(result, str) and result.startswith("Removed"):
-            logger.log(command_stripped, "")
-            return result
+
+def _depth_args(parts, flag, usage):
+    """Разбор аргументов tree/du: ([путь], глубина или None, флаги) либо строка с ошибкой."""
+    path = None
+    depth = None
+    flags = set()
+    args = iter(parts[1:])
+    for arg in args:
+        if arg == flag:
+            value = next(args, None)
+            if value is None or not value.isdigit():
+                return f"Usage: {usage}"
+            depth = int(value)
+        elif arg.startswith("-") and len(arg) > 1:
+            flags.add(arg)
+        elif path is None:
+            path = arg
         else:
-            logger.log(command_stripped, result)
-            return result
+            return f"Usage: {usage}"
+    return path, depth, flags
 
-    # неизвестная команда
-    error_msg = f'{command_stripped}: command not found'
-    logger.log(command_stripped, error_msg)
-    return error_msg
+
+@register_command('tree', help_text="tree [-L depth] [path]")
+def _cmd_tree(fs, command, parts):
+    if not fs:
+        logger.log(command, "VFS not loaded")
+        return "VFS not loaded"
+    args = _depth_args(parts, "-L", COMMANDS['tree'].help_text)
+    if isinstance(args, str) or args[2]:
+        error = args if isinstance(args, str) else f"Usage: {COMMANDS['tree'].help_text}"
+        logger.log(command, error)
+        return error
+    path, depth, _ = args
+    node = fs.get_node(path)
+    if not node:
+        error = f"No such file or directory: {path or fs.get_cwd_path()}"
+        logger.log(command, error)
+        return error
+    logger.log(command, "")
+    # Вывод отдаётся блоками по мере обхода, а не одной строкой
+    return fs.iter_tree(node, depth)
+
+
+@register_command('du', help_text="du [-d depth] [-s] [path]")
+def _cmd_du(fs, command, parts):
+    if not fs:
+        logger.log(command, "VFS not loaded")
+        return "VFS not loaded"
+    args = _depth_args(parts, "-d", COMMANDS['du'].help_text)
+    if isinstance(args, str) or args[2] - {"-s"}:
+        error = args if isinstance(args, str) else f"Usage: {COMMANDS['du'].help_text}"
+        logger.log(command, error)
+        return error
+    path, depth, flags = args
+    if "-s" in flags:
+        depth = 0
+    node = fs.get_node(path)
+    if not node:
+        error = f"No such file or directory: {path or fs.get_cwd_path()}"
+        logger.log(command, error)
+        return error
+    logger.log(command, "")
+    return fs.iter_du(node, depth)
+
+
+@register_command('stats', help_text="stats [on|off|reset|json [file]|profile [every-N]|profile-dump <file>]")
+def _cmd_stats(fs, command, parts):
+    logger.log(command, "")
+    action = parts[1] if len(parts) > 1 else None
+    arg = parts[2] if len(parts) > 2 else None
+    stats = instrumentation.active or instrumentation.last
+    if action == "on":
+        instrumentation.enable(stats.profile_every if stats is not None else 0)
+        return "Command timing enabled"
+    if action == "off":
+        instrumentation.disable()
+        return "Command timing disabled"
+    if action == "profile" and arg is not None:
+        if not arg.isdigit():
+            return "Usage: stats profile <every-N>"
+        instrumentation.enable(int(arg))
+        return f"Profiling one in every {arg} commands" if int(arg) else "Profiling disabled"
+    if stats is None:
+        return "Command timing is off (stats on to enable)"
+    if action is None:
+        return stats.report()
+    if action == "reset":
+        stats.reset()
+        return "Statistics reset"
+    if action == "json":
+        if arg is None:
+            return stats.to_json()
+        stats.dump(arg)
+        return f"Statistics written to {arg}"
+    if action == "profile":
+        return stats.profile_report() or "No commands profiled (stats profile <every-N> to enable)"
+    if action == "profile-dump" and arg is not None:
+        if not stats.dump_profile(arg):
+            return "No commands profiled"
+        return f"Profile written to {arg} (python -m pstats {arg})"
+    return f"Usage: {COMMANDS['stats'].help_text}"
 
 
 if __name__ == "__main__":
@@ -186,6 +411,12 @@ if __name__ == "__main__":
     import vfs as vfs_module
 
     vfs = getattr(vfs_module, "vfs", None)
+    # Логгер тоже берём из config: init_config мог создать буферизованный
+    import config as config_module
+
+    logger = config_module.logger
+
+    load_plugins(config_module.plugin_modules)
 
     # Если есть start_script.txt — назначим его в stscript_path
     find_default_start_script()
@@ -204,4 +435,4 @@ if __name__ == "__main__":
         if not result:
             break
         else:
-            print(result)
\ No newline at end of file
+            output_result(result)
\ No newline at end of file
@@ -1,12 +1,34 @@
+import queue
+import sys
+import threading
 import tkinter as tk
 from tkinter import scrolledtext, font
-from emu import act, init_config, execute_startup_script, find_default_start_script
+from emu import act, output_result, init_config, execute_startup_script, find_default_start_script, load_plugins
 
 vfs_name = 'home$'
 
+# Период опроса очереди вывода, мс (вставки за это время объединяются в одну)
+POLL_INTERVAL_MS = 30
+# Сколько строк держать в окне вывода; более старые удаляются
+MAX_SCROLLBACK_LINES = 5000
+# Сколько символов вывода вставлять за один тик; остальное — в следующих тиках
+MAX_DRAIN_CHARS = 256 * 1024
+# Ёмкость очереди вывода (блоков): заполненная очередь притормаживает рабочий поток
+OUTPUT_QUEUE_SIZE = 256
+
+# Маркер в очереди вывода: закрыть приложение
+_QUIT = object()
+
+
 class TerminalGUI:
     def __init__(self, root):
         self.root = root
+        # Команды выполняются в рабочем потоке, вывод возвращается через очередь
+        self._output_queue = queue.Queue(maxsize=OUTPUT_QUEUE_SIZE)
+        self._tasks = queue.Queue()
+        self._worker = threading.Thread(target=self._worker_loop, name="emu-worker", daemon=True)
+        # Код выхода, если рабочий поток завершил приложение через SystemExit
+        self.exit_status = None
         self.root.title(vfs_name)
         self.root.geometry("800x600")
 
@@ -53,23 +75,94 @@ class TerminalGUI:
         self.command_entry.bind("<Return>", self.execute_command)
         self.command_entry.focus_set()
 
+        self._worker.start()
+        self.root.after(POLL_INTERVAL_MS, self._drain_output)
+
     def print_output(self, text):
-        """Вывод текста в текстовую область"""
+        """Вывод текста в текстовую область; вызывается из рабочего потока (ждёт, если очередь полна)."""
         if text is None:
             return
-        # добавляем перенос строки если требуется
-        text_to_insert = f"{text}\n" if not str(text).endswith("\n") else text
+        text = str(text)
+        # Длинный вывод (cat большого файла) делится по строкам на куски не больше тика
+        start = 0
+        while len(text) - start > MAX_DRAIN_CHARS:
+            end = text.rfind("\n", start, start + MAX_DRAIN_CHARS) + 1 or text.find("\n", start) + 1
+            if not end:
+                break
+            self._output_queue.put(text[start:end])
+            start = end
+        self._output_queue.put(text[start:] if start else text)
+
+    def _drain_output(self):
+        """
+        Забирает накопленный вывод (не больше MAX_DRAIN_CHARS за тик) и вставляет его
+        одним блоком (вызывается через after). Если вывод остался, следующий тик — сразу.
+        """
+        chunks = []
+        size = 0
+        quit_requested = False
+        try:
+            while size < MAX_DRAIN_CHARS:
+                item = self._output_queue.get_nowait()
+                if item is _QUIT:
+                    quit_requested = True
+                    break
+                # добавляем перенос строки если требуется
+                text = str(item)
+                chunks.append(text if text.endswith("\n") else text + "\n")
+                size += len(text)
+        except queue.Empty:
+            pass
+
+        if chunks:
+            self._insert_output("".join(chunks))
+        if quit_requested:
+            self.root.quit()
+            return
+        # Между тиками Tk обрабатывает события окна
+        self.root.after(1 if size >= MAX_DRAIN_CHARS else POLL_INTERVAL_MS, self._drain_output)
+
+    def _insert_output(self, text):
+        # Если блок сам длиннее лимита, вставляем только его хвост
+        if text.count("\n") > MAX_SCROLLBACK_LINES:
+            text = "\n".join(text.split("\n")[-MAX_SCROLLBACK_LINES - 1:])
         self.output_area.config(state=tk.NORMAL)
-        self.output_area.insert(tk.END, text_to_insert)
+        self.output_area.insert(tk.END, text)
+        lines = int(self.output_area.index("end-1c").split(".")[0])
+        if lines > MAX_SCROLLBACK_LINES:
+            self.output_area.delete("1.0", f"{lines - MAX_SCROLLBACK_LINES + 1}.0")
         self.output_area.see(tk.END)
         self.output_area.config(state=tk.DISABLED)
 
+    def submit(self, func, *args):
+        """Ставит задачу в очередь рабочего потока (задачи выполняются по порядку)."""
+        self._tasks.put((func, args))
+
+    def _worker_loop(self):
+        while True:
+            func, args = self._tasks.get()
+            try:
+                func(*args)
+            except SystemExit as e:
+                # Ошибка аргументов или --help в init_config: argparse уже вывел сообщение,
+                # приложение закрывается, как при запуске без GUI
+                self.exit_status = e.code
+                self._output_queue.put(_QUIT)
+                return
+            except Exception as e:
+                self.print_output(f"Error: {e}")
+
     def execute_command(self, event):
         """Обработка выполнения команды"""
         command = self.command_entry.get().strip()
         self.command_entry.delete(0, tk.END)
 
-        # Выводим команду в текстовую область
+        # act() выполняется в рабочем потоке, чтобы не блокировать окно
+        self.submit(self._run_command, command)
+
+    def _run_command(self, command):
+        # Выводим команду в текстовую область (из рабочего потока — чтобы
+        # эхо не обогнало вывод ещё выполняющихся команд)
         self.print_output(f"home$ {command}")
 
         # Обрабатываем команду с помощью функции act()
@@ -77,25 +170,38 @@ class TerminalGUI:
 
         # Если команда exit - закрываем приложение
         if command == 'exit':
-            self.root.quit()
+            self._output_queue.put(_QUIT)
         # Если есть результат - выводим его
         elif result:
-            self.print_output(result)
-
+            output_result(result, self.print_output)
 
-if __name__ == "__main__":
-    root = tk.Tk()
-    app = TerminalGUI(root)
 
+def startup(app):
+    """Инициализация и стартовый скрипт; выполняется в рабочем потоке GUI."""
     init_config(args_list=None, output_func=app.print_output)
 
     import vfs as vfs_module
     import emu
 
     emu.vfs = getattr(vfs_module, "vfs", None)
+    import config as config_module
+
+    emu.logger = config_module.logger
+
+    load_plugins(config_module.plugin_modules, output_func=app.print_output)
 
     find_default_start_script()
 
     execute_startup_script(output_func=app.print_output)
 
-    root.mainloop()
\ No newline at end of file
+
+if __name__ == "__main__":
+    root = tk.Tk()
+    app = TerminalGUI(root)
+
+    # Конфигурация и стартовый скрипт выполняются в рабочем потоке — окно отзывчиво сразу
+    app.submit(startup, app)
+
+    root.mainloop()
+    if app.exit_status:
+        sys.exit(app.exit_status)
@@ -0,0 +1,366 @@
+"""
+Замеры времени выполнения команд эмулятора.
+
+Для каждой команды (по имени) и каждой фазы — expand (подстановка переменных
+окружения), parse (shlex), resolve (разрешение путей в VFS), execute (обработчик
+команды без resolve и log), log (запись в лог) и total — ведётся гистограмма
+задержек с логарифмическими корзинами (4 корзины на удвоение, погрешность
+квантилей — до 12.5%). Запись в гистограмму — несколько целочисленных
+операций, без выделения памяти.
+
+Пока замеры выключены (active is None), emu.act/dispatch делают одну проверку
+и ничего больше; разрешение путей и запись лога не обёрнуты. enable()
+оборачивает VirtualFileSystem._get_node, OverlayVFS._chain и CSVLogger.log
+(и их переопределения в подклассах), disable() возвращает исходные методы.
+Команды, возвращающие итератор блоков (find, tree, du), работают по мере чтения
+результата: замер идёт до его исчерпания, время потребителя между блоками
+(вывод) в команду не входит.
+
+Опционально каждая N-я команда выполняется под cProfile; накопленный профиль
+сохраняется в формате pstats (python -m pstats <файл>).
+"""
+import cProfile
+import io
+import json
+import pstats
+import threading
+import time
+from array import array
+
+import CSVlogger
+import vfs as vfs_module
+import vfs_overlay
+
+PHASES = ("expand", "parse", "resolve", "execute", "log", "total")
+_PHASE_INDEX = {phase: i for i, phase in enumerate(PHASES)}
+_RESOLVE, _EXECUTE, _LOG, _TOTAL = (_PHASE_INDEX[phase] for phase in ("resolve", "execute", "log", "total"))
+
+_SUB_BUCKETS = 4
+_BUCKETS = 256
+
+# Текущий Instrumentation или None, если замеры выключены
+active = None
+# Последний Instrumentation (в том числе выключенный) — его показывает команда stats
+last = None
+
+_local = threading.local()
+
+
+def _bucket(ns):
+    """Номер корзины для задержки ns (наносекунды)."""
+    if ns < _SUB_BUCKETS:
+        return ns if ns > 0 else 0
+    bits = ns.bit_length()
+    return _SUB_BUCKETS * (bits - 2) + (ns >> (bits - 3)) - _SUB_BUCKETS
+
+
+def _bucket_bounds(index):
+    """Границы корзины [low, high) в наносекундах."""
+    if index < _SUB_BUCKETS:
+        return index, index + 1
+    bits = (index - _SUB_BUCKETS) // _SUB_BUCKETS + 3
+    mantissa = (index - _SUB_BUCKETS) % _SUB_BUCKETS + _SUB_BUCKETS
+    shift = bits - 3
+    return mantissa << shift, (mantissa + 1) << shift
+
+
+class LatencyHistogram:
+    """Гистограмма задержек: счётчики корзин, сумма, минимум и максимум (наносекунды)."""
+    __slots__ = ("counts", "count", "total", "min", "max")
+
+    def __init__(self):
+        self.counts = array("Q", bytes(8 * _BUCKETS))
+        self.count = 0
+        self.total = 0
+        self.min = 0
+        self.max = 0
+
+    def record(self, ns):
+        self.counts[_bucket(ns)] += 1
+        if not self.count or ns < self.min:
+            self.min = ns
+        if ns > self.max:
+            self.max = ns
+        self.count += 1
+        self.total += ns
+
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    def percentile(self, q):
+        """Оценка квантиля q (0..100) — середина корзины, ограниченная min/max."""
+        if not self.count:
+            return 0.0
+        rank = q / 100 * self.count
+        seen = 0
+        for index, n in enumerate(self.counts):
+            if not n:
+                continue
+            seen += n
+            if seen >= rank:
+                low, high = _bucket_bounds(index)
+                return min(max((low + high) / 2, self.min), self.max)
+        return float(self.max)
+
+    def to_dict(self):
+        buckets = {str(_bucket_bounds(i)[0]): n for i, n in enumerate(self.counts) if n}
+        return {"count": self.count, "total_ns": self.total, "min_ns": self.min, "max_ns": self.max,
+                "mean_ns": round(self.mean()), "p50_ns": round(self.percentile(50)),
+                "p90_ns": round(self.percentile(90)), "p99_ns": round(self.percentile(99)),
+                "buckets": buckets}
+
+
+class _Probe:
+    """Замер одной команды: время последней отметки и набранное время фаз."""
+    __slots__ = ("stats", "start", "last", "phases", "profiling")
+
+    def __init__(self, stats, profiling):
+        self.stats = stats
+        self.start = self.last = time.perf_counter_ns()
+        self.phases = [0] * len(PHASES)
+        self.profiling = profiling
+
+    def mark(self, phase):
+        """Относит время с последней отметки к фазе phase."""
+        now = time.perf_counter_ns()
+        self.phases[_PHASE_INDEX[phase]] += now - self.last
+        self.last = now
+
+    def finish(self, name):
+        """Завершает замер: остаток времени — execute (за вычетом resolve и log внутри него)."""
+        now = time.perf_counter_ns()
+        phases = self.phases
+        inner = now - self.last - phases[_RESOLVE] - phases[_LOG]
+        phases[_EXECUTE] += inner if inner > 0 else 0
+        phases[_TOTAL] = now - self.start
+        if _local.__dict__.get("probe") is self:
+            _local.probe = None
+        self.stats._record(name, phases, self.profiling)
+
+    def stream(self, name, blocks):
+        """Итератор блоков результата; замер завершается, когда блоки исчерпаны или итератор закрыт."""
+        if _local.__dict__.get("probe") is self:
+            _local.probe = None
+        return self._stream(name, iter(blocks), time.perf_counter_ns())
+
+    def _stream(self, name, blocks, paused_at):
+        try:
+            while True:
+                # Время вне next() — работа потребителя; замер сдвигается на него
+                pause = time.perf_counter_ns() - paused_at
+                self.start += pause
+                self.last += pause
+                paused_at = None
+                previous = _local.__dict__.get("probe")
+                _local.probe = self
+                try:
+                    block = next(blocks, _END)
+                finally:
+                    _local.probe = previous
+                paused_at = time.perf_counter_ns()
+                if block is _END:
+                    return
+                yield block
+        finally:
+            if paused_at is not None:
+                pause = time.perf_counter_ns() - paused_at
+                self.start += pause
+                self.last += pause
+            close = getattr(blocks, "close", None)
+            if close is not None:
+                close()
+            self.finish(name)
+
+
+# Конец итератора для next() в _Probe._stream
+_END = object()
+
+
+def _timed(original, phase):
+    phase = _PHASE_INDEX[phase]
+
+    def wrapper(*args, **kwargs):
+        probe = _local.__dict__.get("probe")
+        if probe is None:
+            return original(*args, **kwargs)
+        start = time.perf_counter_ns()
+        try:
+            return original(*args, **kwargs)
+        finally:
+            probe.phases[phase] += time.perf_counter_ns() - start
+    wrapper.__wrapped__ = original
+    wrapper.__name__ = original.__name__
+    return wrapper
+
+
+def _classes_defining(base, name):
+    """base и все его подклассы, у которых метод name определён в самом классе."""
+    found = []
+    stack = [base]
+    while stack:
+        cls = stack.pop()
+        if name in cls.__dict__:
+            found.append(cls)
+        stack.extend(cls.__subclasses__())
+    return found
+
+
+class Instrumentation:
+    """
+    Накопленные замеры: histograms[команда] -> LatencyHistogram по каждой фазе (в порядке PHASES).
+    profile_every — выполнять под cProfile каждую N-ю команду (0 — не профилировать).
+    """
+    # Методы, время которых относится к фазам resolve и log
+    TIMED_METHODS = ((vfs_module.VirtualFileSystem, "_get_node", "resolve"),
+                     (vfs_overlay.OverlayVFS, "_chain", "resolve"),
+                     (CSVlogger.CSVLogger, "log", "log"))
+
+    def __init__(self, profile_every=0):
+        self.profile_every = profile_every
+        self.histograms = {}
+        # Счётчик команд для выборки профилирования
+        self._sampled = 0
+        self.profiled = 0
+        self.started = time.time()
+        self._profile = None
+        self._profile_busy = False
+        self._lock = threading.Lock()
+        self._patched = []
+
+    def begin(self):
+        """Начинает замер команды в текущем потоке."""
+        profiling = False
+        if self.profile_every:
+            with self._lock:
+                self._sampled += 1
+                profiling = self._sampled % self.profile_every == 0 and self._profile_acquire()
+        probe = _Probe(self, profiling)
+        _local.probe = probe
+        return probe
+
+    def _profile_acquire(self):
+        # cProfile профилирует один поток за раз; занятый профайлер — пропускаем выборку
+        if self._profile_busy:
+            return False
+        if self._profile is None:
+            self._profile = cProfile.Profile()
+        self._profile_busy = True
+        self._profile.enable()
+        return True
+
+    def _record(self, name, phases, profiling):
+        with self._lock:
+            if profiling:
+                self._profile.disable()
+                self._profile_busy = False
+                self.profiled += 1
+            histograms = self.histograms.get(name)
+            if histograms is None:
+                histograms = self.histograms[name] = [LatencyHistogram() for _ in PHASES]
+            for histogram, ns in zip(histograms, phases):
+                histogram.record(ns)
+
+    def install(self):
+        for base, name, phase in self.TIMED_METHODS:
+            for cls in _classes_defining(base, name):
+                original = cls.__dict__[name]
+                setattr(cls, name, _timed(original, phase))
+                self._patched.append((cls, name, original))
+
+    def uninstall(self):
+        for cls, name, original in reversed(self._patched):
+            setattr(cls, name, original)
+        self._patched = []
+
+    def reset(self):
+        with self._lock:
+            self.histograms = {}
+            self._sampled = 0
+            self.profiled = 0
+            self.started = time.time()
+            if not self._profile_busy:
+                self._profile = None
+
+    def command_names(self):
+        """Имена команд по убыванию суммарного времени."""
+        return sorted(self.histograms, key=lambda name: (-self.histograms[name][_TOTAL].total, name))
+
+    def to_dict(self):
+        with self._lock:
+            commands = {name: {phase: histogram.to_dict()
+                               for phase, histogram in zip(PHASES, self.histograms[name])}
+                        for name in self.command_names()}
+            return {"started": self.started,
+                    "commands_measured": sum(h[_TOTAL].count for h in self.histograms.values()),
+                    "profile_every": self.profile_every, "profiled": self.profiled,
+                    "commands": commands}
+
+    def report(self):
+        """Текстовая таблица: задержка total по командам и среднее время фаз, микросекунды."""
+        with self._lock:
+            names = self.command_names()
+            if not names:
+                return "No commands measured yet"
+            lines = ["Latency, us: total per command | mean per phase",
+                     f"{'command':<12}{'count':>8}{'mean':>9}{'p50':>9}{'p90':>9}{'p99':>9}{'max':>10}  |"
+                     + "".join(f"{phase:>9}" for phase in PHASES[:-1])]
+            for name in names:
+                histograms = self.histograms[name]
+                total = histograms[_TOTAL]
+                row = (f"{name[:11]:<12}{total.count:>8}{total.mean() / 1e3:>9.1f}"
+                       f"{total.percentile(50) / 1e3:>9.1f}{total.percentile(90) / 1e3:>9.1f}"
+                       f"{total.percentile(99) / 1e3:>9.1f}{total.max / 1e3:>10.1f}  |")
+                row += "".join(f"{histogram.mean() / 1e3:>9.1f}" for histogram in histograms[:_TOTAL])
+                lines.append(row)
+            if self.profiled:
+                lines.append(f"{self.profiled} commands profiled (stats profile to show)")
+            return "\n".join(lines)
+
+    def profile_report(self, limit=15):
+        """Самые дорогие функции по накопленному профилю (или None, если профиля нет)."""
+        if self._profile is None or not self.profiled:
+            return None
+        out = io.StringIO()
+        pstats.Stats(self._profile, stream=out).sort_stats("cumulative").print_stats(limit)
+        return out.getvalue().rstrip()
+
+    def dump_profile(self, path):
+        if self._profile is None or not self.profiled:
+            return False
+        self._profile.dump_stats(path)
+        return True
+
+    def to_json(self):
+        return json.dumps(self.to_dict(), ensure_ascii=False, indent=1)
+
+    def dump(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(self.to_json())
+
+
+def enable(profile_every=0):
+    """Включает замеры (или меняет частоту профилирования); возвращает Instrumentation."""
+    global active, last
+    if active is None:
+        stats = Instrumentation(profile_every)
+        stats.install()
+        active = last = stats
+    else:
+        active.profile_every = profile_every
+    return active
+
+
+def disable():
+    """Выключает замеры; накопленное остаётся доступным через возвращённый объект."""
+    global active
+    stats = active
+    if stats is not None:
+        active = None
+        stats.uninstall()
+    return stats
+
+
+def begin():
+    """Замер команды, если замеры включены, иначе None."""
+    stats = active
+    return stats.begin() if stats is not None else None
@@ -0,0 +1,255 @@
+"""
+Анализ журнала команд эмулятора (emu_log.csv, формат CSVLogger: timestamp,command,error_message).
+
+Файл делится на сегменты по границам строк, сегменты читаются блоками и
+обрабатываются параллельно в отдельных процессах. Строки сворачиваются в
+счётчики по ключу (имя команды, префикс времени длиной в интервал гистограммы,
+признак ошибки), так что память не зависит от размера журнала. Каждый
+различный префикс времени разбирается один раз при слиянии результатов.
+
+Запуск: python log_analytics.py emu_log.csv [--bucket hour] [--workers 4] [--top 20] [--json]
+"""
+import argparse
+import calendar
+import collections
+import csv
+import datetime
+import json
+import os
+import sys
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+
+# Интервал гистограммы -> (длина префикса ISO-времени, формат префикса, секунд в интервале)
+BUCKETS = {
+    "second": (19, "%Y-%m-%dT%H:%M:%S", 1),
+    "minute": (16, "%Y-%m-%dT%H:%M", 60),
+    "hour": (13, "%Y-%m-%dT%H", 3600),
+    "day": (10, "%Y-%m-%d", 86400),
+}
+
+# Сколько байт журнала читается за один шаг
+CHUNK_BYTES = 1024 * 1024
+# Сегменты меньше этого размера не выделяются в отдельную задачу
+MIN_SEGMENT_BYTES = 4 * 1024 * 1024
+# Ограничение числа различных имён команд; остальные учитываются как OTHER
+MAX_COMMANDS = 10000
+OTHER = "<other>"
+# Сколько разобранных хвостов строк (команда и ошибка) помнить
+MAX_PARSED = 100000
+
+
+def split_segments(path, parts):
+    """Делит файл на не более чем parts сегментов (start, end), начинающихся с начала строки."""
+    size = os.path.getsize(path)
+    parts = max(1, min(parts, size // MIN_SEGMENT_BYTES or 1))
+    bounds = [0]
+    with open(path, "rb") as f:
+        for i in range(1, parts):
+            f.seek(size * i // parts)
+            f.readline()
+            pos = f.tell()
+            if bounds[-1] < pos < size:
+                bounds.append(pos)
+    bounds.append(size)
+    return list(zip(bounds, bounds[1:]))
+
+
+def _read_chunks(path, start, end, chunk_bytes):
+    """Текст сегмента [start, end) кусками, разрезанными по концам строк."""
+    with open(path, "rb") as f:
+        f.seek(start)
+        remaining = end - start
+        tail = b""
+        while remaining > 0:
+            block = f.read(min(chunk_bytes, remaining))
+            if not block:
+                break
+            remaining -= len(block)
+            block = tail + block
+            cut = block.rfind(b"\n") + 1 if remaining > 0 else len(block)
+            if cut == 0:
+                # Строка длиннее блока — дочитываем
+                tail = block
+                continue
+            tail = block[cut:]
+            yield block[:cut].decode("utf-8", errors="replace")
+        if tail:
+            yield tail.decode("utf-8", errors="replace")
+
+
+def _parse_rest(rest):
+    """(имя команды, есть ли ошибка) по хвосту строки после времени или None для битой строки."""
+    fields = next(csv.reader([rest.rstrip("\r")]), None)
+    if fields is None or len(fields) != 2:
+        return None
+    return fields[0].lstrip().partition(" ")[0], fields[1] != ""
+
+
+def scan_segment(path, start, end, prefix_len, chunk_bytes=CHUNK_BYTES, max_commands=MAX_COMMANDS):
+    """
+    Счётчики сегмента: (счётчик (команда, префикс времени, ошибка) -> строк, число строк,
+    число пропущенных строк). Выполняется в процессе-обработчике.
+    Строки кусками сворачиваются в счётчик пар (префикс времени, хвост строки); CSV
+    разбирается только для различных хвостов, которых в журнале немного.
+    Поля с переводом строки внутри кавычек CSVLogger не пишет и здесь не поддерживаются.
+    """
+    counts = collections.Counter()
+    names = set()
+    parsed = {}
+    rows = bad = 0
+    for text in _read_chunks(path, start, end, chunk_bytes):
+        if not start and not rows and text.startswith("timestamp,"):
+            # Строка заголовка CSV
+            text = text[text.find("\n") + 1:]
+        chunk = collections.Counter((line[:prefix_len], line.partition(",")[2]) for line in text.split("\n"))
+        for (prefix, rest), n in chunk.items():
+            if not rest:
+                if prefix.strip():
+                    bad += n
+                continue
+            key = parsed.get(rest)
+            if key is None:
+                key = _parse_rest(rest)
+                if key is None:
+                    bad += n
+                    continue
+                if len(parsed) >= MAX_PARSED:
+                    parsed.clear()
+                parsed[rest] = key
+            name, error = key
+            if name not in names:
+                if len(names) >= max_commands:
+                    name = OTHER
+                else:
+                    names.add(name)
+            counts[name, prefix, error] += n
+            rows += n
+    return counts, rows, bad
+
+
+class LogStats:
+    """
+    Итог анализа. commands: имя -> [строк, ошибок]. Гистограмма — в массивах,
+    упорядоченных по времени: bucket_starts (начало интервала, секунды от эпохи,
+    время журнала без часового пояса), bucket_counts, bucket_errors.
+    """
+    def __init__(self, counts, rows, bad_rows, bucket):
+        prefix_len, fmt, self.bucket_seconds = BUCKETS[bucket]
+        self.bucket = bucket
+        self.rows = rows
+        self.bad_rows = bad_rows
+        self.errors = 0
+        self.commands = {}
+        self.bad_timestamps = 0
+        starts = {}
+        buckets = collections.defaultdict(lambda: [0, 0])
+        for (name, prefix, error), n in counts.items():
+            entry = self.commands.setdefault(name, [0, 0])
+            entry[0] += n
+            if error:
+                entry[1] += n
+                self.errors += n
+            start = starts.get(prefix)
+            if start is None and prefix not in starts:
+                # Каждый различный префикс разбирается один раз
+                try:
+                    start = calendar.timegm(datetime.datetime.strptime(prefix, fmt).timetuple())
+                except ValueError:
+                    start = None
+                starts[prefix] = start
+            if start is None:
+                self.bad_timestamps += n
+                continue
+            bucket_entry = buckets[start]
+            bucket_entry[0] += n
+            if error:
+                bucket_entry[1] += n
+        order = sorted(buckets)
+        self.bucket_starts = array("q", order)
+        self.bucket_counts = array("Q", (buckets[start][0] for start in order))
+        self.bucket_errors = array("Q", (buckets[start][1] for start in order))
+
+    def top_commands(self, limit=None, key="count"):
+        """[(имя, строк, ошибок, доля ошибок)] по убыванию key: count, errors или rate."""
+        rows = [(name, n, e, e / n if n else 0.0) for name, (n, e) in self.commands.items()]
+        index = {"count": 1, "errors": 2, "rate": 3}[key]
+        rows.sort(key=lambda row: (-row[index], -row[1], row[0]))
+        return rows[:limit] if limit else rows
+
+    def to_dict(self):
+        return {
+            "rows": self.rows,
+            "errors": self.errors,
+            "bad_rows": self.bad_rows,
+            "bad_timestamps": self.bad_timestamps,
+            "bucket": self.bucket,
+            "commands": {name: {"count": n, "errors": e} for name, n, e, _ in self.top_commands()},
+            "histogram": [{"start": format_time(start), "count": n, "errors": e}
+                          for start, n, e in zip(self.bucket_starts, self.bucket_counts, self.bucket_errors)],
+        }
+
+
+def format_time(seconds):
+    return (datetime.datetime(1970, 1, 1) + datetime.timedelta(seconds=seconds)).isoformat(sep=" ")
+
+
+def analyze(path, bucket="hour", workers=None, chunk_bytes=CHUNK_BYTES, max_commands=MAX_COMMANDS):
+    """Анализирует журнал; workers — число процессов (1 — в текущем процессе). Возвращает LogStats."""
+    prefix_len = BUCKETS[bucket][0]
+    workers = workers or os.cpu_count() or 1
+    segments = split_segments(path, workers)
+    args = [(path, start, end, prefix_len, chunk_bytes, max_commands) for start, end in segments]
+    if len(segments) == 1:
+        results = [scan_segment(*args[0])]
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(segments))) as pool:
+            results = list(pool.map(scan_segment, *zip(*args)))
+
+    counts = collections.Counter()
+    rows = bad = 0
+    for segment_counts, segment_rows, segment_bad in results:
+        counts.update(segment_counts)
+        rows += segment_rows
+        bad += segment_bad
+    return LogStats(counts, rows, bad, bucket)
+
+
+def write_report(stats, out=sys.stdout, top=20, sort="count", width=40):
+    """Текстовый отчёт: частота команд, доля ошибок, гистограмма по времени."""
+    rate = stats.errors / stats.rows * 100 if stats.rows else 0.0
+    out.write(f"{stats.rows:,} records, {stats.errors:,} errors ({rate:.1f}%)")
+    if stats.bad_rows or stats.bad_timestamps:
+        out.write(f", skipped: {stats.bad_rows:,} malformed rows, {stats.bad_timestamps:,} bad timestamps")
+    out.write("\n\n")
+
+    out.write(f"{'command':<24}{'count':>14}{'errors':>14}{'error rate':>12}\n")
+    for name, n, e, share in stats.top_commands(top, sort):
+        out.write(f"{name[:23]:<24}{n:>14,}{e:>14,}{share * 100:>11.1f}%\n")
+    if top and len(stats.commands) > top:
+        out.write(f"... {len(stats.commands) - top} more commands\n")
+
+    if stats.bucket_starts:
+        out.write(f"\nrecords per {stats.bucket} (# — errors, = — other records)\n")
+        scale = max(stats.bucket_counts) / width
+        for start, n, e in zip(stats.bucket_starts, stats.bucket_counts, stats.bucket_errors):
+            bar = "#" * round(e / scale) + "=" * round((n - e) / scale)
+            out.write(f"{format_time(start)}  {n:>12,}  {e:>12,}  {bar}\n")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Summarize an emulator command log (emu_log.csv)")
+    parser.add_argument("log", nargs="?", default="emu_log.csv", help="Log file written by CSVLogger")
+    parser.add_argument("--bucket", choices=sorted(BUCKETS), default="hour", help="Histogram interval")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--top", type=int, default=20, help="Commands to list (0 — all)")
+    parser.add_argument("--sort", choices=("count", "errors", "rate"), default="count")
+    parser.add_argument("--json", action="store_true", help="Print the result as JSON")
+    args = parser.parse_args()
+
+    result = analyze(args.log, args.bucket, args.workers)
+    if args.json:
+        json.dump(result.to_dict(), sys.stdout, ensure_ascii=False, indent=1)
+        sys.stdout.write("\n")
+    else:
+        write_report(result, top=args.top, sort=args.sort)
@@ -0,0 +1,237 @@
+"""
+Локальный репозиторий пакетов для тестового режима PackageAnalyzer.
+
+Репозиторий — файл JSONL: одна строка на пакет, либо {"name": ..., "requires_dist": [...]},
+либо JSON пакета в формате PyPI ({"info": {"name": ..., "requires_dist": [...]}}).
+Рядом хранится индекс <repo>.jsonl.idx — хеш-таблица с открытой адресацией
+(little-endian):
+  header   magic, версия, число пакетов, число слотов, размер и mtime исходного файла
+  hash     uint64[slots] — 64-битный хеш нормализованного имени (0 — пустой слот)
+  offset   uint64[slots] — смещение строки пакета в файле
+  length   uint32[slots] — длина строки
+Файл и индекс отображаются в память (mmap), поиск пакета по имени — O(1)
+без загрузки всего репозитория. Индекс пересобирается, если файл изменился.
+"""
+import argparse
+import hashlib
+import json
+import mmap
+import os
+import re
+import struct
+import sys
+from array import array
+
+from pep508 import canonical_name
+
+MAGIC = b"PKGIDX01"
+VERSION = 1
+INDEX_SUFFIX = ".idx"
+REPOSITORY_SUFFIX = ".jsonl"
+
+_HEADER = struct.Struct("<8sIIQQd")
+_COLUMNS = (("hash", "Q"), ("offset", "Q"), ("length", "I"))
+# Строки, записанные write_repository, начинаются с имени — его можно взять без разбора JSON
+_LEADING_NAME_RE = re.compile(rb'\{\s*"name"\s*:\s*"([^"\\]*)"')
+
+
+def _name_hash(name):
+    value = int.from_bytes(hashlib.blake2b(name.encode("utf-8"), digest_size=8).digest(), "little")
+    return value or 1
+
+
+def is_repository(path):
+    """True, если путь указывает на JSONL-репозиторий."""
+    return path.endswith(REPOSITORY_SUFFIX)
+
+
+def index_path_for(path):
+    return path + INDEX_SUFFIX
+
+
+def _record_name(record):
+    name = record.get("name")
+    if name is None:
+        name = (record.get("info") or {}).get("name")
+    return name
+
+
+def _record_requires(record):
+    if "info" in record:
+        return (record.get("info") or {}).get("requires_dist")
+    return record.get("requires_dist")
+
+
+def _read_header(raw):
+    """(число пакетов, число слотов, размер источника, mtime источника) или None."""
+    if len(raw) < _HEADER.size:
+        return None
+    magic, version, count, slots, source_size, source_mtime = _HEADER.unpack(raw[:_HEADER.size])
+    if magic != MAGIC or version != VERSION:
+        return None
+    return count, slots, source_size, source_mtime
+
+
+def build_index(path, index_path=None):
+    """Сканирует JSONL-репозиторий и записывает индекс; возвращает число пакетов."""
+    index_path = index_path or index_path_for(path)
+    entries = {}
+    with open(path, "rb") as f:
+        offset = 0
+        for line_num, line in enumerate(f, 1):
+            stripped = line.strip()
+            if stripped:
+                match = _LEADING_NAME_RE.match(stripped)
+                try:
+                    name = match.group(1).decode("utf-8") if match else _record_name(json.loads(stripped))
+                except ValueError as e:
+                    raise ValueError(f"{path}:{line_num}: invalid JSON: {e}") from None
+                if not name:
+                    raise ValueError(f"{path}:{line_num}: package record without a name")
+                # При повторе имени действует последняя запись
+                entries[canonical_name(name)] = (offset, len(line.rstrip(b"\r\n")))
+            offset += len(line)
+
+    slots = 8
+    while slots < len(entries) * 2:
+        slots *= 2
+    mask = slots - 1
+    columns = {name: array(typecode, bytes(slots * array(typecode).itemsize)) for name, typecode in _COLUMNS}
+    hashes, offsets, lengths = columns["hash"], columns["offset"], columns["length"]
+    for name, (offset, length) in entries.items():
+        value = _name_hash(name)
+        slot = value & mask
+        while hashes[slot]:
+            slot = (slot + 1) & mask
+        hashes[slot] = value
+        offsets[slot] = offset
+        lengths[slot] = length
+
+    stat = os.stat(path)
+    tmp_path = index_path + ".tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(_HEADER.pack(MAGIC, VERSION, len(entries), slots, stat.st_size, stat.st_mtime))
+            for name, _ in _COLUMNS:
+                values = columns[name]
+                if sys.byteorder != "little":
+                    values.byteswap()
+                values.tofile(f)
+        os.replace(tmp_path, index_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return len(entries)
+
+
+def write_repository(path, packages):
+    """Записывает репозиторий из словаря имя -> список требований и строит индекс."""
+    with open(path, "w", encoding="utf-8") as f:
+        for name, requires in packages.items():
+            f.write(json.dumps({"name": name, "requires_dist": requires}, separators=(",", ":")))
+            f.write("\n")
+    return build_index(path)
+
+
+class PackageRepository:
+    """
+    JSONL-репозиторий, открытый через mmap вместе с индексом.
+    get(name) возвращает список требований пакета (через parse, если он задан)
+    или None, если пакета нет. Строки разбираются только при обращении.
+    """
+    def __init__(self, path, parse=None, index_path=None):
+        self.path = path
+        self.index_path = index_path or index_path_for(path)
+        self.parse = parse
+        if self._index_is_stale():
+            build_index(path, self.index_path)
+
+        with open(self.index_path, "rb") as f:
+            self._index_map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._count, self._slots = _read_header(self._index_map[:_HEADER.size])[:2]
+        self._mask = self._slots - 1
+        self._views = []
+        pos = _HEADER.size
+        columns = {}
+        for name, typecode in _COLUMNS:
+            size = self._slots * array(typecode).itemsize
+            raw = memoryview(self._index_map)[pos:pos + size]
+            if sys.byteorder != "little":
+                values = array(typecode)
+                values.frombytes(raw)
+                values.byteswap()
+                raw.release()
+            else:
+                values = raw.cast(typecode)
+                self._views += [raw, values]
+            columns[name] = values
+            pos += size
+        self._hashes, self._offsets, self._lengths = columns["hash"], columns["offset"], columns["length"]
+
+        with open(path, "rb") as f:
+            # mmap не отображает пустые файлы
+            self._data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if self._count else b""
+
+    def _index_is_stale(self):
+        try:
+            with open(self.index_path, "rb") as f:
+                header = _read_header(f.read(_HEADER.size))
+        except OSError:
+            return True
+        if header is None:
+            return True
+        stat = os.stat(self.path)
+        return header[2] != stat.st_size or header[3] != stat.st_mtime
+
+    def __len__(self):
+        return self._count
+
+    def __contains__(self, name):
+        return self._find(name) is not None
+
+    def _find(self, name):
+        """Запись пакета (словарь) по имени или None."""
+        key = canonical_name(name)
+        value = _name_hash(key)
+        hashes = self._hashes
+        slot = value & self._mask
+        while True:
+            slot_hash = hashes[slot]
+            if not slot_hash:
+                return None
+            if slot_hash == value:
+                offset = self._offsets[slot]
+                record = json.loads(self._data[offset:offset + self._lengths[slot]])
+                if canonical_name(_record_name(record)) == key:
+                    return record
+            slot = (slot + 1) & self._mask
+
+    def get(self, name, default=None):
+        record = self._find(name)
+        if record is None:
+            return default
+        requires = _record_requires(record) or []
+        return self.parse(requires) if self.parse else requires
+
+    def close(self):
+        for view in reversed(self._views):
+            view.release()
+        self._views = []
+        self._index_map.close()
+        if self._count:
+            self._data.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build or convert a local JSONL package repository")
+    parser.add_argument("path", help=f"Repository file ({REPOSITORY_SUFFIX})")
+    parser.add_argument("--from-json", metavar="JSON",
+                        help="Convert a JSON mapping 'package -> requirements' into the repository first")
+    args = parser.parse_args()
+
+    if args.from_json:
+        with open(args.from_json, "r", encoding="utf-8") as f:
+            count = write_repository(args.path, json.load(f))
+    else:
+        count = build_index(args.path)
+    print(f"{args.path}: {count} packages indexed")
@@ -0,0 +1,332 @@
+"""
+Разбор требований в формате PEP 508 (requires_dist) и вычисление маркеров окружения.
+
+Требование разбирается одним скомпилированным регулярным выражением, маркер
+компилируется в функцию от окружения. Оба результата кэшируются: в метаданных
+пакетов одни и те же строки требований и маркеров повторяются постоянно.
+"""
+import functools
+import os
+import platform
+import re
+import sys
+
+# Имя и extras требования; версия или URL после них на выбор зависимостей не влияют,
+# маркер отделяется по ";" до разбора
+_REQUIREMENT_RE = re.compile(r"""
+    \s*(?P<name>[A-Za-z0-9](?:[A-Za-z0-9._-]*[A-Za-z0-9])?)\s*
+    (?:\[(?P<extras>[^\]]*)\])?
+""", re.VERBOSE)
+
+_MARKER_TOKEN_RE = re.compile(r"""
+    \s*(?:
+        (?P<lparen>\() | (?P<rparen>\)) |
+        (?P<op>===|==|!=|<=|>=|~=|<|>|not\s+in\b|in\b) |
+        (?P<bool>and\b|or\b) |
+        (?P<string>'[^']*'|"[^"]*") |
+        (?P<var>[A-Za-z_][A-Za-z0-9_.]*)
+    )
+""", re.VERBOSE)
+
+_VERSION_RE = re.compile(r"^\s*v?(\d+(?:\.\d+)*)")
+_NAME_SEPARATORS_RE = re.compile(r"[-_.]+")
+
+MARKER_VARIABLES = frozenset((
+    "python_version", "python_full_version", "os_name", "sys_platform", "platform_release",
+    "platform_system", "platform_version", "platform_machine", "platform_python_implementation",
+    "implementation_name", "implementation_version", "extra",
+))
+# Переменные, значения которых сравниваются как версии
+_VERSION_VARIABLES = frozenset(("python_version", "python_full_version", "implementation_version"))
+
+# Размер кэшей разобранных требований и скомпилированных маркеров
+REQUIREMENT_CACHE_SIZE = 65536
+MARKER_CACHE_SIZE = 4096
+
+
+class InvalidRequirement(ValueError):
+    pass
+
+
+class MarkerEnvironment(dict):
+    """
+    Значения переменных маркеров. Дополнительно запоминает результаты маркеров
+    и решение по каждой встреченной строке требования: (нормализованное имя, имя)
+    или None, если требование в этом окружении не действует или некорректно.
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.markers = {}
+        self.decisions = {}
+
+
+def canonical_name(name):
+    """Нормализованное имя пакета (PEP 503)."""
+    name = name.lower()
+    if "_" in name or "." in name or "--" in name:
+        return _NAME_SEPARATORS_RE.sub("-", name)
+    return name
+
+
+def default_environment(python_version=None, extras=()):
+    """
+    Окружение для вычисления маркеров: текущий интерпретатор и платформа.
+    python_version ("3.8") подменяет версию Python, extras — запрошенные extras пакета.
+    """
+    implementation = sys.implementation
+    impl_version = "{0.major}.{0.minor}.{0.micro}".format(implementation.version)
+    full_version = platform.python_version()
+    if python_version:
+        full_version = python_version if python_version.count(".") >= 2 else python_version + ".0"
+    return MarkerEnvironment({
+        "python_version": ".".join(full_version.split(".")[:2]),
+        "python_full_version": full_version,
+        "os_name": os.name,
+        "sys_platform": sys.platform,
+        "platform_release": platform.release(),
+        "platform_system": platform.system(),
+        "platform_version": platform.version(),
+        "platform_machine": platform.machine(),
+        "platform_python_implementation": platform.python_implementation(),
+        "implementation_name": implementation.name,
+        "implementation_version": impl_version,
+        "extra": frozenset(canonical_name(extra) for extra in extras),
+    })
+
+
+def _version_tuple(value):
+    match = _VERSION_RE.match(value)
+    if match is None or match.end() != len(value.rstrip()):
+        return None
+    return tuple(int(part) for part in match.group(1).split("."))
+
+
+def _compare_versions(left, op, right):
+    """Сравнение версий-релизов (3.8, 3.10.2); None, если одна из сторон не версия."""
+    if op == "==" and right.endswith(".*"):
+        prefix = _version_tuple(right[:-2])
+        version = _version_tuple(left)
+        return None if prefix is None or version is None else version[:len(prefix)] == prefix
+    lv, rv = _version_tuple(left), _version_tuple(right)
+    if lv is None or rv is None:
+        return None
+    width = max(len(lv), len(rv))
+    lv += (0,) * (width - len(lv))
+    if op == "~=":
+        if len(rv) < 2:
+            return None
+        prefix = rv[:-1]
+        rv += (0,) * (width - len(rv))
+        return lv >= rv and lv[:len(prefix)] == prefix
+    rv += (0,) * (width - len(rv))
+    if op == "==":
+        return lv == rv
+    if op == "!=":
+        return lv != rv
+    if op == "<":
+        return lv < rv
+    if op == "<=":
+        return lv <= rv
+    if op == ">":
+        return lv > rv
+    if op == ">=":
+        return lv >= rv
+    return None
+
+
+def _compare(left, op, right, as_version):
+    if op == "in":
+        return left in right
+    if op == "not in":
+        return left not in right
+    if op == "===":
+        return left == right
+    if as_version:
+        result = _compare_versions(left, op, right)
+        if result is not None:
+            return result
+    if op == "==":
+        return left == right
+    if op == "!=":
+        return left != right
+    # Порядковые сравнения строк, не являющихся версиями, маркер не выполняют
+    return False
+
+
+def _compile_comparison(left, op, right):
+    op = " ".join(op.split())
+    left_var = left if left[0] == "var" else None
+    right_var = right if right[0] == "var" else None
+    if left_var and right_var or not (left_var or right_var):
+        raise InvalidRequirement("marker must compare a variable with a string")
+
+    if (left_var or right_var)[1] == "extra":
+        # extra сравнивается с каждым запрошенным extra (имена нормализуются)
+        value = canonical_name((right if left_var else left)[1])
+        if op == "==":
+            return lambda env: value in env["extra"]
+        if op == "!=":
+            return lambda env: value not in env["extra"]
+        return lambda env: False
+
+    if left_var:
+        name, value = left_var[1], right[1]
+        as_version = name in _VERSION_VARIABLES
+        return lambda env: _compare(env.get(name, ""), op, value, as_version)
+    name, value = right_var[1], left[1]
+    as_version = name in _VERSION_VARIABLES
+    return lambda env: _compare(value, op, env.get(name, ""), as_version)
+
+
+def _tokenize_marker(marker):
+    tokens = []
+    pos = 0
+    marker = marker.rstrip()
+    while pos < len(marker):
+        match = _MARKER_TOKEN_RE.match(marker, pos)
+        if match is None or match.end() == pos:
+            raise InvalidRequirement(f"invalid marker: {marker!r}")
+        kind = match.lastgroup
+        text = match.group(kind)
+        if kind == "string":
+            tokens.append(("str", text[1:-1]))
+        elif kind == "var":
+            if text not in MARKER_VARIABLES:
+                raise InvalidRequirement(f"unknown marker variable {text!r}")
+            tokens.append(("var", text))
+        else:
+            tokens.append((kind, text))
+        pos = match.end()
+    return tokens
+
+
+class _MarkerParser:
+    """Рекурсивный спуск по грамматике маркера: or -> and -> (выражение) | сравнение."""
+    def __init__(self, marker):
+        self.marker = marker
+        self.tokens = _tokenize_marker(marker)
+        self.pos = 0
+
+    def _peek(self, kind, text=None):
+        if self.pos < len(self.tokens):
+            token_kind, token_text = self.tokens[self.pos]
+            return token_kind == kind and (text is None or token_text == text)
+        return False
+
+    def _take(self):
+        if self.pos >= len(self.tokens):
+            raise InvalidRequirement(f"unexpected end of marker: {self.marker!r}")
+        token = self.tokens[self.pos]
+        self.pos += 1
+        return token
+
+    def parse(self):
+        result = self._or()
+        if self.pos != len(self.tokens):
+            raise InvalidRequirement(f"invalid marker: {self.marker!r}")
+        return result
+
+    def _or(self):
+        terms = [self._and()]
+        while self._peek("bool", "or"):
+            self.pos += 1
+            terms.append(self._and())
+        if len(terms) == 1:
+            return terms[0]
+        return lambda env: any(term(env) for term in terms)
+
+    def _and(self):
+        terms = [self._atom()]
+        while self._peek("bool", "and"):
+            self.pos += 1
+            terms.append(self._atom())
+        if len(terms) == 1:
+            return terms[0]
+        return lambda env: all(term(env) for term in terms)
+
+    def _atom(self):
+        if self._peek("lparen"):
+            self.pos += 1
+            result = self._or()
+            if self._take()[0] != "rparen":
+                raise InvalidRequirement(f"unbalanced parentheses in marker: {self.marker!r}")
+            return result
+        left = self._take()
+        op = self._take()
+        right = self._take()
+        if left[0] not in ("var", "str") or op[0] != "op" or right[0] not in ("var", "str"):
+            raise InvalidRequirement(f"invalid marker: {self.marker!r}")
+        return _compile_comparison(left, op[1], right)
+
+
+@functools.lru_cache(maxsize=MARKER_CACHE_SIZE)
+def compile_marker(marker):
+    """Компилирует маркер окружения в функцию env -> bool."""
+    return _MarkerParser(marker).parse()
+
+
+@functools.lru_cache(maxsize=REQUIREMENT_CACHE_SIZE)
+def parse_requirement(requirement):
+    """
+    Разбирает строку требования: (имя, нормализованное имя, extras, маркер или None).
+    Бросает InvalidRequirement для строк, не соответствующих PEP 508.
+    """
+    text, _, marker = requirement.partition(";")
+    match = _REQUIREMENT_RE.match(text)
+    if match is None:
+        raise InvalidRequirement(f"invalid requirement: {requirement!r}")
+    name, extras = match.groups()
+    extras = tuple(e.strip() for e in extras.split(",") if e.strip()) if extras else ()
+    marker = marker.strip() or None
+    if marker is not None:
+        compile_marker(marker)
+    return name, canonical_name(name), extras, marker
+
+
+def requirement_names(requires_dist, environment=None):
+    """
+    Имена пакетов из списка требований, маркеры которых выполняются в environment.
+    Порядок сохраняется, повторы (по нормализованному имени) отбрасываются,
+    некорректные требования пропускаются.
+    """
+    return batch_requirement_names((requires_dist,), environment)[0]
+
+
+def _decide(requirement, environment):
+    try:
+        name, key, _, marker = parse_requirement(requirement)
+    except InvalidRequirement:
+        return None
+    if marker is not None:
+        markers = getattr(environment, "markers", None)
+        if markers is None:
+            satisfied = compile_marker(marker)(environment)
+        else:
+            satisfied = markers.get(marker)
+            if satisfied is None:
+                satisfied = markers[marker] = compile_marker(marker)(environment)
+        if not satisfied:
+            return None
+    return key, name
+
+
+def batch_requirement_names(batch, environment=None):
+    """requirement_names для нескольких списков требований за один проход с общими кэшами."""
+    environment = environment if environment is not None else default_environment()
+    decisions = getattr(environment, "decisions", None)
+    if decisions is None:
+        decisions = {}
+    elif len(decisions) > REQUIREMENT_CACHE_SIZE:
+        decisions.clear()
+    results = []
+    for requires_dist in batch:
+        names = {}
+        for requirement in requires_dist or ():
+            try:
+                decision = decisions[requirement]
+            except KeyError:
+                decision = decisions[requirement] = _decide(requirement, environment)
+            if decision is not None and decision[0] not in names:
+                names[decision[0]] = decision[1]
+        results.append(list(names.values()))
+    return results
@@ -1,9 +1,323 @@
 import argparse
+import gzip
+import hashlib
+import http.client
 import json
-import urllib.request
-import re
 import os
 import sys
+import threading
+import time
+from array import array
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from urllib.parse import urljoin, urlsplit
+
+import package_repository
+import pep508
+from pep508 import canonical_name
+
+
+class PooledHttpClient:
+    """
+    HTTP-клиент с постоянными (keep-alive) соединениями: у каждого потока своё
+    соединение на хост, повторно используемое между запросами. Все запросы с таймаутом.
+    """
+    REDIRECT_CODES = (301, 302, 303, 307, 308)
+
+    def __init__(self, timeout=10, max_redirects=3):
+        self.timeout = timeout
+        self.max_redirects = max_redirects
+        self._local = threading.local()
+        self._all = []
+        self._lock = threading.Lock()
+
+    def _connection(self, scheme, netloc, fresh=False):
+        conns = getattr(self._local, 'conns', None)
+        if conns is None:
+            conns = self._local.conns = {}
+        key = (scheme, netloc)
+        conn = conns.get(key)
+        if conn is not None and fresh:
+            conn.close()
+            conn = None
+        if conn is None:
+            cls = http.client.HTTPSConnection if scheme == 'https' else http.client.HTTPConnection
+            conn = conns[key] = cls(netloc, timeout=self.timeout)
+            with self._lock:
+                self._all.append(conn)
+        return conn
+
+    def get(self, url, headers=None):
+        """GET-запрос; возвращает (status, headers, body). Редиректы обрабатываются."""
+        request_headers = {'Accept': 'application/json', 'User-Agent': 'practice_2-dependency-analyzer'}
+        request_headers.update(headers or {})
+        for _ in range(self.max_redirects + 1):
+            parts = urlsplit(url)
+            path = (parts.path or '/') + (f'?{parts.query}' if parts.query else '')
+            for attempt in range(2):
+                # Соединение из пула могло быть закрыто сервером — одна повторная попытка на новом
+                conn = self._connection(parts.scheme, parts.netloc, fresh=attempt > 0)
+                try:
+                    conn.request('GET', path, headers=request_headers)
+                    response = conn.getresponse()
+                    body = response.read()
+                    break
+                except (http.client.HTTPException, ConnectionError) as e:
+                    conn.close()
+                    if attempt:
+                        raise e
+            if response.status in self.REDIRECT_CODES and response.getheader('Location'):
+                url = urljoin(url, response.getheader('Location'))
+                continue
+            return response.status, response.headers, body
+        raise Exception(f"Слишком много перенаправлений: {url}")
+
+    def close(self):
+        with self._lock:
+            for conn in self._all:
+                conn.close()
+            self._all.clear()
+
+
+class MetadataCache:
+    """
+    Локальный кэш метаданных пакетов: по файлу <имя>.json.gz на пакет в каталоге
+    репозитория. В файле — сами метаданные и сведения для повторной проверки
+    (ETag, Last-Modified, время загрузки). Время изменения файла обновляется при
+    каждом чтении, при превышении max_bytes удаляются давно не использованные файлы.
+    """
+    SUFFIX = '.json.gz'
+
+    def __init__(self, cache_dir, repo_url, ttl=3600, max_bytes=64 * 1024 * 1024):
+        # Для каждого репозитория — свой подкаталог
+        repo_key = hashlib.sha1(repo_url.encode('utf-8')).hexdigest()[:12]
+        self.directory = os.path.join(os.path.expanduser(cache_dir), repo_key)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._total_bytes = None
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _path(self, name):
+        return os.path.join(self.directory, canonical_name(name) + self.SUFFIX)
+
+    def get(self, name):
+        """Запись кэша ({'data', 'etag', 'last_modified', 'fetched_at'}) или None."""
+        path = self._path(name)
+        try:
+            with gzip.open(path, 'rt', encoding='utf-8') as f:
+                entry = json.load(f)
+            os.utime(path)
+        except (OSError, ValueError, EOFError):
+            return None
+        return entry
+
+    def is_fresh(self, entry):
+        return time.time() - entry.get('fetched_at', 0) < self.ttl
+
+    def put(self, name, entry):
+        """Атомарно сохраняет запись и при необходимости освобождает место."""
+        path = self._path(name)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with gzip.open(tmp_path, 'wt', encoding='utf-8') as f:
+            json.dump(entry, f, separators=(',', ':'))
+        new_size = os.path.getsize(tmp_path)
+        with self._lock:
+            old_size = os.path.getsize(path) if os.path.exists(path) else 0
+            os.replace(tmp_path, path)
+            total = self._get_total_bytes() + new_size - old_size
+            self._total_bytes = total
+            if total > self.max_bytes:
+                self._evict()
+
+    def _get_total_bytes(self):
+        if self._total_bytes is None:
+            self._total_bytes = sum(e.stat().st_size for e in os.scandir(self.directory)
+                                    if e.name.endswith(self.SUFFIX))
+        return self._total_bytes
+
+    def _evict(self):
+        """Удаляет самые давно использованные записи, пока кэш не уложится в 90% лимита."""
+        entries = sorted((e for e in os.scandir(self.directory) if e.name.endswith(self.SUFFIX)),
+                         key=lambda e: e.stat().st_mtime)
+        total = sum(e.stat().st_size for e in entries)
+        target = self.max_bytes * 0.9
+        for entry in entries:
+            if total <= target:
+                break
+            size = entry.stat().st_size
+            try:
+                os.remove(entry.path)
+                total -= size
+            except OSError:
+                pass
+        self._total_bytes = total
+
+    def clear(self):
+        with self._lock:
+            for entry in os.scandir(self.directory):
+                if entry.name.endswith(self.SUFFIX):
+                    os.remove(entry.path)
+            self._total_bytes = 0
+
+
+# Сколько найденных циклов показывать в выводе
+MAX_REPORTED_CYCLES = 20
+
+
+class DependencyGraph:
+    """
+    Граф зависимостей в компактной форме: пакеты пронумерованы в порядке обхода
+    в ширину (корень — 0), имена интернированы, рёбра хранятся одним массивом
+    targets, зависимости пакета i — targets[offsets[i]:offsets[i + 1]].
+    depth[i] — кратчайшее расстояние от корня.
+    """
+    def __init__(self):
+        self.names = []
+        self.index = {}
+        self.depth = array('I')
+        self.offsets = array('I', [0])
+        self.targets = array('I')
+
+    def __len__(self):
+        return len(self.names)
+
+    def _add(self, name, depth):
+        node = self.index.get(name)
+        if node is None:
+            node = self.index[name] = len(self.names)
+            self.names.append(sys.intern(name))
+            self.depth.append(depth)
+        return node
+
+    def dependencies(self, name):
+        """Прямые зависимости пакета (список имён)."""
+        node = self.index[name]
+        return [self.names[t] for t in self.targets[self.offsets[node]:self.offsets[node + 1]]]
+
+    def to_dict(self):
+        return {name: self.dependencies(name) for name in self.names}
+
+    def find_cycles(self, limit=None):
+        """
+        Ищет циклы итеративным обходом в глубину (без рекурсии).
+        Каждое обратное ребро даёт один цикл — список имён, первое совпадает с последним.
+        """
+        names, offsets, targets = self.names, self.offsets, self.targets
+        cycles = []
+        if not names:
+            return cycles
+        state = bytearray(len(names))  # 0 — не посещён, 1 — на текущем пути, 2 — обработан
+        path_pos = {}
+        path = [0]
+        stack = [[0, offsets[0]]]
+        state[0] = 1
+        path_pos[0] = 0
+        while stack:
+            frame = stack[-1]
+            node, pos = frame
+            if pos == offsets[node + 1]:
+                stack.pop()
+                path.pop()
+                del path_pos[node]
+                state[node] = 2
+                continue
+            frame[1] = pos + 1
+            child = targets[pos]
+            if state[child] == 1:
+                cycles.append([names[n] for n in path[path_pos[child]:]] + [names[child]])
+                if limit is not None and len(cycles) >= limit:
+                    break
+            elif state[child] == 0:
+                state[child] = 1
+                path_pos[child] = len(path)
+                path.append(child)
+                stack.append([child, offsets[child]])
+        return cycles
+
+    def iter_tree_lines(self, max_depth=None, errors=None):
+        """
+        Построчно отдаёт ASCII-дерево зависимостей (генератор, без сборки всего текста).
+        Поддерево каждого пакета разворачивается один раз, повторные вхождения
+        помечаются (*), зависимость на пакет с текущего пути — (цикл).
+        """
+        names, offsets, targets = self.names, self.offsets, self.targets
+        if not names:
+            return
+        errors = errors or {}
+        max_depth = float('inf') if max_depth is None else max_depth
+
+        def label(node):
+            name = names[node]
+            return f"{name} (ошибка: {errors[name]})" if name in errors else name
+
+        yield label(0)
+        shown = bytearray(len(names))
+        on_path = bytearray(len(names))
+        shown[0] = on_path[0] = 1
+        stack = [[0, offsets[0], ""]]
+        while stack:
+            frame = stack[-1]
+            node, pos, prefix = frame
+            end = offsets[node + 1]
+            if pos == end:
+                stack.pop()
+                on_path[node] = 0
+                continue
+            frame[1] = pos + 1
+            child = targets[pos]
+            last = pos + 1 == end
+            branch = prefix + ("└── " if last else "├── ")
+            has_children = offsets[child] != offsets[child + 1]
+            if on_path[child]:
+                yield branch + names[child] + " (цикл)"
+            elif shown[child] and has_children:
+                yield branch + names[child] + " (*)"
+            else:
+                yield branch + label(child)
+                if has_children and len(stack) < max_depth:
+                    shown[child] = on_path[child] = 1
+                    stack.append([child, offsets[child], prefix + ("    " if last else "│   ")])
+
+    def write_tree(self, out=None, max_depth=None, errors=None, block_lines=1024):
+        """Выводит ASCII-дерево в out блоками по block_lines строк; возвращает число строк."""
+        out = out or sys.stdout
+        block = []
+        count = 0
+        for line in self.iter_tree_lines(max_depth, errors):
+            block.append(line)
+            if len(block) >= block_lines:
+                out.write("\n".join(block) + "\n")
+                count += len(block)
+                block.clear()
+        if block:
+            out.write("\n".join(block) + "\n")
+            count += len(block)
+        return count
+
+
+def build_dependency_graph(root, get_dependencies, max_depth):
+    """
+    Строит DependencyGraph обходом в ширину от root без рекурсии.
+    get_dependencies(name) возвращает имена зависимостей; каждый пакет
+    разворачивается один раз, пакеты на глубине max_depth остаются листьями.
+    """
+    graph = DependencyGraph()
+    graph._add(root, 0)
+    node = 0
+    # Узлы нумеруются в порядке обнаружения, поэтому обход идёт по номерам,
+    # а смещения рёбер дописываются подряд
+    while node < len(graph.names):
+        depth = graph.depth[node]
+        if depth < max_depth:
+            seen = set()
+            for dep in get_dependencies(graph.names[node]) or ():
+                target = graph._add(dep, depth + 1)
+                if target not in seen:
+                    seen.add(target)
+                    graph.targets.append(target)
+        graph.offsets.append(len(graph.targets))
+        node += 1
+    return graph
 
 
 class PackageAnalyzer:
@@ -13,8 +327,44 @@ class PackageAnalyzer:
             'repo_url': '',
             'test_mode': False,
             'ascii_tree': True,
-            'max_depth': 5
+            'max_depth': 5,
+            'timeout': 10,
+            'workers': 8,
+            'cache_dir': os.path.join('~', '.cache', 'practice_2'),
+            'cache_ttl': 3600,
+            'cache_max_mb': 64,
+            'offline': False,
+            'extras': [],
+            'python_version': ''
         }
+        self._http = None
+        self._cache = None
+        self._repository = None
+        self._environment = None
+
+    @property
+    def http(self):
+        """Общий пул HTTP-соединений (создаётся при первом запросе, с таймаутом из конфигурации)."""
+        if self._http is None:
+            self._http = PooledHttpClient(timeout=self.config['timeout'])
+        return self._http
+
+    @property
+    def cache(self):
+        """Кэш метаданных для текущего repo_url; None, если cache_dir не задан."""
+        if self._cache is None and self.config['cache_dir']:
+            self._cache = MetadataCache(self.config['cache_dir'], self.config['repo_url'],
+                                        ttl=self.config['cache_ttl'],
+                                        max_bytes=self.config['cache_max_mb'] * 1024 * 1024)
+        return self._cache
+
+    @property
+    def environment(self):
+        """Окружение для маркеров PEP 508: текущий Python или python_version, запрошенные extras."""
+        if self._environment is None:
+            self._environment = pep508.default_environment(self.config['python_version'] or None,
+                                                           self.config['extras'])
+        return self._environment
 
     def load_config(self, config_path):
         """Загрузка конфигурации из JSON-файла"""
@@ -38,6 +388,8 @@ class PackageAnalyzer:
             errors.append("Не указано имя пакета")
         if not self.config['repo_url']:
             errors.append("Не указан URL репозитория или путь к файлу")
+        if self.config['offline'] and not self.config['cache_dir']:
+            errors.append("Режим offline требует каталог кэша (cache_dir)")
 
         if errors:
             raise Exception("Ошибки конфигурации:\n- " + "\n- ".join(errors))
@@ -63,56 +415,213 @@ class PackageAnalyzer:
 
         return dependencies
 
+    def package_url(self, package_name):
+        """URL метаданных пакета на основе конфигурации"""
+        if self.config['repo_url'].startswith(('http://', 'https://')):
+            return f"{self.config['repo_url']}{package_name}/json"
+        return f"https://{self.config['repo_url']}{package_name}/json"
+
+    def fetch_package_data(self, package_name):
+        """
+        Загружает JSON-метаданные пакета через пул соединений.
+        Свежая запись кэша (моложе cache_ttl) возвращается без обращения к сети,
+        устаревшая перепроверяется условным запросом (If-None-Match / If-Modified-Since).
+        В режиме offline используется только кэш.
+        """
+        cache = self.cache
+        entry = cache.get(package_name) if cache else None
+        if entry is not None and (self.config['offline'] or cache.is_fresh(entry)):
+            return entry['data']
+        if self.config['offline']:
+            raise Exception(f"Пакет {package_name} отсутствует в кэше (offline)")
+
+        url = self.package_url(package_name)
+        headers = {}
+        if entry is not None:
+            if entry.get('etag'):
+                headers['If-None-Match'] = entry['etag']
+            if entry.get('last_modified'):
+                headers['If-Modified-Since'] = entry['last_modified']
+        status, response_headers, body = self.http.get(url, headers)
+
+        if status == 304 and entry is not None:
+            # Не изменилось — продлеваем срок записи
+            entry['fetched_at'] = time.time()
+            cache.put(package_name, entry)
+            return entry['data']
+        if status != 200:
+            raise Exception(f"HTTP {status} для {url}")
+        data = json.loads(body.decode('utf-8'))
+        if cache:
+            cache.put(package_name, {
+                'data': data,
+                'etag': response_headers.get('ETag'),
+                'last_modified': response_headers.get('Last-Modified'),
+                'fetched_at': time.time(),
+            })
+        return data
+
     def get_dependencies_from_pypi(self, package_name):
         """Получение зависимостей из PyPI"""
         try:
-            # Формируем URL на основе конфигурации
-            if self.config['repo_url'].startswith(('http://', 'https://')):
-                url = f"{self.config['repo_url']}{package_name}/json"
-            else:
-                url = f"https://{self.config['repo_url']}{package_name}/json"
-
-            with urllib.request.urlopen(url) as response:
-                data = json.loads(response.read().decode('utf-8'))
-
+            data = self.fetch_package_data(package_name)
             return self.parse_dependencies(data)
 
         except Exception as e:
             print(f"Ошибка при получении зависимостей: {e}")
             return []
 
+    def resolve_transitive(self, package_name=None, max_depth=None, workers=None):
+        """
+        Транзитивное разрешение зависимостей с параллельной загрузкой метаданных.
+        Пакеты загружаются пулом из workers потоков; один и тот же пакет (по
+        нормализованному имени) запрашивается не более одного раза, даже если на
+        него ссылаются несколько пакетов одновременно. Пакеты на глубине max_depth
+        не загружаются — это листья графа.
+        Возвращает (graph, depth, errors): имя -> список зависимостей, имя -> глубина,
+        имя -> текст ошибки. Все имена нормализованы (canonical_name).
+        """
+        root = canonical_name(package_name or self.config['package_name'])
+        max_depth = self.config['max_depth'] if max_depth is None else max_depth
+        workers = workers or self.config['workers']
+
+        graph = {}
+        depth = {root: 0}
+        errors = {}
+        in_flight = {}  # future -> имя
+        requested = set()
+
+        def fetch(name):
+            return self.parse_dependencies(self.fetch_package_data(name))
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            def request(name):
+                if name not in requested and depth[name] < max_depth:
+                    requested.add(name)
+                    in_flight[executor.submit(fetch, name)] = name
+
+            def expand(name):
+                # Глубина узла могла уменьшиться — протягиваем её по уже загруженным потомкам
+                stack = [name]
+                while stack:
+                    current = stack.pop()
+                    child_depth = depth[current] + 1
+                    for dep in graph.get(current, ()):
+                        if dep not in depth or child_depth < depth[dep]:
+                            depth[dep] = child_depth
+                            if dep in graph:
+                                stack.append(dep)
+                            else:
+                                request(dep)
+
+            request(root)
+            while in_flight:
+                done, _ = wait(list(in_flight), return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = in_flight.pop(future)
+                    try:
+                        graph[name] = [canonical_name(dep) for dep in future.result()]
+                    except Exception as e:
+                        errors[name] = str(e)
+                        graph[name] = []
+                    expand(name)
+        return graph, depth, errors
+
+    def load_test_repository(self):
+        """
+        Тестовый репозиторий из файла repo_url (открывается один раз). Форматы файла:
+        JSON одного пакета в формате PyPI ({"info": ...}), словарь "имя пакета" ->
+        список требований либо JSON пакета в формате PyPI, или JSONL-репозиторий
+        с индексом (*.jsonl, см. package_repository) — он не загружается целиком.
+        Возвращает отображение с методом get: нормализованное имя -> имена зависимостей.
+        """
+        if self._repository is None and package_repository.is_repository(self.config['repo_url']):
+            self._repository = package_repository.PackageRepository(self.config['repo_url'],
+                                                                    parse=self.requirement_names)
+        if self._repository is None:
+            with open(self.config['repo_url'], 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if 'info' in data:
+                data = {self.config['package_name']: data}
+            # Все списки требований разбираются одним пакетом
+            batch = []
+            for value in data.values():
+                if isinstance(value, dict):
+                    value = (value.get('info') or {}).get('requires_dist')
+                batch.append(value)
+            names = pep508.batch_requirement_names(batch, self.environment)
+            self._repository = {canonical_name(name): deps for name, deps in zip(data, names)}
+        return self._repository
+
     def get_dependencies_from_file(self):
         """Получение зависимостей из тестового файла"""
         try:
-            with open(self.config['repo_url'], 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            return self.parse_dependencies(data)
+            repository = self.load_test_repository()
+            dependencies = repository.get(canonical_name(self.config['package_name']))
+            if dependencies is None:
+                raise Exception(f"пакет {self.config['package_name']} не найден в тестовом репозитории")
+            return dependencies
         except Exception as e:
             print(f"Ошибка при чтении тестового файла: {e}")
             return []
 
+    def build_graph(self, package_name=None, max_depth=None):
+        """
+        Граф транзитивных зависимостей до max_depth: (DependencyGraph, errors).
+        В тестовом режиме пакеты берутся из файла repo_url, иначе загружаются из репозитория.
+        """
+        root = canonical_name(package_name or self.config['package_name'])
+        max_depth = self.config['max_depth'] if max_depth is None else max_depth
+
+        if self.config['test_mode']:
+            repository = self.load_test_repository()
+            errors = {}
+
+            def dependencies(name):
+                deps = repository.get(name)
+                if deps is None:
+                    errors[name] = "пакет не найден в тестовом репозитории"
+                    return ()
+                return [canonical_name(dep) for dep in deps]
+
+            return build_dependency_graph(root, dependencies, max_depth), errors
+
+        resolved, _, errors = self.resolve_transitive(root, max_depth)
+        return build_dependency_graph(root, resolved.get, max_depth), errors
+
+    def print_transitive(self):
+        """Вывод транзитивных зависимостей: ASCII-деревом (ascii_tree) или списком с глубиной"""
+        graph, errors = self.build_graph()
+        max_depth = self.config['max_depth']
+        print(f"Транзитивные зависимости (max_depth={max_depth}):")
+        if self.config['ascii_tree']:
+            graph.write_tree(max_depth=max_depth, errors=errors)
+        else:
+            for node in sorted(range(1, len(graph)), key=lambda n: (graph.depth[n], graph.names[n])):
+                name = graph.names[node]
+                suffix = f" (ошибка: {errors[name]})" if name in errors else ""
+                print(f"  [{graph.depth[node]}] {name}{suffix}")
+
+        cycles = graph.find_cycles(limit=MAX_REPORTED_CYCLES)
+        if cycles:
+            print("Обнаружены циклические зависимости:")
+            for cycle in cycles:
+                print("  " + " -> ".join(cycle))
+        if self.config['package_name'] and canonical_name(self.config['package_name']) in errors:
+            print(f"Ошибка при получении зависимостей: {errors[canonical_name(self.config['package_name'])]}")
+
     def parse_dependencies(self, package_data):
         """Парсинг зависимостей из данных пакета"""
-        dependencies = []
-
         if 'info' in package_data and 'requires_dist' in package_data['info']:
-            requires_dist = package_data['info']['requires_dist']
-
-            if requires_dist:
-                pattern = r"^([a-zA-Z\d_-]+)\s*"
-                for dep in requires_dist:
-                    # Игнорируем зависимости с условиями (extra)
-                    if 'extra' in dep:
-                        continue
-
-                    # Извлекаем имя пакета
-                    match = re.match(pattern, dep.split(';')[0].strip())
-                    if match:
-                        package_name = match.group(1)
-                        if package_name not in dependencies:
-                            dependencies.append(package_name)
+            return self.requirement_names(package_data['info']['requires_dist'])
+        return []
 
-        return dependencies
+    def requirement_names(self, requires_dist):
+        """
+        Имена пакетов из списка требований PEP 508 без повторов. Требования,
+        маркеры которых не выполняются (extras, python_version, платформа), пропускаются.
+        """
+        return pep508.requirement_names(requires_dist, self.environment)
 
     def command_line(self):
         """Обработка командной строки"""
@@ -125,11 +634,27 @@ class PackageAnalyzer:
                             required=True,
                             help='Путь к конфигурационному файлу JSON')
 
+        parser.add_argument('--transitive', '-t',
+                            action='store_true',
+                            help='Разрешить транзитивные зависимости до max_depth')
+
+        parser.add_argument('--offline',
+                            action='store_true',
+                            help='Не обращаться к сети, использовать только локальный кэш метаданных')
+
+        parser.add_argument('--no-cache',
+                            action='store_true',
+                            help='Не использовать локальный кэш метаданных')
+
         args = parser.parse_args()
 
         try:
             # Загрузка конфигурации
             self.load_config(args.config)
+            if args.offline:
+                self.config['offline'] = True
+            if args.no_cache:
+                self.config['cache_dir'] = ''
             self.validate_config()
 
             # Вывод конфигурации (этап 1)
@@ -141,6 +666,9 @@ class PackageAnalyzer:
             # Получение и вывод зависимостей (этап 2)
             self.get_dependencies()
 
+            if args.transitive:
+                self.print_transitive()
+
         except Exception as e:
             print(f"Ошибка: {e}")
             sys.exit(1)
@@ -0,0 +1,97 @@
+"""
+Локальная заглушка PyPI JSON API для проверки и бенчмарков PackageAnalyzer.
+Отдаёт /pypi/<пакет>/json в формате PyPI по графу зависимостей {пакет: [зависимости]}.
+Запуск: python pypi_stub.py graph.json --port 8000, затем repo_url = "http://127.0.0.1:8000/pypi/".
+"""
+import argparse
+import hashlib
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def package_json(name, requires):
+    """Метаданные пакета в формате PyPI JSON API."""
+    return {"info": {"name": name, "version": "1.0", "requires_dist": list(requires)}}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    # HTTP/1.1 — соединения keep-alive; заголовки и тело уходят без задержки Nagle
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        server = self.server
+        with server.stats_lock:
+            server.requests += 1
+        parts = [p for p in self.path.split("?")[0].split("/") if p]
+        requires = None
+        if len(parts) >= 2 and parts[-1] == "json":
+            requires = server.graph.get(parts[-2])
+        etag = None
+        if requires is None:
+            body = b'{"message": "Not Found"}'
+            self.send_response(404)
+        else:
+            if server.latency:
+                time.sleep(server.latency)
+            body = json.dumps(package_json(parts[-2], requires)).encode("utf-8")
+            etag = '"%s"' % hashlib.sha1(body).hexdigest()[:16]
+            if self.headers.get("If-None-Match") == etag:
+                # Условный запрос: метаданные не изменились
+                with server.stats_lock:
+                    server.not_modified += 1
+                body = b""
+                self.send_response(304)
+            else:
+                self.send_response(200)
+        if etag:
+            self.send_header("ETag", etag)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubPyPIServer(ThreadingHTTPServer):
+    """HTTP-сервер с графом пакетов; latency — искусственная задержка ответа, сек."""
+    daemon_threads = True
+
+    def __init__(self, graph, host="127.0.0.1", port=0, latency=0.0):
+        super().__init__((host, port), _Handler)
+        self.graph = graph
+        self.latency = latency
+        self.requests = 0
+        self.not_modified = 0
+        self.stats_lock = threading.Lock()
+
+    @property
+    def repo_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/pypi/"
+
+    def start(self):
+        """Запускает сервер в фоновом потоке и возвращает self."""
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local stand-in for the PyPI JSON API")
+    parser.add_argument("graph", help="JSON file: {package: [requirement, ...]}")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--latency", type=float, default=0.0, help="artificial response delay, seconds")
+    args = parser.parse_args()
+    with open(args.graph, "r", encoding="utf-8") as f:
+        graph = json.load(f)
+    server = StubPyPIServer(graph, port=args.port, latency=args.latency)
+    print(f"Serving {len(graph)} packages at {server.repo_url}")
+    server.serve_forever()
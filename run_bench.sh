@@ -0,0 +1,6 @@
+#!/bin/sh
+# Набор бенчмарков (python3 bench.py suite); результаты пишутся в bench_results/.
+# Сравнение двух прогонов: python3 bench.py compare bench_results/<старый>.json bench_results/<новый>.json
+# Пример: ./run_bench.sh --sizes 10000 100000 1000000 10000000 --data-dir /tmp/vfs_images
+cd "$(dirname "$0")" || exit 1
+exec python3 bench.py suite "$@"
@@ -0,0 +1,4 @@
+#!/bin/sh
+cd "$(dirname "$0")" || exit 1
+echo "Running emulator (GUI)..."
+python3 emu_gui.py "$@"
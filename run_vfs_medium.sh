@@ -0,0 +1,3 @@
+#!/bin/sh
+cd "$(dirname "$0")" || exit 1
+python3 emu_gui.py --vfs-path "vfs_medium.csv" "$@"
@@ -0,0 +1,146 @@
+"""
+Движок стартовых скриптов: скрипт разбирается целиком заранее в список
+скомпилированных команд, повторный запуск того же файла (по хешу содержимого)
+разбор пропускает, вывод копится и отдаётся в output_func блоками.
+"""
+import argparse
+import collections
+import hashlib
+import shlex
+
+# Строки с этими символами зависят от окружения — их разбор откладывается до выполнения
+_ENV_CHARS = ('$', '%', '~')
+
+# Сколько скомпилированных скриптов держать в кэше
+SCRIPT_CACHE_SIZE = 16
+# Сколько строк вывода копить перед передачей в output_func
+OUTPUT_BLOCK_LINES = 256
+
+
+class CompiledCommand:
+    """
+    Строка скрипта после разбора. parts — готовый результат shlex.split;
+    None означает, что строку нужно выполнить через act() целиком
+    (переменные окружения раскрываются в момент выполнения, или строка не разбирается).
+    """
+    __slots__ = ("line_num", "command", "parts")
+
+    def __init__(self, line_num, command, parts):
+        self.line_num = line_num
+        self.command = command
+        self.parts = parts
+
+
+class CompiledScript:
+    """Скомпилированный скрипт: команды и ошибки разбора (номер строки, сообщение)."""
+    def __init__(self, path, digest, commands, parse_errors):
+        self.path = path
+        self.digest = digest
+        self.commands = commands
+        self.parse_errors = parse_errors
+
+    def validate(self, known_commands):
+        """Список проблем (номер строки, сообщение): ошибки разбора и неизвестные команды."""
+        problems = list(self.parse_errors)
+        for cmd in self.commands:
+            if cmd.parts and cmd.parts[0] not in known_commands:
+                problems.append((cmd.line_num, f"{cmd.command}: command not found"))
+        problems.sort()
+        return problems
+
+
+def compile_script(text, path=None, digest=None):
+    """Разбирает текст скрипта: пропускает пустые строки и комментарии, токенизирует остальное."""
+    commands = []
+    parse_errors = []
+    lines = text.replace('\r\n', '\n').replace('\r', '\n').split('\n')
+    for line_num, line in enumerate(lines, 1):
+        command = line.strip()
+        if not command or command.startswith('#'):
+            continue
+        parts = None
+        if not any(ch in command for ch in _ENV_CHARS):
+            try:
+                parts = shlex.split(command)
+            except ValueError as e:
+                parse_errors.append((line_num, f"Failed to parse command: {e}"))
+        commands.append(CompiledCommand(line_num, command, parts))
+    return CompiledScript(path, digest, commands, parse_errors)
+
+
+_script_cache = collections.OrderedDict()
+
+
+def load_script(path):
+    """Читает и компилирует скрипт; результат кэшируется по SHA-256 содержимого файла."""
+    with open(path, 'rb') as f:
+        data = f.read()
+    digest = hashlib.sha256(data).hexdigest()
+    script = _script_cache.get(digest)
+    if script is not None:
+        _script_cache.move_to_end(digest)
+        return script
+    script = compile_script(data.decode('utf-8'), path, digest)
+    _script_cache[digest] = script
+    if len(_script_cache) > SCRIPT_CACHE_SIZE:
+        _script_cache.popitem(last=False)
+    return script
+
+
+def clear_script_cache():
+    _script_cache.clear()
+
+
+def run_script(script, execute, output_func=print, prompt='home$', block_lines=OUTPUT_BLOCK_LINES):
+    """
+    Выполняет скомпилированный скрипт. execute(cmd) выполняет CompiledCommand и
+    возвращает результат (строку или None). Скрипт останавливается на первой
+    команде с результатом "command not found". Вывод передаётся в output_func
+    блоками до block_lines строк.
+    """
+    buffer = []
+
+    def flush():
+        if buffer:
+            output_func("\n".join(buffer))
+            buffer.clear()
+
+    def emit(text):
+        buffer.append(text)
+        if len(buffer) >= block_lines:
+            flush()
+
+    try:
+        for cmd in script.commands:
+            emit(f"{prompt} {cmd.command}")
+
+            result = execute(cmd)
+
+            if isinstance(result, str):
+                if result:
+                    emit(result)
+            elif result is not None:
+                # Длинный вывод (итератор блоков текста) передаётся по мере получения
+                flush()
+                for block in result:
+                    output_func(block)
+
+            if isinstance(result, str) and "command not found" in result:
+                emit(f"Script stopped at line {cmd.line_num} due to error")
+                break
+    finally:
+        flush()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Check a startup script without running it')
+    parser.add_argument('script', help='Path to the script')
+    args = parser.parse_args()
+
+    from emu import COMMANDS
+
+    problems = load_script(args.script).validate(COMMANDS)
+    for line_num, message in problems:
+        print(f"line {line_num}: {message}")
+    if not problems:
+        print("OK")
@@ -0,0 +1,81 @@
+import csv
+import gzip
+import io
+import threading
+
+import pytest
+
+from CSVlogger import BufferedCSVLogger, CSVLogger, wait_for_archives
+
+
+def _commands(path):
+    with open(path, encoding="utf-8", newline="") as f:
+        return [row[1] for row in csv.reader(f)][1:]
+
+
+def _archived_commands(path):
+    with gzip.open(path, "rt", encoding="utf-8", newline="") as f:
+        return [row[1] for row in csv.reader(io.StringIO(f.read()))][1:]
+
+
+@pytest.mark.parametrize("logger_class", [CSVLogger, BufferedCSVLogger])
+def test_rotation_keeps_backup_count(tmp_path, logger_class):
+    path = str(tmp_path / "emu_log.csv")
+    logger = logger_class(path, max_bytes=2000, backup_count=2)
+    for i in range(200):
+        logger.log(f"cmd{i}")
+        if logger_class is BufferedCSVLogger and i % 20 == 19:
+            logger.flush()
+    logger.close()
+    wait_for_archives()
+
+    archives = logger.archives()
+    assert len(archives) == 2
+    assert all(archive.endswith(".csv.gz") for archive in archives)
+    # Архивы и текущий файл — непрерывный хвост лога, без потерь и повторов
+    commands = [command for archive in archives for command in _archived_commands(archive)] + _commands(path)
+    first = int(commands[0][3:])
+    assert commands == [f"cmd{i}" for i in range(first, 200)]
+
+
+def test_manual_rotate_and_reopen_after_close(tmp_path):
+    path = str(tmp_path / "emu_log.csv")
+    logger = CSVLogger(path, compress=False)
+    logger.log("before")
+    logger.rotate()
+    logger.close()
+    # Запись после close() (например, из atexit) открывает файл заново
+    logger.log("after")
+    logger.close()
+    [archive] = logger.archives()
+    assert _commands(archive) == ["before"]
+    assert _commands(path) == ["after"]
+
+
+def test_buffered_batches_stay_in_order(tmp_path):
+    first_path, second_path = str(tmp_path / "first.csv"), str(tmp_path / "second.csv")
+    logger = BufferedCSVLogger(first_path, batch_size=7, flush_interval=0.001)
+    stop = threading.Event()
+
+    def flusher():
+        # flush() из другого потока соревнуется с фоновым потоком логгера
+        while not stop.is_set():
+            logger.flush()
+
+    thread = threading.Thread(target=flusher)
+    thread.start()
+    try:
+        for i in range(5000):
+            logger.log(f"cmd{i}")
+        logger.set_path(second_path)
+        for i in range(5000, 7000):
+            logger.log(f"cmd{i}")
+    finally:
+        stop.set()
+        thread.join()
+    logger.close()
+    logger.log("late")
+    logger.close()
+
+    assert _commands(first_path) == [f"cmd{i}" for i in range(5000)]
+    assert _commands(second_path) == [f"cmd{i}" for i in range(5000, 7000)] + ["late"]
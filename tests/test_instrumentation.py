@@ -0,0 +1,55 @@
+import time
+
+import pytest
+
+import emu
+import instrumentation
+import vfs
+from CSVlogger import CSVLogger
+from vfs_overlay import OverlayVFS
+
+_RESOLVE, _EXECUTE, _TOTAL = (instrumentation.PHASES.index(phase) for phase in ("resolve", "execute", "total"))
+
+
+@pytest.fixture
+def stats(tmp_path, monkeypatch):
+    logger = CSVLogger(str(tmp_path / "emu_log.csv"))
+    monkeypatch.setattr(emu, "logger", logger)
+    yield instrumentation.enable()
+    instrumentation.disable()
+    logger.close()
+
+
+@pytest.fixture
+def fs():
+    tree = vfs.VirtualFileSystem()
+    for i in range(600):
+        tree.add_node(f"/d/f{i}.txt", False, "x!")
+    return tree
+
+
+def test_streamed_command_is_timed_until_consumed(stats, fs):
+    blocks = emu.act("find /d *", fs)
+    assert "find" not in stats.histograms
+    consumed = 0
+    for block in blocks:
+        consumed += 1
+        # Время потребителя (вывода) в замер команды не входит
+        time.sleep(0.05)
+    assert consumed > 1
+    histograms = stats.histograms["find"]
+    assert histograms[_TOTAL].count == 1
+    assert 0 < histograms[_EXECUTE].total <= histograms[_TOTAL].total < 0.05 * 1e9
+
+
+def test_closed_stream_is_recorded(stats, fs):
+    blocks = emu.act("tree /", fs)
+    next(blocks)
+    blocks.close()
+    assert stats.histograms["tree"][_TOTAL].count == 1
+
+
+def test_overlay_resolve_is_timed(stats, fs):
+    overlay = OverlayVFS(fs)
+    assert emu.act("cat /d/f1.txt", overlay) == "x!"
+    assert stats.histograms["cat"][_RESOLVE].total > 0
@@ -0,0 +1,79 @@
+import json
+import os
+
+import pytest
+
+from package_repository import PackageRepository, build_index, index_path_for, write_repository
+
+
+@pytest.fixture
+def repo_path(tmp_path):
+    path = str(tmp_path / "repo.jsonl")
+    write_repository(path, {"Alpha": ["beta>=1"], "beta": [], "Gamma_Pkg": ["alpha; python_version < '3'"]})
+    return path
+
+
+def _open(path):
+    repo = PackageRepository(path)
+    try:
+        return len(repo), {name: repo.get(name) for name in ("alpha", "beta", "gamma-pkg", "delta")}
+    finally:
+        repo.close()
+
+
+def test_lookup(repo_path):
+    assert _open(repo_path) == (3, {"alpha": ["beta>=1"], "beta": [], "gamma-pkg": ["alpha; python_version < '3'"],
+                                    "delta": None})
+
+
+def test_stale_index_is_rebuilt(repo_path):
+    _open(repo_path)
+    index_mtime = os.stat(index_path_for(repo_path)).st_mtime_ns
+    with open(repo_path, "a", encoding="utf-8") as f:
+        f.write(json.dumps({"info": {"name": "Delta", "requires_dist": ["alpha"]}}) + "\n")
+        # Повтор имени: действует последняя запись
+        f.write(json.dumps({"name": "beta", "requires_dist": ["gamma-pkg"]}) + "\n")
+    count, found = _open(repo_path)
+    assert count == 4
+    assert found["delta"] == ["alpha"]
+    assert found["beta"] == ["gamma-pkg"]
+    assert os.stat(index_path_for(repo_path)).st_mtime_ns != index_mtime
+
+
+def test_same_size_change_is_detected(repo_path):
+    _open(repo_path)
+    with open(repo_path, "rb") as f:
+        data = f.read()
+    stat = os.stat(repo_path)
+    with open(repo_path, "wb") as f:
+        f.write(data.replace(b'"Alpha"', b'"Omega"'))
+    # Размер тот же — индекс устаревает по mtime
+    os.utime(repo_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    repo = PackageRepository(repo_path)
+    try:
+        assert repo.get("alpha") is None
+        assert repo.get("omega") == ["beta>=1"]
+    finally:
+        repo.close()
+
+
+@pytest.mark.parametrize("garbage", [b"", b"PKGIDX", b"NOTANIDX" + bytes(64)])
+def test_damaged_index_is_rebuilt(repo_path, garbage):
+    with open(index_path_for(repo_path), "wb") as f:
+        f.write(garbage)
+    assert _open(repo_path)[0] == 3
+
+
+def test_missing_index_and_empty_repository(tmp_path):
+    path = str(tmp_path / "empty.jsonl")
+    open(path, "w").close()
+    assert _open(path) == (0, {"alpha": None, "beta": None, "gamma-pkg": None, "delta": None})
+    assert os.path.exists(index_path_for(path))
+
+
+def test_invalid_line(tmp_path):
+    path = str(tmp_path / "bad.jsonl")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write('{"name": "ok"}\n{not json\n')
+    with pytest.raises(ValueError, match=r"bad\.jsonl:2"):
+        build_index(path)
@@ -0,0 +1,74 @@
+import pytest
+
+from pep508 import (InvalidRequirement, batch_requirement_names, compile_marker, default_environment,
+                    parse_requirement, requirement_names)
+
+
+@pytest.fixture
+def env():
+    environment = default_environment("3.8", extras=("Test_Extra",))
+    environment["sys_platform"] = "linux"
+    environment["os_name"] = "posix"
+    return environment
+
+
+@pytest.mark.parametrize("marker, expected", [
+    # and связывает сильнее or
+    ('python_version < "3.9" or python_version >= "3.12" and sys_platform == "win32"', True),
+    ('(python_version < "3.9" or python_version >= "3.12") and sys_platform == "win32"', False),
+    ('sys_platform == "win32" and python_version < "3.9" or os_name == "posix"', True),
+    ('sys_platform == "win32" and (python_version < "3.9" or os_name == "posix")', False),
+    ('((python_version < "3.9"))', True),
+])
+def test_marker_precedence(env, marker, expected):
+    assert compile_marker(marker)(env) is expected
+
+
+@pytest.mark.parametrize("marker, expected", [
+    ('python_version > "3.10"', False),  # версии сравниваются численно, не как строки
+    ('"3.10" > python_version', True),  # переменная справа
+    ('python_version == "3.*"', True),
+    ('python_version == "3.9.*"', False),
+    ('python_version ~= "3.7"', True),
+    ('python_full_version == "3.8.0"', True),
+    ('python_version in "3.8 3.9"', True),
+    ('python_version not in "3.8 3.9"', False),
+    ("os_name == 'posix'", True),
+    ('sys_platform < "win"', False),  # порядковое сравнение не-версий не выполняется
+    ('extra == "test-extra"', True),  # имена extras нормализуются
+    ('extra == "test.extra"', True),
+    ('extra != "other"', True),
+])
+def test_marker_edge_cases(env, marker, expected):
+    assert compile_marker(marker)(env) is expected
+
+
+@pytest.mark.parametrize("marker", [
+    'python_version <',
+    '(python_version < "3"',
+    'python_version < "3")',
+    '"a" == "b"',
+    'python_version < python_full_version',
+    'not_a_var == "x"',
+    'python_version < "3" and',
+])
+def test_invalid_marker(marker):
+    with pytest.raises(InvalidRequirement):
+        compile_marker(marker)
+
+
+def test_parse_requirement():
+    assert parse_requirement("Foo.Bar [x, y] >= 1.0 ; python_version < '3'") == \
+        ("Foo.Bar", "foo-bar", ("x", "y"), "python_version < '3'")
+    assert parse_requirement("requests") == ("requests", "requests", (), None)
+    with pytest.raises(InvalidRequirement):
+        parse_requirement("-bad")
+
+
+def test_requirement_names(env):
+    requires = ["a; python_version < '3'", "B_c", "b-C>=2", "d[e]; extra == 'test_extra'",
+                "e; extra == 'other'", "-bad", "f; unknown_var == '1'"]
+    # Невыполненные маркеры и некорректные строки пропускаются, повторы по нормализованному имени — тоже
+    assert requirement_names(requires, env) == ["B_c", "d"]
+    assert batch_requirement_names([requires, None, ["g"]], env) == [["B_c", "d"], [], ["g"]]
+    assert env.decisions["b-C>=2"] == ("b-c", "b-C")
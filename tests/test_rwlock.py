@@ -0,0 +1,100 @@
+import threading
+import time
+
+import pytest
+
+from rwlock import RWLock
+
+
+def _start(target):
+    thread = threading.Thread(target=target, daemon=True)
+    thread.start()
+    return thread
+
+
+def test_readers_share_the_lock():
+    lock = RWLock()
+    inside = threading.Barrier(3, timeout=5)
+
+    def reader():
+        with lock.read():
+            # Все три читателя должны оказаться внутри одновременно
+            inside.wait()
+
+    threads = [_start(reader) for _ in range(3)]
+    for thread in threads:
+        thread.join(5)
+    assert not any(thread.is_alive() for thread in threads)
+
+
+def test_writer_excludes_readers_and_writers():
+    lock = RWLock()
+    active = []
+    overlaps = []
+    state_lock = threading.Lock()
+
+    def enter(kind):
+        with state_lock:
+            if "w" in active or (kind == "w" and active):
+                overlaps.append((kind, list(active)))
+            active.append(kind)
+
+    def leave(kind):
+        with state_lock:
+            active.remove(kind)
+
+    def reader():
+        for _ in range(200):
+            with lock.read():
+                enter("r")
+                leave("r")
+
+    def writer():
+        for _ in range(200):
+            with lock.write():
+                enter("w")
+                time.sleep(0)
+                leave("w")
+
+    threads = [_start(reader) for _ in range(4)] + [_start(writer) for _ in range(2)]
+    for thread in threads:
+        thread.join(10)
+    assert not any(thread.is_alive() for thread in threads)
+    assert overlaps == []
+
+
+def test_waiting_writer_blocks_new_readers():
+    lock = RWLock()
+    order = []
+    lock.acquire_read()
+    writer = _start(lambda: (lock.acquire_write(), order.append("w"), lock.release_write()))
+    while not lock._writers_waiting:
+        time.sleep(0.001)
+    reader = _start(lambda: (lock.acquire_read(), order.append("r"), lock.release_read()))
+    time.sleep(0.05)
+    # Новый читатель ждёт, пока пройдёт ожидающий писатель
+    assert order == []
+    lock.release_read()
+    writer.join(5)
+    reader.join(5)
+    assert order == ["w", "r"]
+
+
+def test_reentrancy():
+    lock = RWLock()
+    with lock.write():
+        with lock.write():
+            with lock.read():
+                pass
+    with lock.read():
+        with lock.read():
+            with pytest.raises(RuntimeError):
+                lock.acquire_write()
+    # После всех выходов блокировка свободна для писателя из другого потока
+    def writer():
+        with lock.write():
+            pass
+
+    thread = _start(writer)
+    thread.join(5)
+    assert not thread.is_alive()
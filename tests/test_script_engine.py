@@ -0,0 +1,55 @@
+import pytest
+
+import script_engine
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    script_engine.clear_script_cache()
+    yield
+    script_engine.clear_script_cache()
+
+
+def test_cache_by_content(tmp_path):
+    path = tmp_path / "start.txt"
+    path.write_text("ls /\n# comment\n\ncd 'a b'\necho $HOME\n", encoding="utf-8")
+    script = script_engine.load_script(str(path))
+    assert [cmd.parts for cmd in script.commands] == [["ls", "/"], ["cd", "a b"], None]
+    assert [cmd.line_num for cmd in script.commands] == [1, 4, 5]
+    assert script_engine.load_script(str(path)) is script
+
+    # Тот же текст в другом файле — тот же скомпилированный скрипт; изменённый — новый
+    copy = tmp_path / "copy.txt"
+    copy.write_bytes(path.read_bytes())
+    assert script_engine.load_script(str(copy)) is script
+    path.write_text("ls\n", encoding="utf-8")
+    changed = script_engine.load_script(str(path))
+    assert changed is not script
+    assert [cmd.parts for cmd in changed.commands] == [["ls"]]
+
+
+def test_cache_is_bounded(tmp_path, monkeypatch):
+    monkeypatch.setattr(script_engine, "SCRIPT_CACHE_SIZE", 2)
+    scripts = []
+    for i in range(3):
+        path = tmp_path / f"s{i}.txt"
+        path.write_text(f"ls {i}\n", encoding="utf-8")
+        scripts.append((path, script_engine.load_script(str(path))))
+    assert script_engine.load_script(str(scripts[2][0])) is scripts[2][1]
+    # Самый старый вытеснен и компилируется заново
+    assert script_engine.load_script(str(scripts[0][0])) is not scripts[0][1]
+
+
+def test_parse_errors_and_validation():
+    script = script_engine.compile_script("ls\ncd 'unterminated\nfoo bar\n")
+    assert script.validate({"ls", "cd"}) == [(2, "Failed to parse command: No closing quotation"),
+                                            (3, "foo bar: command not found")]
+
+
+def test_run_script_blocks_and_stop():
+    script = script_engine.compile_script("a\nlong\nbad\nnever\n")
+    results = {"a": "1", "long": iter(["x", "y"]), "bad": "bad: command not found"}
+    output = []
+    script_engine.run_script(script, lambda cmd: results.get(cmd.command), output.append, "$", block_lines=100)
+    assert output == ["$ a\n1\n$ long", "x", "y",
+                      "$ bad\nbad: command not found\nScript stopped at line 3 due to error"]
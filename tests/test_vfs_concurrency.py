@@ -0,0 +1,130 @@
+import fnmatch
+import threading
+
+import pytest
+
+import emu
+import vfs
+from CSVlogger import CSVLogger
+from vfs_overlay import OverlayVFS
+
+# Имена, на которых порядок "путь целиком" отличается от порядка обхода по именам
+NAMES = ["a", "a-b", "a.txt", "a b", "a!", "b"]
+
+
+@pytest.fixture(autouse=True)
+def command_log(tmp_path, monkeypatch):
+    # act() пишет в лог; без этого он создал бы emu_log.csv в текущем каталоге
+    logger = CSVLogger(str(tmp_path / "emu_log.csv"))
+    monkeypatch.setattr(emu, "logger", logger)
+    yield logger
+    logger.close()
+
+
+@pytest.fixture
+def fs():
+    tree = vfs.VirtualFileSystem()
+    for top in NAMES:
+        tree.add_node(f"/{top}", True)
+        for name in NAMES:
+            tree.add_node(f"/{top}/{name}", True)
+            tree.add_node(f"/{top}/{name}/{name}.py", False, "print(1)")
+    return tree
+
+
+def _all_paths(tree, start="/"):
+    return [node.path() for node in tree.iter_subtree(tree.get_node(start))]
+
+
+@pytest.mark.parametrize("start, pattern", [("/", "*"), ("/", "a*"), ("/a", "*"), ("/a-b", "*.py"), ("/b/a!", "*")])
+def test_find_order(fs, start, pattern):
+    expected = sorted(path for path in _all_paths(fs, start) if fnmatch.fnmatch(path.rsplit("/", 1)[-1] or "/", pattern))
+    assert list(fs.find(fs.get_node(start), pattern)) == expected
+    overlay = OverlayVFS(fs)
+    assert list(overlay.find(overlay.get_node(start), pattern)) == expected
+
+
+def test_sessions_have_own_cwd(fs):
+    first, second = emu.new_session(fs), emu.new_session(fs)
+    first.change_dir("/a")
+    second.change_dir("/b/a b")
+    assert first.get_cwd_path() == "/a"
+    assert second.get_cwd_path() == "/b/a b"
+    assert fs.get_cwd_path() == "/"
+    assert first.list_dir("a b") == "a b.py"
+
+
+def test_concurrent_readers_and_writers(fs):
+    expected = sorted(_all_paths(fs))
+    totals = fs.subtree_totals(fs.root)
+    errors = []
+
+    def reader(i):
+        session = emu.new_session(fs)
+        try:
+            for _ in range(100):
+                session.change_dir(f"/{NAMES[i % len(NAMES)]}")
+                assert session.read_file("a/a.py") == "print(1)"
+                assert "/a/a/a.py" in list(session.find(fs.root, "*.py"))
+        except Exception as e:
+            errors.append(e)
+
+    def writer(w):
+        session = emu.new_session(fs)
+        try:
+            for i in range(100):
+                session.add_node(f"/w{w}/d{i}", True)
+                assert session.remove_dir(f"/w{w}/d{i}") == f"Removed directory: /w{w}/d{i}"
+                assert session.remove_dir(f"/w{w}") == f"Removed directory: /w{w}"
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=reader, args=(i,)) for i in range(4)]
+    threads += [threading.Thread(target=writer, args=(w,)) for w in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    # Дерево, индекс имён и итоги поддеревьев вернулись в исходное состояние
+    assert sorted(_all_paths(fs)) == expected
+    assert list(fs.find(fs.root, "d*")) == []
+    assert fs.subtree_totals(fs.root) == totals
+
+
+def test_overlay_sessions_are_isolated(fs):
+    fs.add_node("/a/empty", True)
+    fs.add_node("/a/empty2", True)
+    base_root, base_a = fs.subtree_totals(fs.root), fs.subtree_totals(fs.get_node("/a"))
+    first, second = OverlayVFS(fs), OverlayVFS(fs)
+
+    assert first.remove_dir("/a/empty") == "Removed directory: /a/empty"
+    assert first.get_node("/a/empty") is None
+    assert second.get_node("/a/empty") is not None
+    assert fs.get_node("/a/empty") is not None
+
+    # Итоги поддеревьев: у изменившего сеанса — за вычетом удалённого, у остальных — как у базы
+    assert first.subtree_totals(first.root) == (base_root[0], base_root[1] - 1, base_root[2])
+    assert first.subtree_totals(first.get_node("/a")) == (base_a[0], base_a[1] - 1, base_a[2])
+    assert first.subtree_totals(first.get_node("/b")) == fs.subtree_totals(fs.get_node("/b"))
+    assert second.subtree_totals(second.root) == base_root
+    assert fs.subtree_totals(fs.root) == base_root
+
+    assert second.remove_dir("/a/empty2") == "Removed directory: /a/empty2"
+    assert first.get_node("/a/empty2") is not None
+    assert list(first.find(first.root, "empty*")) == ["/a/empty2"]
+    assert list(second.find(second.root, "empty*")) == ["/a/empty"]
+    assert list(fs.find(fs.root, "empty*")) == ["/a/empty", "/a/empty2"]
+    assert "\n".join(emu.act("du -d 0 /", first)).split() == \
+        [f"{base_root[2]}B", str(base_root[0]), "files", str(base_root[1] - 1), "dirs", "/"]
+
+
+def test_overlay_cwd_survives_copy(fs):
+    overlay = OverlayVFS(fs)
+    fs.add_node("/a/a/gone", True)
+    assert overlay.change_dir("/a/a") == "/a/a"
+    # Удаление копирует /a и /a/a; cwd и '..' продолжают работать по именам
+    assert overlay.remove_dir("gone") == "Removed directory: /a/a/gone"
+    assert overlay.list_dir() == "a.py"
+    assert overlay.change_dir("..") == "/a"
+    assert overlay.read_file("a/a.py") == "print(1)"
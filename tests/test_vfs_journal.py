@@ -0,0 +1,116 @@
+import os
+import struct
+import time
+
+import pytest
+
+import vfs_journal
+from vfs_journal import journal_path_for, read_journal, restore
+
+IMAGE = "path,type,content\n/,dir,\n/docs,dir,\n/docs/readme.txt,file,hello\n"
+
+
+@pytest.fixture
+def image(tmp_path):
+    path = tmp_path / "vfs.csv"
+    path.write_text(IMAGE, encoding="utf-8")
+    return str(path)
+
+
+def _restore(image, **options):
+    messages = []
+    fs = restore(image, messages.append, **options)
+    return fs, messages
+
+
+def _journal_with_changes(image):
+    fs, _ = _restore(image)
+    fs.add_node("/a", True)
+    fs.add_node("/a/b.txt", False, "some text")
+    fs.add_node("/c", True)
+    fs.journal.close()
+    return os.path.getsize(journal_path_for(image))
+
+
+def test_replay(image):
+    _journal_with_changes(image)
+    fs, messages = _restore(image)
+    fs.remove_dir("/c")
+    fs.journal.close()
+    fs, messages = _restore(image)
+    fs.journal.close()
+    assert fs.read_file("/a/b.txt") == "some text"
+    assert fs.get_node("/c") is None
+    assert "Replayed 4 journal records" in messages[-1]
+
+
+@pytest.mark.parametrize("cut", [1, 5, 9])
+def test_truncated_tail(image, cut):
+    size = _journal_with_changes(image)
+    path = journal_path_for(image)
+    with open(path, "r+b") as f:
+        f.truncate(size - cut)
+    fs, _ = _restore(image)
+    fs.journal.close()
+    # Оборванная последняя запись отброшена, предыдущие применены
+    assert fs.read_file("/a/b.txt") == "some text"
+    assert fs.get_node("/c") is None
+    _, records, valid_end = read_journal(path)
+    assert len(records) == 2
+    assert valid_end == os.path.getsize(path)
+
+
+def test_crc_mismatch_stops_replay(image):
+    _journal_with_changes(image)
+    path = journal_path_for(image)
+    with open(path, "rb") as f:
+        data = bytearray(f.read())
+    # Портим тело второй записи после заголовка (/a/b.txt): она и всё после неё отбрасывается
+    pos = 0
+    for _ in range(2):
+        length, _ = struct.unpack_from("<II", data, pos)
+        pos += 8 + length
+    data[pos + 8] ^= 0xFF
+    with open(path, "wb") as f:
+        f.write(data)
+    fs, _ = _restore(image)
+    fs.journal.close()
+    assert fs.get_node("/a").is_dir
+    assert fs.get_node("/a/b.txt") is None
+    assert fs.get_node("/c") is None
+    assert os.path.getsize(path) == pos
+
+
+def test_unreadable_journal_is_discarded(image):
+    with open(journal_path_for(image), "wb") as f:
+        f.write(b"\x00" * 3)
+    fs, messages = _restore(image)
+    fs.journal.close()
+    assert any("unreadable" in message for message in messages)
+    assert fs.read_file("/docs/readme.txt") == "hello"
+
+
+def test_bulk_add_is_journaled(image):
+    fs, _ = _restore(image)
+    fs.add_nodes([("/bulk/x.txt", False, "x!", None), ("/bulk/y", True, None, None)])
+    fs.journal.close()
+    fs, _ = _restore(image)
+    fs.journal.close()
+    assert fs.read_file("/bulk/x.txt") == "x!"
+    assert fs.get_node("/bulk/y").is_dir
+
+
+def test_background_compaction(image):
+    fs, _ = _restore(image, compact_records=10)
+    for i in range(25):
+        fs.add_node(f"/d{i}", True)
+    # Компактирование идёт в фоновом потоке; close() не запускает его, если оно не успело начаться
+    deadline = time.monotonic() + 5
+    while not fs.journal.generation and time.monotonic() < deadline:
+        time.sleep(0.001)
+    fs.journal.close()
+    assert fs.journal.generation >= 1
+    assert os.path.exists(vfs_journal.state_path_for(image, fs.journal.generation))
+    fs, _ = _restore(image, compact_records=0)
+    fs.journal.close()
+    assert all(fs.get_node(f"/d{i}") is not None for i in range(25))
@@ -1,6 +1,36 @@
 import base64
+import collections
 import csv
+import fnmatch
+import itertools
+import mmap
 import os
+import re
+import sys
+import threading
+
+from rwlock import RWLock
+
+# Кодировка содержимого файла: хранится в узле, чтобы не определять её при каждом чтении
+ENCODING_TEXT = "text"
+ENCODING_BASE64 = "base64"
+
+_ENCODING_ALIASES = {
+    "text": ENCODING_TEXT,
+    "plain": ENCODING_TEXT,
+    "utf-8": ENCODING_TEXT,
+    "utf8": ENCODING_TEXT,
+    "base64": ENCODING_BASE64,
+    "b64": ENCODING_BASE64,
+}
+
+
+def parse_encoding(value):
+    """Значение колонки encoding из CSV -> ENCODING_*; пустое/неизвестное — None (автоопределение)."""
+    if not value:
+        return None
+    return _ENCODING_ALIASES.get(value.strip().lower())
+
 
 class VFSNode:
     """Узел виртуальной файловой системы (файл или папка)."""
@@ -9,25 +39,278 @@ class VFSNode:
         self.is_dir = is_dir
         self.children = {} if is_dir else None
         self.content = "" if not is_dir else None
+        self.content_ref = None  # (offset, length) в хранилище содержимого при ленивой загрузке
         self.parent = parent  # ссылка на родителя (None для root)
+        self._path = None  # кэш полного пути, см. path()
+        self.encoding = None  # ENCODING_TEXT / ENCODING_BASE64; None — ещё не определена
 
     def path(self):
-        """Возвращает полный путь от корня до этого узла."""
-        parts = []
+        """
+        Возвращает полный путь от корня до этого узла.
+        Путь запоминается в узле (и в его предках), повторный вызов — O(1).
+        """
+        if self._path is not None:
+            return self._path
+        # Поднимаемся до первого предка с уже известным путём
+        chain = []
         node = self
-        while node and node.parent is not None:
-            parts.append(node.name)
+        while node._path is None:
+            if node.parent is None:
+                node._path = "/"
+                break
+            chain.append(node)
             node = node.parent
-        if not parts:
-            return "/"
-        return "/" + "/".join(reversed(parts))
+        prefix = node._path
+        for node in reversed(chain):
+            prefix = (prefix if prefix != "/" else "") + "/" + node.name
+            node._path = prefix
+        return self._path
+
+
+class CompactVFSNode:
+    """
+    Компактный узел VFS: те же поля и методы, что у VFSNode, но на __slots__ —
+    без __dict__ у каждого экземпляра. Выбирается при загрузке (load_vfs(compact=True)).
+    """
+    __slots__ = ("name", "is_dir", "children", "content", "content_ref", "parent", "_path", "encoding")
+
+    __init__ = VFSNode.__init__
+    path = VFSNode.path
+
+
+class LazyContentStore:
+    """
+    Хранилище содержимого файлов на диске: узлы держат только (offset, length),
+    тело читается по требованию через mmap. Горячие тела держатся в LRU-кэше,
+    ограниченном по суммарному размеру в байтах.
+    """
+    def __init__(self, path, cache_bytes=16 * 1024 * 1024):
+        self.path = path
+        self.cache_bytes = cache_bytes
+        self._cache = collections.OrderedDict()
+        self._cached_size = 0
+        self._lock = threading.Lock()
+        self._file = open(path, "rb")
+        size = os.fstat(self._file.fileno()).st_size
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+
+    def read(self, ref):
+        """Возвращает содержимое по ссылке (offset, length) как строку."""
+        with self._lock:
+            text = self._cache.get(ref)
+            if text is not None:
+                self._cache.move_to_end(ref)
+                return text
+            offset, length = ref
+            text = self._mmap[offset:offset + length].decode("utf-8", errors="replace")
+            if length <= self.cache_bytes:
+                self._cache[ref] = text
+                self._cached_size += length
+                while self._cached_size > self.cache_bytes:
+                    (_, old_length), _ = self._cache.popitem(last=False)
+                    self._cached_size -= old_length
+            return text
+
+    def close(self):
+        with self._lock:
+            self._cache.clear()
+            self._cached_size = 0
+            if isinstance(self._mmap, mmap.mmap):
+                self._mmap.close()
+            self._file.close()
+
+
+# Размер LRU-кэша разрешённых путей в VirtualFileSystem
+RESOLVE_CACHE_SIZE = 4096
+# Ограничение (в символах) кэша раскодированного base64-содержимого
+DECODED_CACHE_BYTES = 8 * 1024 * 1024
+# Сколько строк вывода tree/du/find собирается под одной блокировкой и отдаётся одним блоком
+STREAM_BLOCK_LINES = 256
+# Сколько узлов поиск в поддереве обходит под одной блокировкой
+STREAM_VISIT_NODES = 4096
+
+
+def format_size(size):
+    """Размер в байтах коротко: 512B, 4.2K, 1.5M."""
+    for unit in ("B", "K", "M", "G"):
+        if size < 1024:
+            return f"{size}{unit}" if unit == "B" else f"{size:.1f}{unit}"
+        size /= 1024
+    return f"{size:.1f}T"
+
+
+def _format_totals(totals):
+    files, dirs, size = totals
+    return f"{files} files, {dirs} dirs, {format_size(size)}"
+
+
+def stream_tree(lock, subtree_totals, start_node, max_depth=None):
+    """
+    Вывод tree для поддерева start_node: имена с отступами, у каталогов — итоги
+    поддерева (subtree_totals(node) -> (файлов, каталогов, байт) или None для
+    удалённого каталога); max_depth — сколько уровней показывать (None — все).
+    Отдаёт блоки текста по STREAM_BLOCK_LINES строк; каждый блок собирается под
+    lock на чтение, между блоками дерево может измениться — удалённые узлы пропускаются.
+    """
+    with lock.read():
+        totals = subtree_totals(start_node)
+        if totals is not None and start_node.is_dir:
+            # (родитель, узел, глубина, отступ, последний ли в каталоге)
+            stack = _tree_children(start_node, 1, "", max_depth)
+    if totals is None:
+        return
+    if not start_node.is_dir:
+        yield f"{start_node.path()}\n\n0 directories, 1 file, {format_size(totals[2])}"
+        return
+    lines = [f"{start_node.path()}  [{_format_totals(totals)}]"]
+    footer = f"\n{totals[1]} directories, {totals[0]} files, {format_size(totals[2])}"
+    while stack:
+        with lock.read():
+            while stack and len(lines) < STREAM_BLOCK_LINES:
+                parent, node, depth, indent, last = stack.pop()
+                if parent.children.get(node.name) is not node:
+                    continue
+                branch = "└── " if last else "├── "
+                if node.is_dir:
+                    totals = subtree_totals(node)
+                    if totals is None:
+                        continue
+                    lines.append(f"{indent}{branch}{node.name}/  [{_format_totals(totals)}]")
+                    stack.extend(_tree_children(node, depth + 1, indent + ("    " if last else "│   "),
+                                                max_depth))
+                else:
+                    lines.append(f"{indent}{branch}{node.name}")
+        yield "\n".join(lines)
+        lines = []
+    lines.append(footer)
+    yield "\n".join(lines)
+
+
+def _tree_children(node, depth, indent, max_depth):
+    """Записи стека stream_tree для детей node (в обратном порядке имён — pop отдаёт по порядку)."""
+    if max_depth is not None and depth > max_depth:
+        return []
+    names = sorted(node.children)
+    children = node.children
+    last = len(names) - 1
+    return [(node, children[name], depth, indent, i == last) for i, name in reversed(list(enumerate(names)))]
+
+
+def stream_du(lock, subtree_totals, start_node, max_depth=None):
+    """
+    Вывод du: размер, число файлов и каталогов для start_node и его подкаталогов
+    до глубины max_depth (None — все). Итоги каталога берутся из subtree_totals,
+    поддеревья глубже max_depth не обходятся. Как у du, каталог выводится после
+    своих подкаталогов. Блоки текста по STREAM_BLOCK_LINES строк, см. stream_tree.
+    """
+    lines = []
+    with lock.read():
+        if subtree_totals(start_node) is None:
+            return
+        # (родитель, узел, путь, глубина, подкаталоги уже в стеке)
+        stack = [(None, start_node, start_node.path(), 0, False)]
+    while stack:
+        with lock.read():
+            while stack and len(lines) < STREAM_BLOCK_LINES:
+                parent, node, path, depth, expanded = stack.pop()
+                if parent is not None and parent.children.get(node.name) is not node:
+                    continue
+                if not expanded and node.is_dir and (max_depth is None or depth < max_depth):
+                    stack.append((parent, node, path, depth, True))
+                    prefix = path if path != "/" else ""
+                    for name in sorted(node.children, reverse=True):
+                        child = node.children[name]
+                        if child.is_dir:
+                            stack.append((node, child, f"{prefix}/{name}", depth + 1, False))
+                    continue
+                totals = subtree_totals(node)
+                if totals is None:
+                    continue
+                files, dirs, size = totals
+                lines.append(f"{format_size(size):>8} {files:>10} files {dirs:>9} dirs  {path}")
+        if lines:
+            yield "\n".join(lines)
+            lines = []
+
+
+def stream_find(lock, start_node, matches):
+    """
+    Блоки путей (в порядке сортировки) узлов поддерева start_node, имена которых
+    подходят под matches. Блок собирается под lock на чтение и обходит не больше
+    STREAM_VISIT_NODES узлов; удалённые между блоками узлы пропускаются.
+    """
+    with lock.read():
+        path = start_node.path()
+    # Элементы стека: (родитель, узел, путь, обойти ли детей). Сам узел и его
+    # поддерево — разные элементы: путь "a" идёт раньше "a-b", а "a/x" — после,
+    # так что сортировка соседей по ключам "a" и "a/" даёт порядок всех путей.
+    stack = [(None, start_node, path, True), (None, start_node, path, False)]
+    cache = {}
+    while stack:
+        found = []
+        visited = 0
+        with lock.read():
+            while stack and len(found) < STREAM_BLOCK_LINES and visited < STREAM_VISIT_NODES:
+                parent, node, path, expand = stack.pop()
+                if parent is not None and parent.children.get(node.name) is not node:
+                    continue
+                visited += 1
+                if not expand:
+                    matched = cache.get(node.name)
+                    if matched is None:
+                        matched = cache[node.name] = bool(node.name) and matches(node.name)
+                    if matched:
+                        found.append(path)
+                    continue
+                if not node.is_dir or not node.children:
+                    continue
+                prefix = path if path != "/" else ""
+                items = []
+                for name, child in node.children.items():
+                    child_path = f"{prefix}/{name}"
+                    items.append((name, node, child, child_path, False))
+                    if child.is_dir and child.children:
+                        items.append((name + "/", node, child, child_path, True))
+                items.sort(key=lambda item: item[0], reverse=True)
+                stack.extend(item[1:] for item in items)
+        if found:
+            yield found
 
 
 class VirtualFileSystem:
-    """Виртуальная файловая система, полностью в памяти."""
-    def __init__(self):
-        self.root = VFSNode("/", True, parent=None)
+    """
+    Виртуальная файловая система, полностью в памяти.
+    Дерево защищено блокировкой читатели-писатель (lock): публичные методы чтения
+    берут её на чтение, изменения — на запись. Собственный cwd у экземпляра один;
+    потокам с отдельным текущим каталогом нужен VFSSession.
+    """
+    def __init__(self, node_class=VFSNode):
+        self.node_class = node_class
+        self.root = node_class("/", True, parent=None)
         self.cwd = self.root
+        self.lock = RWLock()
+        # Кэши разрешения путей, раскодированного текста и индекс имён пополняются
+        # и читателями — их изменения защищены отдельной короткой блокировкой
+        self._cache_lock = threading.Lock()
+        # Хранилище для ленивого содержимого (см. load_vfs(lazy_content=True))
+        self.content_store = None
+        # LRU-кэш разрешения путей: путь (или (cwd, путь) для относительных) -> узел/None.
+        # Сбрасывается при любом изменении дерева (add_node, add_nodes, remove_dir).
+        self._resolve_cache = collections.OrderedDict()
+        self.resolve_cache_size = RESOLVE_CACHE_SIZE
+        # Инвертированный индекс имён для find: имя -> узлы (dict как упорядоченное множество).
+        # Строится при первом find, дальше поддерживается в _new_child и remove_dir.
+        self._name_index = None
+        # Итоги поддеревьев для du и tree: каталог -> [файлов, каталогов, байт содержимого]
+        # во всём поддереве (без самого каталога). Строятся при первом запросе,
+        # дальше поддерживаются в _new_child, _set_content и remove_dir.
+        self._totals = None
+        # LRU-кэш раскодированного base64-содержимого: узел -> текст, ограничен по размеру
+        self._decoded_cache = collections.OrderedDict()
+        self._decoded_cache_size = 0
+        self.decoded_cache_bytes = DECODED_CACHE_BYTES
+        # Журнал изменений (vfs_journal.VFSJournal); None — изменения не сохраняются
+        self.journal = None
 
     def _norm_parts(self, path):
         """Нормализует путь строкой в список частей (не включает пустые)."""
@@ -35,14 +318,21 @@ class VirtualFileSystem:
             return []
         return [p for p in path.split("/") if p]
 
-    def add_node(self, path, is_dir, content=None):
+    def add_node(self, path, is_dir, content=None, encoding=None):
         """
         Добавляет узел по абсолютному или относительному пути.
         Если путь == "/" — ничего не делает (root уже есть).
         Создаёт промежуточные директории по необходимости.
+        encoding — заранее известная кодировка содержимого (ENCODING_*), иначе определяется при чтении.
         """
+        with self.lock.write():
+            self._add_node(path, is_dir, content, encoding, self.cwd)
+
+    def _add_node(self, path, is_dir, content, encoding, cwd):
+        """add_node относительно каталога cwd; вызывается под блокировкой на запись."""
         if not path:
             return
+        self._clear_resolve_cache()
 
         # Если путь абсолютный — начинаем с корня, иначе — от cwd
         if path.startswith("/"):
@@ -50,7 +340,7 @@ class VirtualFileSystem:
             node = self.root
         else:
             parts = self._norm_parts(path)
-            node = self.cwd
+            node = cwd
 
         # Если пустой путь (т.е. "/"), ничего не создаём
         if not parts:
@@ -65,26 +355,150 @@ class VirtualFileSystem:
 
             if part not in node.children:
                 # если последний — создаём с нужным типом, иначе — директория
-                node.children[part] = VFSNode(part, is_dir if is_last else True, parent=node)
+                self._new_child(node, part, is_dir if is_last else True)
             # если последний и это файл — установим content
             if is_last and not (node.children[part].is_dir):
                 if content is not None:
-                    node.children[part].content = content
+                    self._set_content(node.children[part], content, encoding)
             node = node.children[part]
 
-    def _resolve(self, path):
+        if self.journal is not None:
+            self.journal.append({"op": "add", "path": node.path(), "is_dir": is_dir,
+                                 "content": content if isinstance(content, str) else None,
+                                 "encoding": encoding})
+
+    def _set_content(self, node, content, encoding=None):
+        """Записывает содержимое файла (строку или ссылку (offset, length)) и сбрасывает кэши."""
+        old_size = self._content_size(node) if self._totals is not None else None
+        if content.__class__ is tuple:
+            node.content = None
+            node.content_ref = content
+        else:
+            node.content = content
+            node.content_ref = None
+        node.encoding = encoding
+        if old_size is not None:
+            delta = self._content_size(node) - old_size
+            if delta:
+                self._add_totals(node.parent, 0, 0, delta)
+        with self._cache_lock:
+            old_text = self._decoded_cache.pop(node, None)
+            if old_text is not None:
+                self._decoded_cache_size -= len(old_text)
+
+    def _clear_resolve_cache(self):
+        with self._cache_lock:
+            self._resolve_cache.clear()
+
+    def _new_child(self, parent, name, is_dir):
+        """Создаёт дочерний узел и регистрирует его у родителя."""
+        # Имена интернируются: одинаковые имена в разных каталогах хранятся один раз
+        name = sys.intern(name)
+        node = self.node_class(name, is_dir, parent=parent)
+        parent.children[name] = node
+        if self._name_index is not None:
+            self._name_index.setdefault(name, {})[node] = None
+        if self._totals is not None:
+            if is_dir:
+                self._totals[node] = [0, 0, 0]
+                self._add_totals(parent, 0, 1, 0)
+            else:
+                self._add_totals(parent, 1, 0, 0)
+        return node
+
+    def _walk_dirs(self, node, parts):
+        """Спускается от node по частям пути, создавая недостающие директории."""
+        for part in parts:
+            if not node.is_dir:
+                raise ValueError(f"Cannot create {part} inside file {node.path()}")
+            child = node.children.get(part)
+            if child is None:
+                child = self._new_child(node, part, True)
+            node = child
+        return node
+
+    def add_nodes(self, entries):
         """
-        Разрешает путь (абсолютный или относительный) и возвращает узел или None.
-        Поддерживаются '.', '..'.
+        Массовое добавление узлов. entries — итерируемое из (path, is_dir, content, encoding);
+        content может быть кортежем (offset, length) — ссылкой в content_store.
+        Запоминает последнего разрешённого родителя: для отсортированного ввода
+        (родитель идёт раньше детей) путь не проходится заново от корня.
+        Если к дереву подключён журнал, каждая запись журналируется, как в add_node.
+        Возвращает количество обработанных записей.
+        """
+        with self.lock.write():
+            return self._add_nodes(entries)
+
+    def _add_nodes(self, entries):
+        self._clear_resolve_cache()
+        journal = self.journal
+        last_parent_path = None
+        last_parent = None
+        count = 0
+        for path, is_dir, content, encoding in entries:
+            count += 1
+            if not path.startswith("/") or "//" in path:
+                # Нестандартные пути — через обычный add_node
+                self._add_node(path, is_dir, content, encoding, self.cwd)
+                continue
+            path = path.rstrip("/")
+            if not path:
+                continue
+            parent_path, _, name = path.rpartition("/")
+            if parent_path != last_parent_path:
+                if last_parent_path is not None and parent_path.startswith(last_parent_path + "/"):
+                    # Спускаемся от предыдущего родителя — типичный случай для обхода в глубину
+                    rest = parent_path[len(last_parent_path) + 1:]
+                    last_parent = self._walk_dirs(last_parent, rest.split("/"))
+                else:
+                    last_parent = self._walk_dirs(self.root, self._norm_parts(parent_path))
+                last_parent_path = parent_path
+            if not last_parent.is_dir:
+                raise ValueError(f"Cannot create {name} inside file {last_parent.path()}")
+            node = last_parent.children.get(name)
+            if node is None:
+                node = self._new_child(last_parent, name, is_dir)
+            if not node.is_dir and content is not None:
+                self._set_content(node, content, encoding)
+            if journal is not None:
+                journal.append({"op": "add", "path": path, "is_dir": is_dir,
+                                "content": content if isinstance(content, str) else None,
+                                "encoding": encoding})
+        return count
+
+    def _resolve(self, path, cwd):
+        """
+        Разрешает путь (абсолютный или относительный от cwd) и возвращает узел или None.
+        Поддерживаются '.', '..'. Результаты запоминаются в LRU-кэше _resolve_cache.
         """
         if path is None or path == "":
-            return self.cwd
+            return cwd
+
+        key = path if path.startswith("/") else (cwd, path)
+        cache = self._resolve_cache
+        with self._cache_lock:
+            try:
+                node = cache[key]
+            except KeyError:
+                pass
+            else:
+                cache.move_to_end(key)
+                return node
 
+        node = self._walk(path, cwd)
+        with self._cache_lock:
+            cache[key] = node
+            if len(cache) > self.resolve_cache_size:
+                cache.popitem(last=False)
+        return node
+
+    def _walk(self, path, cwd):
+        """Проход по дереву для _resolve, без кэша."""
         if path.startswith("/"):
             node = self.root
             parts = self._norm_parts(path)
         else:
-            node = self.cwd
+            node = cwd
             parts = self._norm_parts(path)
 
         for part in parts:
@@ -105,17 +519,25 @@ class VirtualFileSystem:
 
     def get_node(self, path):
         """Обёртка над _resolve; воспринимает None как cwd."""
+        with self.lock.read():
+            return self._get_node(path, self.cwd)
+
+    def _get_node(self, path, cwd):
         if path is None or path == "":
-            return self.cwd
+            return cwd
         if path == "/":
             return self.root
-        return self._resolve(path)
+        return self._resolve(path, cwd)
 
     def list_dir(self, path=None):
         """Возвращает строку с элементами директории или сообщение об ошибке."""
-        node = self.get_node(path)
+        with self.lock.read():
+            return self._list_dir(path, self.cwd)
+
+    def _list_dir(self, path, cwd):
+        node = self._get_node(path, cwd)
         if not node:
-            return f"No such directory: {path or self.get_cwd_path()}"
+            return f"No such directory: {path or cwd.path()}"
         if not node.is_dir:
             return f"{path or node.path()} is not a directory"
         # Отсортируем имена для стабильного вывода; не включаем пустые имена
@@ -126,29 +548,39 @@ class VirtualFileSystem:
 
     def change_dir(self, path):
         """Меняет текущую директорию; path может быть абсолютным или относительным."""
+        with self.lock.read():
+            node, message = self._change_dir(path, self.cwd)
+        if node is not None:
+            self.cwd = node
+        return message
+
+    def _change_dir(self, path, cwd):
+        """Новый текущий каталог (или None при ошибке) и сообщение для пользователя."""
         if path is None or path == "":
             # переход в корень по умолчанию
-            self.cwd = self.root
-            return self.get_cwd_path()
-        node = self.get_node(path)
+            return self.root, self.root.path()
+        node = self._get_node(path, cwd)
         if not node:
-            return f"No such directory: {path}"
+            return None, f"No such directory: {path}"
         if not node.is_dir:
-            return f"{path} is not a directory"
-        self.cwd = node
-        return self.get_cwd_path()
+            return None, f"{path} is not a directory"
+        return node, node.path()
 
     def remove_dir(self, path):
         """
         Удаляет пустую директорию по данному пути (абсолютному или относительному).
         Возвращает строку с сообщением об ошибке или подтверждение удаления.
         """
+        with self.lock.write():
+            return self._remove_dir(path, self.cwd)
+
+    def _remove_dir(self, path, cwd):
         # Разрешаем None/пустой как cwd — в таком случае нельзя удалять cwd, запрещаем
         if path is None or path == "":
             return "Usage: rmdir <directory>"
 
         # Получаем узел
-        node = self.get_node(path)
+        node = self._get_node(path, cwd)
         if not node:
             return f"No such directory: {path}"
         if not node.is_dir:
@@ -163,42 +595,510 @@ class VirtualFileSystem:
         parent = node.parent
         if parent and node.name in parent.children:
             del parent.children[node.name]
-            return f"Removed directory: {node.path()}"
+            self._clear_resolve_cache()
+            self._unindex(node)
+            if self._totals is not None:
+                del self._totals[node]
+                self._add_totals(parent, 0, -1, 0)
+            removed_path = node.path()
+            node._path = None
+            if self.journal is not None:
+                self.journal.append({"op": "rmdir", "path": removed_path})
+            return f"Removed directory: {removed_path}"
         else:
             return f"Failed to remove: {path}"
 
+    @staticmethod
+    def iter_subtree(start_node):
+        """Итеративный обход поддерева (без рекурсии): отдаёт start_node и всех потомков."""
+        stack = [start_node]
+        while stack:
+            node = stack.pop()
+            yield node
+            if node.is_dir and node.children:
+                stack.extend(node.children.values())
+
+    def _build_name_index(self):
+        # Индекс строится читателем; два find не должны строить его одновременно
+        with self._cache_lock:
+            if self._name_index is not None:
+                return self._name_index
+            index = {}
+            for node in self.iter_subtree(self.root):
+                if node is not self.root:
+                    index.setdefault(node.name, {})[node] = None
+            self._name_index = index
+            return index
+
+    def _unindex(self, node):
+        if self._name_index is None:
+            return
+        nodes = self._name_index.get(node.name)
+        if nodes is None:
+            return
+        nodes.pop(node, None)
+        if not nodes:
+            del self._name_index[node.name]
+
+    @staticmethod
+    def _content_size(node):
+        """Размер содержимого файла в байтах UTF-8 (base64 — в закодированном виде, как в образе)."""
+        content = node.content
+        if content is None:
+            return node.content_ref[1] if node.content_ref is not None else 0
+        return len(content) if content.isascii() else len(content.encode("utf-8"))
+
+    def _build_totals(self):
+        # Как и индекс имён, строится читателем под _cache_lock
+        with self._cache_lock:
+            if self._totals is not None:
+                return self._totals
+            totals = {}
+            order = []
+            stack = [self.root]
+            while stack:
+                node = stack.pop()
+                order.append(node)
+                entry = totals[node] = [0, 0, 0]
+                for child in node.children.values():
+                    if child.is_dir:
+                        entry[1] += 1
+                        stack.append(child)
+                    else:
+                        entry[0] += 1
+                        entry[2] += self._content_size(child)
+            # Потомки в order идут после предков: обратный проход суммирует снизу вверх
+            for node in reversed(order):
+                parent = node.parent
+                if parent is not None:
+                    entry, parent_entry = totals[node], totals[parent]
+                    parent_entry[0] += entry[0]
+                    parent_entry[1] += entry[1]
+                    parent_entry[2] += entry[2]
+            self._totals = totals
+            return totals
+
+    def _add_totals(self, node, files, dirs, size):
+        """Прибавляет изменение к итогам каталога node и всех его предков; под блокировкой на запись."""
+        totals = self._totals
+        while node is not None:
+            entry = totals[node]
+            entry[0] += files
+            entry[1] += dirs
+            entry[2] += size
+            node = node.parent
+
+    def subtree_totals(self, node):
+        """
+        (файлов, каталогов, байт) в поддереве каталога node без него самого — O(1)
+        после первого запроса; для файла — (1, 0, размер). None, если каталог удалён.
+        """
+        with self.lock.read():
+            return self._subtree_totals(node)
+
+    def _subtree_totals(self, node):
+        if not node.is_dir:
+            return 1, 0, self._content_size(node)
+        totals = self._totals if self._totals is not None else self._build_totals()
+        entry = totals.get(node)
+        return tuple(entry) if entry is not None else None
+
+    def iter_tree(self, start_node, max_depth=None):
+        """Вывод tree для поддерева start_node блоками текста, см. stream_tree."""
+        return stream_tree(self.lock, self._subtree_totals, start_node, max_depth)
+
+    def iter_du(self, start_node, max_depth=None):
+        """Вывод du для start_node и его подкаталогов блоками текста, см. stream_du."""
+        return stream_du(self.lock, self._subtree_totals, start_node, max_depth)
+
+    def find(self, start_node, pattern):
+        """
+        Ищет в поддереве start_node узлы, имя которых подходит под glob-шаблон
+        или содержит pattern как подстроку. Отдаёт полные пути в порядке сортировки
+        по мере нахождения, см. iter_find.
+        """
+        for block in self.iter_find(start_node, pattern):
+            yield from block
+
+    def iter_find(self, start_node, pattern):
+        """
+        find блоками: списки путей (в порядке сортировки) до STREAM_BLOCK_LINES штук.
+        Поиск от корня берёт кандидатов из индекса имён — шаблон проверяется один
+        раз на каждое различное имя. Поиск в поддереве обходит только его: блок
+        собирается под блокировкой на чтение (не дольше STREAM_VISIT_NODES узлов),
+        между блоками дерево может измениться — удалённые узлы пропускаются.
+        """
+        matches = compile_find_pattern(pattern)
+        if start_node is self.root:
+            with self.lock.read():
+                found = self._find_indexed(matches)
+            found.sort()
+            for i in range(0, len(found), STREAM_BLOCK_LINES):
+                yield found[i:i + STREAM_BLOCK_LINES]
+            return
+        yield from stream_find(self.lock, start_node, matches)
+
+    def _find_indexed(self, matches):
+        """Пути всех узлов дерева с подходящими именами (по индексу имён); под блокировкой на чтение."""
+        found = ["/"] if matches("/") else []
+        index = self._name_index if self._name_index is not None else self._build_name_index()
+        for name, nodes in index.items():
+            if matches(name):
+                found.extend(node.path() for node in nodes)
+        return found
+
     def get_cwd_path(self):
         """Возвращает строковый путь текущей директории."""
         return self.cwd.path()
 
     def read_file(self, path):
-        node = self.get_node(path)
+        with self.lock.read():
+            return self._read_file(path, self.cwd)
+
+    def _read_file(self, path, cwd):
+        node = self._get_node(path, cwd)
         if not node:
             return f"No such file: {path}"
         if node.is_dir:
             return f"{path} is a directory"
+        return self.file_text(node)
+
+    def file_text(self, node):
+        """Текст файла node: base64-содержимое раскодируется (результат кэшируется)."""
+        if node.encoding == ENCODING_TEXT:
+            return self._node_content(node)
+        with self._cache_lock:
+            cached = self._decoded_cache.get(node)
+            if cached is not None:
+                self._decoded_cache.move_to_end(node)
+                return cached
+        content = self._node_content(node)
         try:
-            return base64.b64decode(node.content).decode('utf-8', errors='ignore') if self.is_base64(node.content) else node.content
+            decoded = None
+            if node.encoding is None:
+                # Определяем кодировку один раз и запоминаем в узле
+                decoded = self._decode_base64(content)
+                node.encoding = ENCODING_TEXT if decoded is None else ENCODING_BASE64
+            if node.encoding == ENCODING_TEXT:
+                return content
+            if decoded is None:
+                decoded = base64.b64decode(content)
+            text = decoded.decode('utf-8', errors='ignore')
         except Exception:
-            return node.content
+            return content
+        self._cache_decoded(node, text)
+        return text
+
+    def _cache_decoded(self, node, text):
+        if len(text) > self.decoded_cache_bytes:
+            return
+        with self._cache_lock:
+            old_text = self._decoded_cache.pop(node, None)
+            if old_text is not None:
+                self._decoded_cache_size -= len(old_text)
+            self._decoded_cache[node] = text
+            self._decoded_cache_size += len(text)
+            while self._decoded_cache_size > self.decoded_cache_bytes:
+                _, old_text = self._decoded_cache.popitem(last=False)
+                self._decoded_cache_size -= len(old_text)
+
+    def _node_content(self, node):
+        """Содержимое файла: из памяти или, при ленивой загрузке, из content_store."""
+        if node.content is None and node.content_ref is not None:
+            return self.content_store.read(node.content_ref)
+        return node.content
 
     @staticmethod
-    def is_base64(s):
+    def _decode_base64(s):
+        """Раскодированные байты, если s — корректный base64, иначе None (декодирование одно)."""
         try:
             if not s:
-                return False
+                return None
             decoded = base64.b64decode(s)
-            return base64.b64encode(decoded).decode('utf-8') == s.replace("\n", "")
+            if base64.b64encode(decoded).decode('utf-8') == s.replace("\n", ""):
+                return decoded
+            return None
         except Exception:
-            return False
+            return None
+
+    @staticmethod
+    def is_base64(s):
+        return VirtualFileSystem._decode_base64(s) is not None
+
+
+class VFSSession:
+    """
+    Сеанс работы с общим деревом VirtualFileSystem: собственный текущий каталог
+    и тот же интерфейс, что у VirtualFileSystem. Сеансов над одним деревом может
+    быть сколько угодно, каждый используется своим потоком; согласованность
+    дерева обеспечивает блокировка fs.lock.
+    """
+    def __init__(self, fs, cwd=None):
+        self.fs = fs
+        self.cwd = cwd or fs.root
+        self.node_class = fs.node_class
+
+    @property
+    def root(self):
+        return self.fs.root
+
+    @property
+    def content_store(self):
+        return self.fs.content_store
+
+    def get_node(self, path):
+        with self.fs.lock.read():
+            return self.fs._get_node(path, self.cwd)
+
+    def list_dir(self, path=None):
+        with self.fs.lock.read():
+            return self.fs._list_dir(path, self.cwd)
+
+    def change_dir(self, path):
+        with self.fs.lock.read():
+            node, message = self.fs._change_dir(path, self.cwd)
+        if node is not None:
+            self.cwd = node
+        return message
+
+    def get_cwd_path(self):
+        return self.cwd.path()
+
+    def read_file(self, path):
+        with self.fs.lock.read():
+            return self.fs._read_file(path, self.cwd)
+
+    def file_text(self, node):
+        return self.fs.file_text(node)
+
+    def find(self, start_node, pattern):
+        return self.fs.find(start_node, pattern)
+
+    def iter_find(self, start_node, pattern):
+        return self.fs.iter_find(start_node, pattern)
+
+    def subtree_totals(self, node):
+        return self.fs.subtree_totals(node)
+
+    def iter_tree(self, start_node, max_depth=None):
+        return self.fs.iter_tree(start_node, max_depth)
+
+    def iter_du(self, start_node, max_depth=None):
+        return self.fs.iter_du(start_node, max_depth)
+
+    def add_node(self, path, is_dir, content=None, encoding=None):
+        with self.fs.lock.write():
+            self.fs._add_node(path, is_dir, content, encoding, self.cwd)
+
+    def remove_dir(self, path):
+        with self.fs.lock.write():
+            return self.fs._remove_dir(path, self.cwd)
+
+    iter_subtree = staticmethod(VirtualFileSystem.iter_subtree)
+
+
+_GLOB_CHARS = re.compile(r"[*?\[]")
+
+
+def compile_find_pattern(pattern):
+    """
+    Компилирует шаблон find в предикат по имени узла: fnmatch-совпадение или
+    вхождение pattern как подстроки. Литералы и шаблоны вида '*.py' проверяются
+    без регулярных выражений, остальное — через заранее скомпилированный fnmatch.translate.
+    """
+    normcase = os.path.normcase if os.name == "nt" else None
+    if normcase:
+        glob = normcase(pattern)
+    else:
+        glob = pattern
+
+    if not _GLOB_CHARS.search(pattern):
+        if normcase:
+            return lambda name: pattern in name or normcase(name) == glob
+        return lambda name: pattern in name
+
+    if glob.startswith("*") and not _GLOB_CHARS.search(glob, 1):
+        suffix = glob[1:]
+        if normcase:
+            return lambda name: normcase(name).endswith(suffix) or pattern in name
+        return lambda name: name.endswith(suffix) or pattern in name
+
+    regex_match = re.compile(fnmatch.translate(glob)).match
+    if normcase:
+        return lambda name: regex_match(normcase(name)) is not None or pattern in name
+    return lambda name: regex_match(name) is not None or pattern in name
 
 
 # Глобальная переменная — экземпляр VFS
 vfs = None
 
-def load_vfs(vfs_file=None, output_func=print):
-    """Загружает VFS из CSV-файла в память и возвращает экземпляр VirtualFileSystem."""
+# Размер пачки строк CSV, обрабатываемой за один шаг массовой загрузки
+LOAD_CHUNK_SIZE = 100_000
+
+
+def _row_parser(header):
+    """
+    По заголовку CSV возвращает (columns, entry_from_row): словарь имя -> индекс
+    и функцию, превращающую строку CSV в кортеж (path, is_dir, content, encoding).
+    Колонка encoding необязательна.
+    """
+    columns = {name.strip(): i for i, name in enumerate(header)}
+    pi = columns.get("path")
+    ti = columns.get("type")
+    ci = columns.get("content")
+    ei = columns.get("encoding")
+
+    def field(row, i, default):
+        if i is None:
+            return default
+        return row[i] if i < len(row) else None
+
+    def entry_from_row(row):
+        path = (field(row, pi, "") or "").strip()
+        vtype = (field(row, ti, "") or "").strip().lower()
+        is_dir = (vtype == "dir")
+        if is_dir:
+            return path, True, None, None
+        return path, False, field(row, ci, ""), parse_encoding(field(row, ei, None))
+
+    return columns, entry_from_row
+
+
+def _iter_csv_chunks(f, chunk_size):
+    """Читает CSV пачками по chunk_size записей; отдаёт списки (path, is_dir, content, encoding)."""
+    reader = csv.reader(f)
+    header = next(reader, None)
+    if header is None:
+        return
+    _, entry_from_row = _row_parser(header)
+
+    while True:
+        chunk = [entry_from_row(row) for row in itertools.islice(reader, chunk_size) if row]
+        if not chunk:
+            return
+        yield chunk
+
+
+# Содержимое короче этого порога при ленивой загрузке держится в памяти:
+# ссылка (offset, length) занимает сопоставимо места
+LAZY_CONTENT_MIN_BYTES = 64
+
+
+def _iter_lazy_chunks(f, chunk_size):
+    """
+    Читает CSV в двоичном режиме пачками по chunk_size записей и отдаёт списки
+    (path, is_dir, content, encoding), где для длинного содержимого вместо строки
+    стоит ссылка (offset, length) на байты в самом CSV-файле. Смещение вычисляется
+    для строк без кавычек — записи с кавычками разбираются через csv и получают
+    содержимое сразу.
+    """
+    header_line = f.readline()
+    if not header_line:
+        return
+    offset = len(header_line)
+    header = next(csv.reader([header_line.decode("utf-8")]), [])
+    columns, entry_from_row = _row_parser(header)
+    ci = columns.get("content")
+    width = len(header)
+
+    lines = iter(f)
+    while True:
+        chunk = []
+        for line in lines:
+            line_offset = offset
+            offset += len(line)
+            body = line.rstrip(b"\r\n")
+            if not body:
+                continue
+            if b'"' in body:
+                # Запись с кавычками может занимать несколько строк — собираем её целиком
+                record = line
+                while record.count(b'"') % 2:
+                    more = next(lines, b"")
+                    if not more:
+                        break
+                    offset += len(more)
+                    record += more
+                row = next(csv.reader([record.decode("utf-8")]), None)
+                if row:
+                    chunk.append(entry_from_row(row))
+            else:
+                fields = body.split(b",")
+                if len(fields) == width and ci is not None and len(fields[ci]) >= LAZY_CONTENT_MIN_BYTES:
+                    # Само содержимое не декодируем — запоминаем только его положение
+                    blob = fields[ci]
+                    fields[ci] = b""
+                    path, is_dir, _, encoding = entry_from_row([x.decode("utf-8") for x in fields])
+                    ref = None
+                    if not is_dir:
+                        ref = (line_offset + sum(len(x) for x in fields[:ci]) + ci, len(blob))
+                    chunk.append((path, is_dir, ref, encoding))
+                else:
+                    chunk.append(entry_from_row([x.decode("utf-8") for x in fields]))
+            if len(chunk) >= chunk_size:
+                break
+        if not chunk:
+            return
+        yield chunk
+
+
+def _load_bulk(vfs_instance, chunks, output_func, chunk_size):
+    """Потоковая загрузка пачками с отчётом о прогрессе через output_func."""
+    entries = 0
+    for chunk in chunks:
+        entries += vfs_instance.add_nodes(chunk)
+        if len(chunk) == chunk_size:
+            output_func(f"Loading VFS: {entries} entries...")
+    return entries
+
+
+def _load_rows(vfs_instance, f):
+    """Построчная загрузка через add_node."""
+    entries = 0
+    reader = csv.DictReader(f)
+    for row in reader:
+        entries += 1
+        path = row.get("path", "").strip()
+        vtype = row.get("type", "").strip().lower()
+        content = row.get("content", "")
+        encoding = parse_encoding(row.get("encoding"))
+        is_dir = (vtype == "dir")
+        # не создавать узел для корня — корень уже есть
+        if path == "/":
+            continue
+        # При добавлении учитываем абсолютные пути (в CSV они начинаются с '/')
+        vfs_instance.add_node(path, is_dir, content if not is_dir else None, encoding)
+    return entries
+
+
+def read_csv_image(vfs_instance, path, output_func=print, bulk=True, chunk_size=LOAD_CHUNK_SIZE,
+                   lazy_content=False, content_cache_bytes=16 * 1024 * 1024):
+    """Загружает CSV-образ в готовый экземпляр VirtualFileSystem; возвращает число записей."""
+    if lazy_content:
+        with open(path, "rb") as f:
+            entries = _load_bulk(vfs_instance, _iter_lazy_chunks(f, chunk_size), output_func, chunk_size)
+        vfs_instance.content_store = LazyContentStore(path, content_cache_bytes)
+        return entries
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        if bulk:
+            return _load_bulk(vfs_instance, _iter_csv_chunks(f, chunk_size), output_func, chunk_size)
+        return _load_rows(vfs_instance, f)
+
+
+def load_vfs(vfs_file=None, output_func=print, bulk=True, chunk_size=LOAD_CHUNK_SIZE,
+             lazy_content=False, content_cache_bytes=16 * 1024 * 1024, compact=False,
+             snapshot=False):
+    """
+    Загружает VFS из CSV-файла в память и возвращает экземпляр VirtualFileSystem.
+    bulk=True — потоковая загрузка пачками (add_nodes), bulk=False — построчно через add_node.
+    lazy_content=True — содержимое файлов не читается в память, а подгружается
+    из CSV через mmap при чтении (LRU-кэш на content_cache_bytes байт).
+    compact=True — узлы CompactVFSNode (__slots__) вместо VFSNode.
+    vfs_file может быть и бинарным снимком (см. vfs_snapshot); snapshot=True — для
+    CSV-образа использовать снимок рядом с ним (<csv>.vfsnap), пересобирая его при необходимости.
+    """
     global vfs
+    import vfs_snapshot
 
     if not vfs_file:
         output_func("load_vfs: no vfs_file provided, skipping load.")
@@ -210,25 +1110,19 @@ def load_vfs(vfs_file=None, output_func=print):
         output_func(f"No VFS file found at {path_to_load}")
         return None
 
-    vfs_instance = VirtualFileSystem()
-    entries = 0
+    node_class = CompactVFSNode if compact else VFSNode
     try:
-        with open(path_to_load, "r", encoding="utf-8") as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                entries += 1
-                path = row.get("path", "").strip()
-                vtype = row.get("type", "").strip().lower()
-                content = row.get("content", "")
-                is_dir = (vtype == "dir")
-                # не создавать узел для корня — корень уже есть
-                if path == "/":
-                    continue
-                # При добавлении учитываем абсолютные пути (в CSV они начинаются с '/')
-                vfs_instance.add_node(path, is_dir, content if not is_dir else None)
+        if snapshot or vfs_snapshot.is_snapshot(path_to_load):
+            vfs_instance, entries = vfs_snapshot.load_snapshot(
+                path_to_load, output_func, node_class=node_class,
+                content_cache_bytes=content_cache_bytes, chunk_size=chunk_size)
+        else:
+            vfs_instance = VirtualFileSystem(node_class=node_class)
+            entries = read_csv_image(vfs_instance, path_to_load, output_func, bulk, chunk_size,
+                                     lazy_content, content_cache_bytes)
         vfs = vfs_instance
         output_func(f"VFS loaded successfully from {path_to_load} ({entries} entries)")
         return vfs_instance
     except Exception as e:
         output_func(f"Error loading VFS: {e}")
-        return None
\ No newline at end of file
+        return None
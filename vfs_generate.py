@@ -0,0 +1,317 @@
+"""
+Генераторы синтетических CSV-образов VFS и командных скриптов для бенчмарков.
+
+Формы дерева:
+  balanced   — сбалансированное дерево (обход в ширину, 8 файлов и 4 каталога на каталог)
+  deep       — цепочки вложенных каталогов глубины depth, в каждом по files_per_dir файлов
+  wide       — несколько каталогов с fanout элементами в каждом
+  realistic  — похожее на рабочие проекты дерево: случайное ветвление, убывающее с глубиной,
+               типичные имена каталогов и файлов, текстовое и base64-содержимое
+
+Образ пишется потоково (родитель всегда раньше детей), память не зависит от размера,
+так что генерируются образы до 10^7 узлов и больше. Вместе с образом собирается
+равномерная выборка каталогов и файлов (reservoir sampling) — из неё строятся
+скрипты и запросы бенчмарков. Одинаковый seed даёт одинаковый образ.
+
+Запуск: python vfs_generate.py out.csv --nodes 1000000 --shape realistic [--script script.txt --commands 10000]
+"""
+import argparse
+import base64
+import collections
+import csv
+import random
+
+SHAPES = ("balanced", "deep", "wide", "realistic")
+
+_DIR_NAMES = ("src", "lib", "tests", "docs", "core", "utils", "api", "models", "views", "static",
+              "config", "scripts", "data", "internal", "cmd", "pkg", "assets", "i18n", "plugins", "tools")
+_PROJECT_NAMES = ("app", "service", "client", "server", "engine", "toolkit", "portal", "agent", "sdk", "cli")
+_FILE_STEMS = ("main", "util", "helpers", "config", "models", "views", "index", "README", "setup", "test_core",
+               "handlers", "schema", "routes", "cache", "parser", "logo", "storage", "session", "types", "errors")
+# Расширение, вес, двоичное ли содержимое (хранится base64)
+_FILE_KINDS = (("py", 30, False), ("md", 8, False), ("txt", 10, False), ("json", 8, False), ("yaml", 4, False),
+               ("csv", 3, False), ("sh", 3, False), ("png", 6, True), ("svg", 3, False), ("bin", 2, True))
+_WORDS = ("def", "return", "value", "config", "import", "class", "data", "self", "path", "item", "error",
+          "result", "list", "name", "print", "true", "none", "key", "user", "node")
+
+# Размер выборки каталогов и файлов по умолчанию
+SAMPLE_SIZE = 1000
+
+
+class ImageInfo:
+    """Сводка сгенерированного образа: счётчики, наибольшая глубина и выборки путей."""
+    def __init__(self, shape, sample_size, seed):
+        self.shape = shape
+        self.nodes = 0
+        self.dirs = 0
+        self.files = 0
+        self.max_depth = 0
+        self.dir_samples = []
+        self.file_samples = []
+        self._sample_size = sample_size
+        self._rng = random.Random(seed + 1)
+
+    def _sample(self, samples, seen, path):
+        if len(samples) < self._sample_size:
+            samples.append(path)
+        else:
+            j = self._rng.randrange(seen)
+            if j < self._sample_size:
+                samples[j] = path
+
+    def add(self, path, is_dir):
+        self.nodes += 1
+        if path == "/":
+            return
+        depth = path.count("/")
+        if depth > self.max_depth:
+            self.max_depth = depth
+        if is_dir:
+            self.dirs += 1
+            self._sample(self.dir_samples, self.dirs, path)
+        else:
+            self.files += 1
+            self._sample(self.file_samples, self.files, path)
+
+    def to_dict(self):
+        return {"shape": self.shape, "nodes": self.nodes, "dirs": self.dirs, "files": self.files,
+                "max_depth": self.max_depth}
+
+
+def _balanced(rng, nodes, dirs_per_dir=4, files_per_dir=8):
+    yield "/", True, ""
+    written = 1
+    queue = collections.deque([""])
+    while queue and written < nodes:
+        directory = queue.popleft()
+        for i in range(files_per_dir):
+            if written >= nodes:
+                break
+            file_path = f"{directory}/file{i}.txt"
+            yield file_path, False, f"content of {file_path}"
+            written += 1
+        for i in range(dirs_per_dir):
+            if written >= nodes:
+                break
+            subdir = f"{directory}/dir{i}"
+            yield subdir, True, ""
+            written += 1
+            queue.append(subdir)
+
+
+def _deep(rng, nodes, depth=64, files_per_dir=1):
+    yield "/", True, ""
+    written = 1
+    chain = 0
+    while written < nodes:
+        path = f"/deep{chain}"
+        yield path, True, ""
+        written += 1
+        for level in range(depth):
+            if written >= nodes:
+                return
+            path += f"/l{level}"
+            yield path, True, ""
+            written += 1
+            for i in range(files_per_dir):
+                if written >= nodes:
+                    return
+                yield f"{path}/f{level}_{i}.txt", False, f"level {level} file {i}"
+                written += 1
+        chain += 1
+
+
+def _wide(rng, nodes, fanout=100000, dir_every=10):
+    yield "/", True, ""
+    written = 1
+    block = 0
+    while written < nodes:
+        directory = f"/wide{block}"
+        yield directory, True, ""
+        written += 1
+        for i in range(fanout):
+            if written >= nodes:
+                return
+            # Каждый dir_every-й элемент — пустой каталог
+            if i % dir_every == dir_every - 1:
+                yield f"{directory}/dir{i}", True, ""
+            else:
+                yield f"{directory}/file{i}.txt", False, f"row {i} of {directory}"
+            written += 1
+        block += 1
+
+
+def _file_content(rng, ext, binary):
+    if binary:
+        return base64.b64encode(rng.randbytes(rng.randrange(12, 48))).decode("ascii")
+    words = " ".join(rng.choices(_WORDS, k=rng.randrange(2, 10)))
+    if ext == "py":
+        return f"def {rng.choice(_WORDS)}(): return '{words}'"
+    if ext == "json":
+        return '{"%s": "%s"}' % (rng.choice(_WORDS), words)
+    return words
+
+
+def _realistic(rng, nodes, max_depth=12):
+    kinds = [(ext, binary) for ext, _, binary in _FILE_KINDS]
+    weights = [weight for _, weight, _ in _FILE_KINDS]
+    yield "/", True, ""
+    written = 1
+    projects = 0
+    # Обход в глубину: в стеке только каталоги, дети которых ещё не выданы
+    stack = []
+    while written < nodes:
+        if not stack:
+            path = f"/{rng.choice(_PROJECT_NAMES)}{projects}"
+            projects += 1
+            yield path, True, ""
+            written += 1
+            stack.append((path, 1))
+            continue
+        directory, depth = stack.pop()
+        used = set()
+        for _ in range(min(int(rng.expovariate(1 / 6)), 60)):
+            if written >= nodes:
+                return
+            ext, binary = kinds[rng.choices(range(len(kinds)), weights)[0]]
+            name = f"{rng.choice(_FILE_STEMS)}.{ext}"
+            if name in used:
+                name = f"{rng.choice(_FILE_STEMS)}_{len(used)}.{ext}"
+            used.add(name)
+            yield f"{directory}/{name}", False, _file_content(rng, ext, binary)
+            written += 1
+        if depth >= max_depth:
+            continue
+        # Ветвление убывает с глубиной: у верхних уровней каталогов больше
+        mean_dirs = max(0.4, 3.5 - depth * 0.4)
+        for _ in range(min(int(rng.expovariate(1 / mean_dirs)), 12)):
+            if written >= nodes:
+                return
+            name = rng.choice(_DIR_NAMES)
+            if name in used:
+                name = f"{name}{len(used)}"
+            used.add(name)
+            path = f"{directory}/{name}"
+            yield path, True, ""
+            written += 1
+            stack.append((path, depth + 1))
+
+
+_GENERATORS = {"balanced": _balanced, "deep": _deep, "wide": _wide, "realistic": _realistic}
+
+
+def generate_image(path, nodes, shape="realistic", seed=0, sample_size=SAMPLE_SIZE, **options):
+    """
+    Записывает CSV-образ из nodes узлов (включая корень) формы shape и возвращает ImageInfo.
+    options — параметры формы: depth/files_per_dir (deep), fanout (wide),
+    dirs_per_dir/files_per_dir (balanced), max_depth (realistic).
+    """
+    rng = random.Random(seed)
+    info = ImageInfo(shape, sample_size, seed)
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["path", "type", "content"])
+        rows = []
+        for node_path, is_dir, content in _GENERATORS[shape](rng, nodes, **options):
+            info.add(node_path, is_dir)
+            rows.append((node_path, "dir" if is_dir else "file", content))
+            if len(rows) >= 10000:
+                writer.writerows(rows)
+                rows = []
+        writer.writerows(rows)
+    return info
+
+
+def scan_image(path, sample_size=SAMPLE_SIZE, seed=0, shape="existing"):
+    """
+    ImageInfo для уже существующего CSV-образа (один потоковый проход).
+    Для образа из generate_image с тем же seed выборки совпадают с полученными при генерации.
+    """
+    info = ImageInfo(shape, sample_size, seed)
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        reader = csv.reader(f)
+        header = next(reader, None) or []
+        columns = {name.strip(): i for i, name in enumerate(header)}
+        pi, ti = columns.get("path", 0), columns.get("type", 1)
+        for row in reader:
+            if len(row) > max(pi, ti) and row[pi]:
+                info.add(row[pi].rstrip("/") or "/", row[ti].strip().lower() == "dir")
+    return info
+
+
+def generate_commands(info, commands, seed=0):
+    """
+    Список строк скрипта из commands команд по выборкам info: ls/cd/cat/find
+    по существующим путям, обращения к несуществующим путям и комментарии.
+    Все команды известны эмулятору, так что скрипт выполняется до конца.
+    """
+    rng = random.Random(seed)
+    dirs = info.dir_samples or ["/"]
+    files = info.file_samples or ["/missing.txt"]
+    patterns = [name for name in {p.rsplit("/", 1)[1] for p in files[:50]}] or ["*"]
+    patterns += ["*." + p.rsplit(".", 1)[1] for p in patterns if "." in p][:5]
+    actions = (("ls_dir", 20), ("cd_dir", 15), ("ls", 10), ("cd_up", 5), ("cat", 20), ("find", 3),
+               ("cat_missing", 3), ("ls_missing", 2), ("rmdir_missing", 1), ("comment", 2))
+    names = [name for name, _ in actions]
+    weights = [weight for _, weight in actions]
+    lines = []
+    count = 0
+    while count < commands:
+        action = rng.choices(names, weights)[0]
+        if action == "comment":
+            lines.append(f"# step {count}")
+            continue
+        count += 1
+        if action == "ls_dir":
+            lines.append(f"ls {rng.choice(dirs)}")
+        elif action == "cd_dir":
+            lines.append(f"cd {rng.choice(dirs)}")
+        elif action == "ls":
+            lines.append("ls")
+        elif action == "cd_up":
+            lines.append("cd ..")
+        elif action == "cat":
+            lines.append(f"cat {rng.choice(files)}")
+        elif action == "find":
+            lines.append(f"find {rng.choice(dirs)} {rng.choice(patterns)}")
+        elif action == "cat_missing":
+            lines.append(f"cat {rng.choice(dirs)}/no_such_file_{count}.txt")
+        elif action == "ls_missing":
+            lines.append(f"ls /no_such_dir_{count}")
+        else:
+            lines.append(f"rmdir /no_such_dir_{count}")
+    return lines
+
+
+def generate_script(path, info, commands, seed=0):
+    """Записывает стартовый скрипт из generate_commands; возвращает число команд."""
+    lines = generate_commands(info, commands, seed)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines))
+        f.write("\n")
+    return commands
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate synthetic VFS images and command scripts")
+    parser.add_argument("output", help="CSV image to write")
+    parser.add_argument("--nodes", type=int, default=10 ** 5, help="Number of nodes including the root")
+    parser.add_argument("--shape", choices=SHAPES, default="realistic")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--depth", type=int, help="Chain depth for the deep shape")
+    parser.add_argument("--fanout", type=int, help="Entries per directory for the wide shape")
+    parser.add_argument("--script", metavar="PATH", help="Also write a command script over the image")
+    parser.add_argument("--commands", type=int, default=1000, help="Commands in the script")
+    args = parser.parse_args()
+
+    options = {}
+    if args.depth is not None and args.shape == "deep":
+        options["depth"] = args.depth
+    if args.fanout is not None and args.shape == "wide":
+        options["fanout"] = args.fanout
+    image = generate_image(args.output, args.nodes, args.shape, args.seed, **options)
+    print(f"{args.output}: {image.nodes} nodes ({image.dirs} dirs, {image.files} files, "
+          f"max depth {image.max_depth})")
+    if args.script:
+        generate_script(args.script, image, args.commands, args.seed)
+        print(f"{args.script}: {args.commands} commands")
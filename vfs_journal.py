@@ -0,0 +1,356 @@
+"""
+Журнал изменений VFS (write-ahead) для восстановления состояния между сеансами.
+
+Изменения дерева (add_node, remove_dir) дописываются в <образ>.journal. Запись —
+заголовок "<II" (длина, crc32) и JSON-тело; первая запись журнала описывает базу:
+поколение и размер/mtime исходного образа. Записи копятся в памяти и сбрасываются
+фоновым потоком пачками — один write и один fsync на пачку (group commit).
+Компактирование по порогу записей идёт в отдельном потоке под блокировкой
+чтения дерева, а не в изменяющем дерево потоке под блокировкой записи.
+
+Поколение 0 — база сам образ, поколение N — снимок <образ>.state-N.vfsnap.
+Компактирование записывает текущее дерево в снимок следующего поколения и
+атомарно заменяет журнал пустым, после чего старый снимок удаляется.
+При старте база загружается и журнал проигрывается поверх неё; оборванный
+хвост журнала (запись не успела дойти до диска целиком) отбрасывается.
+"""
+import argparse
+import atexit
+import glob
+import json
+import os
+import struct
+import threading
+import zlib
+
+import vfs as vfs_module
+import vfs_snapshot
+
+JOURNAL_VERSION = 1
+JOURNAL_SUFFIX = ".journal"
+
+# Сколько ждать накопления пачки перед записью на диск, секунды
+COMMIT_INTERVAL = 0.05
+# Размер пачки, при котором запись начинается не дожидаясь интервала
+COMMIT_BATCH = 256
+# После стольких записей журнал компактируется в снимок
+COMPACT_RECORDS = 10000
+
+_RECORD = struct.Struct("<II")
+
+
+def journal_path_for(image_path):
+    return image_path + JOURNAL_SUFFIX
+
+
+def state_path_for(image_path, generation):
+    return f"{image_path}.state-{generation}{vfs_snapshot.SNAPSHOT_SUFFIX}"
+
+
+def _encode(record):
+    payload = json.dumps(record, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return _RECORD.pack(len(payload), zlib.crc32(payload)) + payload
+
+
+def _fsync_dir(path):
+    """fsync каталога после переименования (где это поддерживается)."""
+    try:
+        fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def read_journal(path):
+    """
+    Читает журнал: (заголовок, записи, длина корректной части файла).
+    Чтение останавливается на первой оборванной или повреждённой записи.
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    records = []
+    pos = 0
+    while pos + _RECORD.size <= len(data):
+        length, crc = _RECORD.unpack_from(data, pos)
+        payload = data[pos + _RECORD.size:pos + _RECORD.size + length]
+        if len(payload) < length or zlib.crc32(payload) != crc:
+            break
+        try:
+            records.append(json.loads(payload))
+        except ValueError:
+            break
+        pos += _RECORD.size + length
+    if not records or records[0].get("journal") != JOURNAL_VERSION:
+        return None, [], 0
+    return records[0], records[1:], pos
+
+
+def _image_identity(image_path):
+    stat = os.stat(image_path)
+    return stat.st_size, stat.st_mtime
+
+
+def replay(fs, records):
+    """Применяет записи журнала к дереву; возвращает число применённых записей."""
+    for record in records:
+        op = record.get("op")
+        if op == "add":
+            fs.add_node(record["path"], record["is_dir"], record.get("content"), record.get("encoding"))
+        elif op == "rmdir":
+            fs.remove_dir(record["path"])
+        else:
+            raise ValueError(f"Unknown journal operation: {op!r}")
+    return len(records)
+
+
+class VFSJournal:
+    """
+    Открытый на дозапись журнал. append() только кладёт запись в буфер;
+    фоновый поток пишет накопленное пачкой и делает один fsync на пачку.
+    append(wait=True) дожидается, пока запись станет надёжной — одновременные
+    ожидающие делят один fsync. flush() — синхронный сброс всего буфера.
+    sync=True — каждая запись ждёт fsync (строгая надёжность ценой задержки).
+    """
+    def __init__(self, image_path, generation=0, commit_interval=COMMIT_INTERVAL,
+                 commit_batch=COMMIT_BATCH, compact_records=COMPACT_RECORDS, records=0):
+        self.image_path = image_path
+        self.path = journal_path_for(image_path)
+        self.generation = generation
+        self.commit_interval = commit_interval
+        self.commit_batch = commit_batch
+        self.compact_records = compact_records
+        self.sync = False
+        # Записей в журнале с последнего компактирования
+        self.records = records
+        self.fs = None
+        self._pending = []
+        self._appended = 0
+        self._durable = 0
+        self._waiting = 0
+        self._cond = threading.Condition()
+        self._io_lock = threading.Lock()
+        self._closed = False
+        # Поток фонового компактирования, пока оно идёт
+        self._compactor = None
+        if not os.path.exists(self.path):
+            self._write_fresh(self.path)
+        self._file = open(self.path, "ab")
+        self._thread = threading.Thread(target=self._run, name="vfs-journal", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def _header(self):
+        size, mtime = _image_identity(self.image_path)
+        return {"journal": JOURNAL_VERSION, "generation": self.generation,
+                "source_size": size, "source_mtime": mtime}
+
+    def _write_fresh(self, path):
+        """Создаёт журнал из одного заголовка (атомарно, через временный файл)."""
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(_encode(self._header()))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+        _fsync_dir(path)
+
+    def append(self, record, wait=None):
+        """Добавляет запись в журнал; wait=True — вернуться только после fsync (по умолчанию — sync)."""
+        if wait is None:
+            wait = self.sync
+        data = _encode(record)
+        with self._cond:
+            if self._closed:
+                raise ValueError("append to closed journal")
+            self._pending.append(data)
+            self._appended += 1
+            seq = self._appended
+            if len(self._pending) >= self.commit_batch or wait:
+                self._cond.notify_all()
+            if wait:
+                self._waiting += 1
+                while self._durable < seq:
+                    self._cond.wait()
+                self._waiting -= 1
+            self.records += 1
+            if self.compact_records and self.records >= self.compact_records and self.fs is not None \
+                    and self._compactor is None:
+                # append вызывается под блокировкой записи дерева — снимок пишет другой поток,
+                # когда блокировка будет отпущена
+                self._compactor = threading.Thread(target=self._compact_background,
+                                                   name="vfs-journal-compact", daemon=True)
+                self._compactor.start()
+
+    def _commit(self):
+        """Пишет накопленное одной пачкой и делает fsync. Вызывается без _cond."""
+        # Пачки забираются и пишутся под одной блокировкой — порядок записей сохраняется
+        with self._io_lock:
+            with self._cond:
+                batch = self._pending
+                self._pending = []
+                seq = self._appended
+            if batch:
+                self._file.write(b"".join(batch))
+                self._file.flush()
+                os.fsync(self._file.fileno())
+        with self._cond:
+            if seq > self._durable:
+                self._durable = seq
+                self._cond.notify_all()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if not self._closed and len(self._pending) < self.commit_batch and not self._waiting:
+                    self._cond.wait(self.commit_interval)
+                closed = self._closed
+            self._commit()
+            if closed:
+                return
+
+    def flush(self):
+        """Синхронно записывает и fsync'ает всё накопленное."""
+        self._commit()
+
+    def _compact_background(self):
+        try:
+            with self._cond:
+                if self._closed:
+                    return
+            self.compact(self.fs)
+        finally:
+            with self._cond:
+                self._compactor = None
+
+    def compact(self, fs):
+        """
+        Сохраняет дерево fs снимком следующего поколения и начинает журнал заново.
+        Снимок пишется под блокировкой чтения дерева: изменения (и их записи в журнал)
+        ждут, поэтому снимок и новый пустой журнал согласованы.
+        """
+        with fs.lock.read():
+            self.flush()
+            generation = self.generation + 1
+            state_path = state_path_for(self.image_path, generation)
+            vfs_snapshot.write_snapshot(fs, state_path, self.image_path)
+            with self._io_lock:
+                old_state = state_path_for(self.image_path, self.generation)
+                self.generation = generation
+                self._file.close()
+                self._write_fresh(self.path)
+                self._file = open(self.path, "ab")
+            with self._cond:
+                self.records = 0
+        if generation > 1:
+            try:
+                os.remove(old_state)
+            except OSError:
+                # Файл может быть открыт (ленивое содержимое) — уберём при следующем старте
+                pass
+        return state_path
+
+    def close(self):
+        """Дописывает буфер, останавливает фоновый поток и закрывает файл."""
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify_all()
+            compactor = self._compactor
+        if compactor is not None:
+            compactor.join()
+        self._thread.join()
+        self._commit()
+        with self._io_lock:
+            self._file.close()
+        atexit.unregister(self.close)
+
+
+def _discard_state(image_path, keep_generation=None):
+    """Удаляет снимки состояния (кроме keep_generation)."""
+    keep = state_path_for(image_path, keep_generation) if keep_generation else None
+    for path in glob.glob(glob.escape(image_path) + ".state-*" + vfs_snapshot.SNAPSHOT_SUFFIX):
+        if path != keep:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+def restore(image_path, output_func=print, compact_records=COMPACT_RECORDS,
+            commit_interval=COMMIT_INTERVAL, **load_options):
+    """
+    Загружает VFS с учётом журнала: базу (образ или снимок состояния) и записи журнала
+    поверх неё, затем подключает журнал к дереву для дальнейших изменений.
+    load_options передаются в load_vfs. Возвращает VirtualFileSystem или None.
+    """
+    path = journal_path_for(image_path)
+    header, records, valid_end = None, [], 0
+    if os.path.exists(path):
+        header, records, valid_end = read_journal(path)
+        if header is None:
+            output_func(f"Journal {path} is unreadable, starting a new one")
+        elif (header["source_size"], header["source_mtime"]) != _image_identity(image_path):
+            output_func(f"VFS image {image_path} changed since the journal was written, discarding journal")
+            header, records = None, []
+        if header is None:
+            os.remove(path)
+    generation = header["generation"] if header else 0
+    _discard_state(image_path, generation)
+
+    state_path = state_path_for(image_path, generation)
+    if generation and os.path.exists(state_path):
+        node_class = vfs_module.CompactVFSNode if load_options.get("compact") else vfs_module.VFSNode
+        fs, entries = vfs_snapshot.read_snapshot(
+            state_path, node_class, load_options.get("content_cache_bytes", 16 * 1024 * 1024))
+        vfs_module.vfs = fs
+        output_func(f"VFS state loaded from {state_path} ({entries} entries)")
+    else:
+        if generation:
+            output_func(f"VFS state snapshot {state_path} is missing, discarding journal")
+            os.remove(path)
+            generation, records = 0, []
+        fs = vfs_module.load_vfs(image_path, output_func, **load_options)
+        if fs is None:
+            return None
+
+    if header is not None and valid_end < os.path.getsize(path):
+        # Оборванный хвост: последняя пачка не дошла до диска целиком
+        with open(path, "r+b") as f:
+            f.truncate(valid_end)
+    replay(fs, records)
+    if records:
+        output_func(f"Replayed {len(records)} journal records from {path}")
+
+    journal = VFSJournal(image_path, generation, commit_interval=commit_interval,
+                         compact_records=compact_records, records=len(records))
+    if compact_records and len(records) >= compact_records:
+        journal.compact(fs)
+    journal.fs = fs
+    fs.journal = journal
+    return fs
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect or compact the VFS journal of an image")
+    parser.add_argument("image", help="Path to the VFS image the journal belongs to")
+    parser.add_argument("--compact", action="store_true", help="Fold the journal into a state snapshot")
+    args = parser.parse_args()
+
+    if args.compact:
+        fs = restore(args.image, compact_records=0)
+        if fs is not None:
+            print(f"Compacted into {fs.journal.compact(fs)}")
+            fs.journal.close()
+    elif os.path.exists(journal_path_for(args.image)):
+        header, records, _ = read_journal(journal_path_for(args.image))
+        print(f"generation {header['generation'] if header else '?'}: {len(records)} records")
+        for record in records:
+            print(json.dumps(record, ensure_ascii=False))
+    else:
+        print("No journal")
@@ -0,0 +1,199 @@
+"""
+Сеансовое представление общего дерева VFS с копированием при записи.
+
+Базовое дерево (VirtualFileSystem) загружается один раз и сеансами не меняется.
+Каждый сеанс получает OverlayVFS: свой cwd и, только после первого изменения,
+собственные копии изменённых каталогов. Копируется каталог и его предки
+(новый узел с поверхностной копией children); все остальные узлы, включая
+содержимое файлов, остаются общими с базой.
+"""
+from vfs import VirtualFileSystem, compile_find_pattern, stream_du, stream_find, stream_tree
+
+
+class OverlayVFS:
+    """
+    Представление базового дерева для одного сеанса. Поддерживает команды
+    эмулятора над деревом: get_node, list_dir, change_dir, get_cwd_path, read_file,
+    find/iter_find, subtree_totals, iter_tree, iter_du и remove_dir; ошибки, как и у
+    VirtualFileSystem, возвращаются строками. Добавлять узлы сеанс не может.
+    cwd хранится как имена от корня: у узлов базы в скопированных каталогах
+    parent указывает на узел базы, поэтому '..' разрешается по цепочке пути.
+    """
+    def __init__(self, base):
+        self.base = base
+        self.root = base.root
+        self.node_class = base.node_class
+        # Общие с базой узлы читаются под её блокировкой
+        self.lock = base.lock
+        self._cwd_names = ()
+        # Копии каталогов, сделанные этим сеансом (их можно менять на месте):
+        # копия -> [исходный узел базы, сколько каталогов удалено сеансом в её поддереве].
+        # Итоги поддерева копии — итоги исходного узла за вычетом удалённых каталогов.
+        # None — сеанс ничего не менял.
+        self._copies = None
+
+    @property
+    def content_store(self):
+        return self.base.content_store
+
+    @property
+    def cwd(self):
+        chain = self._cwd_chain()
+        return chain[-1] if chain else None
+
+    def _cwd_chain(self):
+        """Узлы от корня до cwd или None, если cwd удалён."""
+        chain = [self.root]
+        for name in self._cwd_names:
+            node = chain[-1]
+            child = node.children.get(name) if node.is_dir else None
+            if child is None:
+                return None
+            chain.append(child)
+        return chain
+
+    def _chain(self, path):
+        """Узлы от корня до узла по пути (абсолютному или от cwd) или None."""
+        if path and path.startswith("/"):
+            chain = [self.root]
+        else:
+            chain = self._cwd_chain()
+            if chain is None:
+                return None
+        if not path:
+            return chain
+        for part in path.split("/"):
+            if not part or part == ".":
+                continue
+            if part == "..":
+                if len(chain) > 1:
+                    chain.pop()
+                continue
+            node = chain[-1]
+            if not node.is_dir:
+                return None
+            child = node.children.get(part)
+            if child is None:
+                return None
+            chain.append(child)
+        return chain
+
+    def get_node(self, path):
+        with self.lock.read():
+            chain = self._chain(path)
+        return chain[-1] if chain else None
+
+    def list_dir(self, path=None):
+        with self.lock.read():
+            chain = self._chain(path)
+            if not chain:
+                return f"No such directory: {path or self.get_cwd_path()}"
+            node = chain[-1]
+            if not node.is_dir:
+                return f"{path or node.path()} is not a directory"
+            return "  ".join(sorted(node.children))
+
+    def get_cwd_path(self):
+        return "/" + "/".join(self._cwd_names)
+
+    def change_dir(self, path):
+        if path is None or path == "":
+            self._cwd_names = ()
+            return self.get_cwd_path()
+        with self.lock.read():
+            chain = self._chain(path)
+        if not chain:
+            return f"No such directory: {path}"
+        if not chain[-1].is_dir:
+            return f"{path} is not a directory"
+        self._cwd_names = tuple(node.name for node in chain[1:])
+        return self.get_cwd_path()
+
+    def read_file(self, path):
+        with self.lock.read():
+            chain = self._chain(path)
+            if not chain:
+                return f"No such file: {path}"
+            node = chain[-1]
+            if node.is_dir:
+                return f"{path} is a directory"
+            return self.base.file_text(node)
+
+    def file_text(self, node):
+        return self.base.file_text(node)
+
+    def find(self, start_node, pattern):
+        for block in self.iter_find(start_node, pattern):
+            yield from block
+
+    def iter_find(self, start_node, pattern):
+        if self._copies is None:
+            # Сеанс ничего не менял — годится индекс имён базы
+            return self.base.iter_find(start_node, pattern)
+        return stream_find(self.lock, start_node, compile_find_pattern(pattern))
+
+    def subtree_totals(self, node):
+        with self.lock.read():
+            return self._subtree_totals(node)
+
+    def _subtree_totals(self, node):
+        copy = self._copies.get(node) if self._copies is not None else None
+        if copy is None:
+            # Узел общий с базой — и итоги его поддерева тоже
+            return self.base._subtree_totals(node)
+        origin, removed = copy
+        totals = self.base._subtree_totals(origin)
+        return (totals[0], totals[1] - removed, totals[2]) if totals is not None else None
+
+    def iter_tree(self, start_node, max_depth=None):
+        return stream_tree(self.lock, self._subtree_totals, start_node, max_depth)
+
+    def iter_du(self, start_node, max_depth=None):
+        return stream_du(self.lock, self._subtree_totals, start_node, max_depth)
+
+    iter_subtree = staticmethod(VirtualFileSystem.iter_subtree)
+
+    def _writable(self, chain):
+        """Копирует общие с базой узлы цепочки (от корня вниз); возвращает цепочку сеанса."""
+        if self._copies is None:
+            self._copies = {}
+        copies = self._copies
+        result = []
+        parent = None
+        for node in chain:
+            if node not in copies:
+                copy = type(node)(node.name, True, parent)
+                copy.children = dict(node.children)
+                copy._path = node._path
+                if parent is None:
+                    self.root = copy
+                else:
+                    parent.children[node.name] = copy
+                copies[copy] = [node, 0]
+                node = copy
+            result.append(node)
+            parent = node
+        return result
+
+    def remove_dir(self, path):
+        # Меняются только копии сеанса, но цепочка читается из базы
+        with self.lock.read():
+            if path is None or path == "":
+                return "Usage: rmdir <directory>"
+            chain = self._chain(path)
+            if not chain:
+                return f"No such directory: {path}"
+            node = chain[-1]
+            if not node.is_dir:
+                return f"{path} is not a directory"
+            if len(chain) == 1:
+                return "Cannot remove root directory"
+            if node.children:
+                return "Directory not empty"
+            removed_path = node.path()
+            writable = self._writable(chain[:-1])
+            del writable[-1].children[node.name]
+            self._copies.pop(node, None)
+            for copy in writable:
+                self._copies[copy][1] += 1
+            return f"Removed directory: {removed_path}"
@@ -0,0 +1,165 @@
+"""
+Многосеансовый сервер эмулятора: одно общее дерево VFS, у каждого подключения
+свой OverlayVFS (cwd и копирование при записи). Сеансы обслуживаются asyncio
+на локальном сокете.
+
+Протокол: клиент шлёт команду строкой (UTF-8, "\\n" в конце), сервер отвечает
+строкой с длиной ответа в байтах и затем самим ответом. exit закрывает сеанс.
+
+Запуск: python vfs_server.py --port 7777 --vfs-path vfs_large.csv [опции эмулятора]
+Клиент: python vfs_server.py --connect 127.0.0.1:7777
+"""
+import argparse
+import asyncio
+import sys
+
+from vfs_overlay import OverlayVFS
+
+DEFAULT_HOST = "127.0.0.1"
+# Ограничение длины строки команды, байт
+MAX_COMMAND_BYTES = 64 * 1024
+
+
+class VFSServer:
+    """
+    Сервер сеансов над базовым деревом base. execute(command, fs) выполняет строку
+    команды в представлении сеанса fs и возвращает текст ответа, None или итератор
+    блоков текста (ответ протокола — с длиной, поэтому блоки собираются целиком).
+    """
+    def __init__(self, base, execute, host=DEFAULT_HOST, port=0):
+        self.base = base
+        self.execute = execute
+        self.host = host
+        self.port = port
+        self.sessions = 0
+        self.commands = 0
+        self._server = None
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, self.host, self.port,
+                                                  limit=MAX_COMMAND_BYTES)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def serve_forever(self):
+        if self._server is None:
+            await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def stop(self):
+        self._server.close()
+        await self._server.wait_closed()
+
+    def _execute(self, command, fs):
+        """Выполняет команду и собирает ответ целиком; вызывается в потоке пула."""
+        try:
+            result = self.execute(command, fs)
+            if result is not None and not isinstance(result, str):
+                result = "\n".join(result)
+        except Exception as e:
+            result = f"Error: {e}"
+        return result
+
+    async def _handle(self, reader, writer):
+        loop = asyncio.get_running_loop()
+        fs = OverlayVFS(self.base)
+        self.sessions += 1
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except (ValueError, ConnectionError):
+                    # Слишком длинная строка или обрыв соединения
+                    break
+                if not line:
+                    break
+                command = line.decode("utf-8", errors="replace").strip()
+                if command.split(maxsplit=1)[:1] == ["exit"]:
+                    break
+                # Команда выполняется в пуле потоков: долгий find или tree не держит
+                # цикл событий, остальные сеансы обслуживаются параллельно (дерево
+                # защищено блокировкой читатели-писатель)
+                result = await loop.run_in_executor(None, self._execute, command, fs)
+                self.commands += 1
+                payload = (result or "").encode("utf-8")
+                writer.write(b"%d\n" % len(payload) + payload)
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            self.sessions -= 1
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+
+async def request(reader, writer, command):
+    """Отправляет команду и читает ответ (клиентская сторона протокола)."""
+    writer.write(command.encode("utf-8") + b"\n")
+    await writer.drain()
+    header = await reader.readline()
+    if not header:
+        raise ConnectionError("server closed the connection")
+    return (await reader.readexactly(int(header))).decode("utf-8")
+
+
+async def _client(host, port, prompt="home$ "):
+    reader, writer = await asyncio.open_connection(host, port)
+    loop = asyncio.get_running_loop()
+    try:
+        while True:
+            command = await loop.run_in_executor(None, input, prompt)
+            if command.strip() == "exit":
+                break
+            result = await request(reader, writer, command)
+            if result:
+                print(result)
+    except (EOFError, KeyboardInterrupt):
+        print()
+    finally:
+        writer.close()
+        await writer.wait_closed()
+
+
+def main(args_list=None):
+    parser = argparse.ArgumentParser(description="Serve the VFS emulator to many sessions over a local socket",
+                                     add_help=False)
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=7777)
+    parser.add_argument("--connect", metavar="HOST:PORT", help="run an interactive client instead of the server")
+    args, emulator_args = parser.parse_known_args(args_list)
+
+    if args.connect:
+        host, _, port = args.connect.rpartition(":")
+        asyncio.run(_client(host or DEFAULT_HOST, int(port)))
+        return
+
+    import config
+    import emu
+    import vfs as vfs_module
+
+    config.init_config(emulator_args)
+    emu.logger = config.logger
+    emu.load_plugins(config.plugin_modules)
+    base = vfs_module.vfs
+    if base is None:
+        sys.exit("VFS is not loaded, nothing to serve")
+
+    server = VFSServer(base, lambda command, fs: emu.act(command, fs), args.host, args.port)
+
+    async def run():
+        await server.start()
+        print(f"Serving VFS on {server.host}:{server.port}")
+        await server.serve_forever()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,276 @@
+"""
+Бинарный снимок VFS для быстрого старта.
+
+Формат (little-endian, секции выровнены по 8 байт):
+  header   magic, версия, число узлов, размеры секций, mtime исходного CSV
+  source   путь к исходному CSV (utf-8, относительно каталога снимка)
+  parent   uint32[n] — индекс родителя (у корня 0xFFFFFFFF); родитель всегда раньше детей
+  name_id  uint32[n] — номер имени в пуле
+  flags    uint8[n]  — бит 0: директория, биты 1-2: кодировка содержимого
+  offset   uint64[n] — смещение содержимого от начала секции blobs
+  length   uint64[n] — длина содержимого в байтах
+  names    пул различных имён в utf-8 через NUL
+  blobs    содержимое файлов подряд
+
+Загрузка читает столбцы через mmap без разбора текста, содержимое файлов
+остаётся на диске и читается по требованию (LazyContentStore).
+"""
+import argparse
+import gc
+import mmap
+import os
+import shutil
+import struct
+import sys
+from array import array
+
+import vfs as vfs_module
+
+MAGIC = b"VFSSNAP1"
+VERSION = 1
+SNAPSHOT_SUFFIX = ".vfsnap"
+
+_HEADER = struct.Struct("<8sIIIIQQd")
+_NO_PARENT = 0xFFFFFFFF
+_FLAG_DIR = 1
+_ENCODING_BITS = {None: 0, vfs_module.ENCODING_TEXT: 1, vfs_module.ENCODING_BASE64: 2}
+_ENCODINGS = {bits: encoding for encoding, bits in _ENCODING_BITS.items()}
+_COLUMNS = (("parent", "I"), ("name_id", "I"), ("flags", "B"), ("offset", "Q"), ("length", "Q"))
+
+
+def _align(n):
+    return (n + 7) & ~7
+
+
+def _layout(node_count, source_size, names_size):
+    """Смещения секций в файле снимка."""
+    sections = {}
+    pos = _align(_HEADER.size + source_size)
+    for name, typecode in _COLUMNS:
+        sections[name] = pos
+        pos = _align(pos + node_count * array(typecode).itemsize)
+    sections["names"] = pos
+    sections["blobs"] = _align(pos + names_size)
+    return sections
+
+
+def is_snapshot(path):
+    """True, если файл начинается с сигнатуры снимка."""
+    try:
+        with open(path, "rb") as f:
+            return f.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False
+
+
+def snapshot_path_for(csv_path):
+    """Путь снимка, который хранится рядом с CSV-образом."""
+    return csv_path + SNAPSHOT_SUFFIX
+
+
+def read_header(path):
+    """
+    Читает заголовок снимка: (число узлов, число имён, размер записи источника,
+    размер пула имён, mtime источника, путь источника).
+    """
+    with open(path, "rb") as f:
+        raw = f.read(_HEADER.size)
+        if len(raw) < _HEADER.size:
+            raise ValueError(f"{path} is not a VFS snapshot")
+        magic, version, node_count, name_count, source_size, names_size, _, source_mtime = _HEADER.unpack(raw)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a VFS snapshot")
+        if version != VERSION:
+            raise ValueError(f"Unsupported VFS snapshot version {version} in {path}")
+        source = f.read(source_size).decode("utf-8")
+    if source and not os.path.isabs(source):
+        source = os.path.join(os.path.dirname(os.path.abspath(path)), source)
+    return node_count, name_count, source_size, names_size, source_mtime, source
+
+
+def _write_column(f, values, start):
+    f.seek(start)
+    if sys.byteorder != "little":
+        values = array(values.typecode, values)
+        values.byteswap()
+    values.tofile(f)
+
+
+def write_snapshot(vfs_instance, path, source_path=None):
+    """Сохраняет дерево vfs_instance в снимок path (атомарно, через временный файл)."""
+    columns = {name: array(typecode) for name, typecode in _COLUMNS}
+    parent, name_id, flags = columns["parent"], columns["name_id"], columns["flags"]
+    offset, length = columns["offset"], columns["length"]
+    name_ids = {}
+    tmp_path = path + ".tmp"
+    blobs_path = path + ".blobs.tmp"
+
+    try:
+        # Проход 1: таблица узлов и содержимое во временный файл
+        blob_pos = 0
+        with open(blobs_path, "wb") as blobs:
+            stack = [(vfs_instance.root, _NO_PARENT)]
+            while stack:
+                node, parent_index = stack.pop()
+                index = len(parent)
+                if "\0" in node.name:
+                    raise ValueError(f"Cannot store name with NUL byte: {node.path()!r}")
+                parent.append(parent_index)
+                name_id.append(name_ids.setdefault(node.name, len(name_ids)))
+                if node.is_dir:
+                    flags.append(_FLAG_DIR)
+                    offset.append(0)
+                    length.append(0)
+                    stack.extend((child, index) for child in reversed(list(node.children.values())))
+                    continue
+                flags.append(_ENCODING_BITS.get(node.encoding, 0) << 1)
+                data = (vfs_instance._node_content(node) or "").encode("utf-8")
+                blobs.write(data)
+                offset.append(blob_pos)
+                length.append(len(data))
+                blob_pos += len(data)
+
+        # Проход 2: заголовок, столбцы, пул имён, затем копия содержимого
+        if source_path:
+            source = os.path.relpath(os.path.abspath(source_path), os.path.dirname(os.path.abspath(path)))
+            source_mtime = os.path.getmtime(source_path)
+        else:
+            source, source_mtime = "", 0.0
+        source_bytes = source.encode("utf-8")
+        names = "\0".join(name_ids).encode("utf-8")
+        sections = _layout(len(parent), len(source_bytes), len(names))
+
+        with open(tmp_path, "wb") as f:
+            f.write(_HEADER.pack(MAGIC, VERSION, len(parent), len(name_ids), len(source_bytes),
+                                 len(names), blob_pos, source_mtime))
+            f.write(source_bytes)
+            for name, _ in _COLUMNS:
+                _write_column(f, columns[name], sections[name])
+            f.seek(sections["names"])
+            f.write(names)
+            f.seek(sections["blobs"])
+            with open(blobs_path, "rb") as blobs:
+                shutil.copyfileobj(blobs, f, 1024 * 1024)
+        os.replace(tmp_path, path)
+    finally:
+        for leftover in (blobs_path, tmp_path):
+            if os.path.exists(leftover):
+                os.remove(leftover)
+    return len(parent)
+
+
+def read_snapshot(path, node_class=vfs_module.VFSNode, content_cache_bytes=16 * 1024 * 1024):
+    """Строит VirtualFileSystem из снимка; возвращает (экземпляр, число узлов)."""
+    node_count, name_count, source_size, names_size, _, _ = read_header(path)
+    sections = _layout(node_count, source_size, names_size)
+    fs = vfs_module.VirtualFileSystem(node_class=node_class)
+    if node_count == 0:
+        return fs, 0
+
+    with open(path, "rb") as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    view = memoryview(mm)
+    casts = []
+    try:
+        def column(name, typecode):
+            start = sections[name]
+            raw = view[start:start + node_count * array(typecode).itemsize]
+            if sys.byteorder != "little":
+                values = array(typecode)
+                values.frombytes(raw)
+                values.byteswap()
+                return values
+            values = raw.cast(typecode)
+            casts.append(values)
+            return values
+
+        parent = column("parent", "I")
+        name_id = column("name_id", "I")
+        flags = column("flags", "B")
+        offset = column("offset", "Q")
+        length = column("length", "Q")
+        start = sections["names"]
+        names = str(view[start:start + names_size], "utf-8").split("\0")
+        if len(names) != name_count:
+            raise ValueError(f"Corrupted VFS snapshot {path}: name pool mismatch")
+        blobs = sections["blobs"]
+
+        names = [sys.intern(name) for name in names]
+        nodes = [None] * node_count
+        nodes[0] = fs.root
+        # Дерево новое и индексы по нему ещё не построены — узлы создаются напрямую,
+        # минуя _new_child. Сборщик мусора на время массового создания объектов выключаем.
+        gc_was_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            for i in range(1, node_count):
+                flag = flags[i]
+                name = names[name_id[i]]
+                owner = nodes[parent[i]]
+                if flag & _FLAG_DIR:
+                    node = nodes[i] = node_class(name, True, owner)
+                else:
+                    node = nodes[i] = node_class(name, False, owner)
+                    size = length[i]
+                    if size:
+                        node.content = None
+                        node.content_ref = (blobs + offset[i], size)
+                    if flag:
+                        node.encoding = _ENCODINGS.get((flag >> 1) & 3)
+                owner.children[name] = node
+        finally:
+            if gc_was_enabled:
+                gc.enable()
+    finally:
+        for values in casts:
+            values.release()
+        view.release()
+        mm.close()
+
+    fs.content_store = vfs_module.LazyContentStore(path, content_cache_bytes)
+    return fs, node_count
+
+
+def load_snapshot(path, output_func=print, node_class=vfs_module.VFSNode,
+                  content_cache_bytes=16 * 1024 * 1024, chunk_size=vfs_module.LOAD_CHUNK_SIZE):
+    """
+    Загружает VFS из снимка. path — сам снимок или исходный CSV (тогда берётся
+    <csv>.vfsnap рядом с ним). Если снимка нет или исходный CSV изменился после
+    его сборки, снимок пересобирается. Возвращает (экземпляр, число узлов).
+    """
+    if is_snapshot(path):
+        snap_path = path
+        source = read_header(path)[5]
+    else:
+        snap_path = snapshot_path_for(path)
+        source = path
+
+    rebuild = not is_snapshot(snap_path)
+    if not rebuild and source and os.path.exists(source):
+        rebuild = os.path.getmtime(source) != read_header(snap_path)[4]
+    if rebuild:
+        if not source or not os.path.exists(source):
+            raise FileNotFoundError(f"No VFS source image to build {snap_path}")
+        build_snapshot(source, snap_path, output_func, chunk_size)
+    return read_snapshot(snap_path, node_class, content_cache_bytes)
+
+
+def build_snapshot(csv_path, snap_path=None, output_func=print, chunk_size=vfs_module.LOAD_CHUNK_SIZE):
+    """Собирает снимок из CSV-образа; возвращает путь снимка."""
+    snap_path = snap_path or snapshot_path_for(csv_path)
+    output_func(f"Building VFS snapshot {snap_path} from {csv_path}")
+    fs = vfs_module.VirtualFileSystem()
+    vfs_module.read_csv_image(fs, csv_path, output_func, chunk_size=chunk_size, lazy_content=True)
+    try:
+        write_snapshot(fs, snap_path, csv_path)
+    finally:
+        fs.content_store.close()
+    return snap_path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build a binary VFS snapshot from a CSV image")
+    parser.add_argument("csv_path", help="Path to the VFS CSV image")
+    parser.add_argument("-o", "--output", help=f"Snapshot path (default: <csv>{SNAPSHOT_SUFFIX})")
+    args = parser.parse_args()
+    build_snapshot(args.csv_path, args.output)